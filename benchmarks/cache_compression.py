@@ -0,0 +1,101 @@
+"""
+Compare size on disk and read latency of the parsed files cache with and without
+compression.
+
+Usage:
+
+    uv run python benchmarks/cache_compression.py               # synthetic corpus
+    uv run python benchmarks/cache_compression.py -s tmp/cache  # an existing cache
+"""
+
+import random
+import statistics
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Annotated
+from typer import Typer, Option
+from fs_explorer.caching import ParsedFileCache
+
+app = Typer()
+
+WORDS = "the court motion order plaintiff defendant hereby pursuant section agreement party claim evidence hearing counsel judgment filed notice schedule exhibit".split()
+
+
+def synthetic_corpus(documents: int) -> list[str]:
+    rng = random.Random(42)
+    header = "SUPERIOR COURT OF JUSTICE - COMMERCIAL LIST\nCourt File No. CV-24-00000000-00CL\n"
+    corpus = []
+    for i in range(documents):
+        pages = []
+        for page in range(rng.randint(1, 20)):
+            body = "\n".join(
+                " ".join(rng.choices(WORDS, k=rng.randint(6, 16)))
+                for _ in range(rng.randint(20, 40))
+            )
+            pages.append(f"{header}Page {page + 1}\n{body}")
+        corpus.append("\n\n".join(pages))
+    return corpus
+
+
+def measure(corpus: list[str], directory: Path, compress: bool, train: bool) -> None:
+    # disk only: the in-memory tier would hide the cost of decompression
+    cache = ParsedFileCache(
+        directory=directory / "cache", compress=compress, memory_bytes=0
+    )
+    sources = []
+    for i, text in enumerate(corpus):
+        source = directory / f"doc{i}.pdf"
+        source.write_bytes(f"%PDF {i}".encode())
+        sources.append(str(source))
+        cache.add_file(str(source), text)
+    if train:
+        cache.train_dictionary()
+        cache._cache.clear()
+        for source, text in zip(sources, corpus):
+            cache.add_file(source, text)
+    raw = sum(len(text.encode("utf-8")) for text in corpus)
+    stored = sum(
+        len(value.encode("utf-8") if isinstance(value, str) else value)
+        for value in (cache._cache[key] for key in cache._cache)
+    )
+    latencies = []
+    for _ in range(3):
+        for source in sources:
+            start = time.perf_counter()
+            cache.get_file(source)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    label = "zlib + dictionary" if train else ("zlib" if compress else "plain text")
+    print(
+        f"{label:<18} stored {stored / 1024:>10,.1f} KB (raw {raw / 1024:,.1f} KB, {raw / stored:.2f}x)"
+        f" | get_file mean {statistics.mean(latencies):>7.1f} us, p95 {statistics.quantiles(latencies, n=20)[-1]:>7.1f} us"
+    )
+    cache.close()
+
+
+@app.command()
+def main(
+    source_cache: Annotated[
+        str | None,
+        Option(
+            "--source-cache", "-s", help="Benchmark the documents of an existing cache"
+        ),
+    ] = None,
+    documents: Annotated[
+        int, Option("--documents", "-n", help="Size of the synthetic corpus")
+    ] = 200,
+) -> None:
+    if source_cache is not None:
+        cache = ParsedFileCache(directory=Path(source_cache))
+        corpus = [text for _, text in cache.iter_files()]
+        cache.close()
+    else:
+        corpus = synthetic_corpus(documents)
+    for compress, train in ((False, False), (True, False), (True, True)):
+        with tempfile.TemporaryDirectory() as directory:
+            measure(corpus, Path(directory), compress, train)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,92 @@
+"""
+Compare the latency of repeated reads from the parsed files cache with and without
+the in-memory tier in front of the on-disk store.
+
+Usage:
+
+    uv run python benchmarks/cache_memory_tier.py               # synthetic corpus
+    uv run python benchmarks/cache_memory_tier.py -s tmp/cache  # an existing cache
+"""
+
+import random
+import statistics
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Annotated
+from typer import Typer, Option
+from fs_explorer.caching import MEMORY_CACHE_BYTES, ParsedFileCache
+
+from cache_compression import synthetic_corpus
+
+app = Typer()
+
+
+def measure(
+    corpus: list[str], directory: Path, memory_bytes: int, working_set: int, reads: int
+) -> None:
+    cache = ParsedFileCache(directory=directory / "cache", memory_bytes=memory_bytes)
+    sources = []
+    for i, text in enumerate(corpus):
+        source = directory / f"doc{i}.pdf"
+        source.write_bytes(f"%PDF {i}".encode())
+        sources.append(str(source))
+        cache.add_file(str(source), text)
+    # a fresh instance, as in a new agent session: the first reads come from disk
+    cache.close()
+    cache = ParsedFileCache(directory=directory / "cache", memory_bytes=memory_bytes)
+    rng = random.Random(7)
+    hot = sources[:working_set]
+    latencies = []
+    for _ in range(reads):
+        source = rng.choice(hot)
+        start = time.perf_counter()
+        cache.get_file(source)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    label = (
+        f"memory tier {memory_bytes // 1024 // 1024} MB"
+        if memory_bytes
+        else "disk only"
+    )
+    print(
+        f"{label:<20} get_file mean {statistics.mean(latencies):>8.1f} us, median {statistics.median(latencies):>8.1f} us, p95 {statistics.quantiles(latencies, n=20)[-1]:>8.1f} us"
+    )
+    memory = cache.memory_stats()
+    if memory is not None:
+        print(
+            f"{'':<20} {memory.hits:,} hits, {memory.misses:,} misses ({memory.hit_rate:.1%}), {memory.entries} entries, {memory.total_bytes / 1024 / 1024:,.1f} MB, {memory.evictions} evictions"
+        )
+    cache.close()
+
+
+@app.command()
+def main(
+    source_cache: Annotated[
+        str | None,
+        Option(
+            "--source-cache", "-s", help="Benchmark the documents of an existing cache"
+        ),
+    ] = None,
+    documents: Annotated[
+        int, Option("--documents", "-n", help="Size of the synthetic corpus")
+    ] = 200,
+    working_set: Annotated[
+        int,
+        Option("--working-set", "-w", help="Number of documents read again and again"),
+    ] = 10,
+    reads: Annotated[int, Option("--reads", "-r", help="Number of reads")] = 2000,
+) -> None:
+    if source_cache is not None:
+        cache = ParsedFileCache(directory=Path(source_cache), memory_bytes=0)
+        corpus = [text for _, text in cache.iter_files()]
+        cache.close()
+    else:
+        corpus = synthetic_corpus(documents)
+    for memory_bytes in (0, MEMORY_CACHE_BYTES):
+        with tempfile.TemporaryDirectory() as directory:
+            measure(corpus, Path(directory), memory_bytes, working_set, reads)
+
+
+if __name__ == "__main__":
+    app()
@@ -4,14 +4,18 @@ import os
 
 from pathlib import Path
 from typing import cast
-from diskcache import Cache
+from fs_explorer.caching import ParsedFileCache
+from fs_explorer.scheduler import ParseScheduler, result_text
 from llama_cloud_services.parse.utils import ResultType
 from llama_cloud_services.parse.types import JobResult
 from llama_cloud_services import LlamaParse
 
 
 async def parse_directory(
-    directory: str, recursive: bool, to_skip: list[str]
+    directory: str,
+    recursive: bool,
+    to_skip: list[str],
+    scheduler: ParseScheduler | None = None,
 ) -> dict[str, str]:
     logging.basicConfig(
         filename="rag-starterkit.log",
@@ -43,23 +47,25 @@ async def parse_directory(
             ]
             for fl in fls:
                 files.append(str((Path(root) / fl).resolve()))
-    semaphore = asyncio.Semaphore(5)
+    if scheduler is None:
+        scheduler = ParseScheduler()
     parser = LlamaParse(
         api_key=cast(str, os.getenv("LLAMA_CLOUD_API_KEY")),
         result_type=ResultType.TXT,
         fast_mode=True,
     )
 
+    async def parse_file(file_path: str) -> str:
+        result = cast(JobResult, await parser.aparse(file_path=file_path))
+        return await result_text(result)
+
     async def parse_job(file_path: str) -> tuple[str, str] | None:
-        async with semaphore:
-            result = cast(JobResult, await parser.aparse(file_path=file_path))
-            if result.error is None:
-                text = await result.aget_text()
-                return file_path, text
-            else:
-                logging.info(
-                    f"Could not parse file {file_path} because of {result.error}"
-                )
+        try:
+            text = await scheduler.run(lambda: parse_file(file_path))
+        except Exception as e:
+            logging.info(f"Could not parse file {file_path} because of {e}")
+            return None
+        return file_path, text
 
     files_contents = await asyncio.gather(*(parse_job(file) for file in files))
     data: dict[str, str] = {}
@@ -76,21 +82,7 @@ def contents_from_cache(cache_directory: str = "tmp/cache") -> dict[str, str]:
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
-    cache = Cache(directory=cache_directory)
-    data: dict[str, str] = {}
-    cache_keys = list(cache.iterkeys())
-    for key in cache_keys:
-        if isinstance(key, str):
-            data_key = key
-        elif isinstance(key, bytes):
-            data_key = str(key, encoding="utf-8")
-        else:
-            raise ValueError(
-                "Cache keys shold be either strings or byte-encoded strings"
-            )
-        value = cache.get(data_key)
-        if value is not None:
-            data[data_key] = cast(str, value)
-        else:
-            logging.info(f"Skipping file {data_key} as it stored a null content")
+    cache = ParsedFileCache(directory=Path(cache_directory))
+    data = dict(cache.iter_files())
+    cache.close()
     return data
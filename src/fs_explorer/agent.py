@@ -1,16 +1,39 @@
 import os
-from typing import Callable, Any, cast
+import time
+import asyncio
+from typing import Callable, Any
 from google.genai.types import Content, Part
 from google.genai import Client as GenAIClient
-from .models import Action, ActionType, ToolCallAction, Tools
-from .fs import read_file, grep_file_content, glob_paths, parse_file, check_api_key
+from pydantic import ValidationError
+from .context import TOOL_RESULT_PREFIX, ChatContext, ContextStep
+from .cassette import ResponseCassette
+from .routing import ModelRouter, Tier, TierMetrics
+from .results import RESULT_STORE, read_result
+from .tools import TOOL_RUNNER
+from .models import Action, ActionType, Tools
+from .fs import (
+    read_file,
+    grep_file_content,
+    search_files,
+    search_fulltext_index,
+    glob_paths,
+    describe_dir_content,
+    parse_file,
+    document_outline,
+    check_api_key,
+)
 
 TOOLS: dict[Tools, Callable] = {
     "read": read_file,
     "grep": grep_file_content,
+    "search": search_files,
+    "search_index": search_fulltext_index,
     "glob": glob_paths,
+    "describe": describe_dir_content,
     "check_api_key": check_api_key,
     "parse_file": parse_file,
+    "outline": document_outline,
+    "read_result": read_result,
 }
 
 SYSTEM_PROMPT = """
@@ -19,73 +42,194 @@ You are FsExplorer, an AI agent whose task is to help the user to explore the fi
 Every time, you will be asked to take one of the following actions:
 
 - Tool call - call one of the file-system tools available to you, specifically:
-    + `read`: read a **text-based** file, providing its path (`file_path` parameter, a string)
-    + `grep`: grep the content of a file, providing its path and the pattern (`file_path` and `pattern` parameters, both strings)
+    + `read`: read a **text-based** file, providing its path (`file_path` parameter, a string). Large files are returned one page at a time: you can optionally pass `offset` and `limit` (integers, counted in lines or bytes depending on `unit`, which can be 'line' or 'byte' and defaults to 'line') and `tail` (boolean, set it to true to read the last `limit` lines or bytes of the file). When a file continues after the returned page, the result ends with a note telling you the `offset` of the next page.
+    + `grep`: grep the content of a file, providing its path and the pattern (`file_path` and `pattern` parameters, both strings). Matching lines are returned with their line number (`N:line`); you can optionally pass `max_matches` (integer, defaults to 100) to cap the number of matching lines and `context_lines` (integer, defaults to 0) to also get the lines surrounding each match (`N-line`)
+    + `search`: grep all the text files within a directory and its sub-directories at once, providing the directory path and the pattern (`directory` and `pattern` parameters, both strings). Binary and ignored files are skipped and the matching lines are grouped by file. You can optionally pass `file_pattern` (string, e.g. '*.md', defaults to '*') to restrict the files to search, `max_matches` (integer, defaults to 200) and `context_lines` (integer, defaults to 0). Prefer this tool over calling `grep` on many files one by one
+    + `search_index`: search a pattern (`pattern` parameter, a string) with the pre-built full-text index, which covers the indexed text files and the content of the cached unstructured files (PDF, DOCX, ...). Much faster than `search` on large trees and the only way to grep cached unstructured files; matches in cached files are reported as `<path> (parsed)`. You can optionally pass `max_matches` (integer, defaults to 200) and `context_lines` (integer, defaults to 0). If the index has not been built, fall back to `search`
     + `glob`: list files within a directory that comply with a certain pattern, providing the directory path and the pattern to search for (`directory` and `pattern` parameters, both strings)
+    + `describe`: list the files and sub-folders of a directory, providing its path (`directory` parameter, a string). Large directories are listed one page at a time, together with a summary of the file extensions they contain: you can optionally pass `offset` and `limit` (integers) to page through the entries, `sort_by` ('name', 'size' or 'mtime', defaults to 'name') and `details` (boolean, set it to true to get the size and last modification time of each entry)
     + `check_api_key`: check whether or not the `LLAMA_CLOUD_API_KEY` is set before using the `parse_file` tool. No paramaeter needed for this tool. Use only once per session, as you can assume that the API key will not change status throughout the course of the session.
-    + `parse_file`: read the content of an **unstructured file** (allowed extensions: .pdf, .doc, .docx, .pptx, .xlsx). Call only if `LLAMA_CLOUD_API_KEY` is set within the environment or if a cache with files is ready.
+    + `parse_file`: read the content of an **unstructured file** (allowed extensions: .pdf, .doc, .docx, .pptx, .xlsx). Office documents and PDFs with a text layer are parsed locally; the others need `LLAMA_CLOUD_API_KEY` to be set within the environment or a cache with files to be ready. Long documents are read one page range at a time: pass `pages` (a string such as '12', '3-5' or '1,4,10-12') to read only the pages you need.
+    + `outline`: get the page count and the table of contents (headings, or the first line of each page) of an **unstructured file**, providing its path (`file_path` parameter, a string). Call it before `parse_file` on long documents, to find out which pages to read.
+    + `read_result`: page through a large tool result that was stored out of the chat history, providing its handle (`handle` parameter, a string such as 'result-3f9a0c1b2e'). Results longer than a few thousand characters are replaced by their beginning and a handle: you can optionally pass `offset` (integer, in characters, defaults to 0) and `limit` (integer, in characters) to read the rest. Prefer narrowing down the original tool call (e.g. `grep` instead of `read`) when you only need a small part of the result.
+- Tool calls - call several of the tools above at once (`tool_calls`, a list of tool calls) when none of the calls depends on the result of another, e.g. to read or grep a few candidate files: they run concurrently and all of their results are returned to you, in order. Prefer this over one tool call per turn whenever you already know the calls you need.
 - Go deeper - go one level deeper in the filesystem, accessing a subfolder of the folder you are currently exploring
 - Ask human - ask a question to the user in order to clarify their intent for a task or if you are uncertain about how to proceed when you reached a certain point. This should be treated as an emergency measure, and you should try to not use human help unless you **really** need it.
 - Stop - you have reached your goal, so you can exit, returning to the user with a final result of all the operations
 
-Choose the action based on the current situation, inferred from the previous chat history.
+Choose the action based on the current situation, inferred from the previous chat history, and report how confident you are that it is the right one (`confidence`, between 0 and 1): be honest, as uncertain steps are handed to a stronger model.
 """
 
 
+# sessions unused for longer than this are dropped
+SESSION_MAX_IDLE = 3600.0
+# one client (and HTTP connection pool) per API key, shared by all the agents of the process
+_CLIENTS: dict[str, GenAIClient] = {}
+
+
+def shared_client(api_key: str) -> GenAIClient:
+    if (client := _CLIENTS.get(api_key)) is None:
+        client = _CLIENTS[api_key] = GenAIClient(api_key=api_key)
+    return client
+
+
 class FsExplorerAgent:
-    def __init__(self, api_key: str | None = None):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        cassette: ResponseCassette | None = None,
+        router: ModelRouter | None = None,
+    ):
         if api_key is None:
             api_key = os.getenv("GOOGLE_API_KEY")
         if api_key is None:
             raise ValueError(
                 "GOOGLE_API_KEY not found within the current environment: please export it or provide it to the class constructor."
             )
-        self._client = GenAIClient(api_key=api_key)
-        self._chat_history: list[Content] = [
-            Content(role="system", parts=[Part.from_text(text=SYSTEM_PROMPT)])
-        ]
+        self._client = shared_client(api_key)
+        self._cassette = ResponseCassette() if cassette is None else cassette
+        self._router = ModelRouter() if router is None else router
+        self._context = ChatContext(SYSTEM_PROMPT)
+
+    @property
+    def _chat_history(self) -> list[Content]:
+        return self._context.messages
+
+    @property
+    def context_steps(self) -> list[ContextStep]:
+        """Size of the context sent at each step and tokens saved by compacting it"""
+        return self._context.steps
+
+    @property
+    def cassette(self) -> ResponseCassette:
+        return self._cassette
+
+    def tier_metrics(self) -> dict[Tier, TierMetrics]:
+        return self._router.metrics()
+
+    @property
+    def tokens_saved(self) -> int:
+        return self._context.tokens_saved
 
     def configure_task(self, task: str) -> None:
-        self._chat_history.append(
-            Content(role="user", parts=[Part.from_text(text=task)])
-        )
+        self._context.append(Content(role="user", parts=[Part.from_text(text=task)]))
 
-    async def take_action(self) -> tuple[Action, ActionType] | None:
-        response = await self._client.aio.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=self._chat_history,  # type: ignore
+    async def _generate(
+        self, tier: Tier, contents: list[Content]
+    ) -> tuple[Content | None, Action | None, float]:
+        start = time.perf_counter()
+        response = await self._cassette.generate_content(
+            self._client,
+            model=self._router.models[tier],
+            contents=contents,
             config={
                 "response_mime_type": "application/json",
                 "response_json_schema": Action.model_json_schema(),
             },
         )
-        if response.candidates is not None:
-            if response.candidates[0].content is not None:
-                self._chat_history.append(response.candidates[0].content)
-            if response.text is not None:
-                action = Action.model_validate_json(response.text)
-                if action.to_action_type() == "toolcall":
-                    toolcall = cast(ToolCallAction, action.action)
-                    await self.call_tool(
-                        tool_name=toolcall.tool_name, tool_input=toolcall.to_fn_args()
-                    )
-                return action, action.to_action_type()
-        return None
+        latency = time.perf_counter() - start
+        if not response.candidates:
+            return None, None, latency
+        content = response.candidates[0].content
+        try:
+            action = (
+                Action.model_validate_json(response.text)
+                if response.text is not None
+                else None
+            )
+        except ValidationError:
+            if tier == "strong":
+                raise
+            action = None
+        return content, action, latency
 
-    async def call_tool(self, tool_name: Tools, tool_input: dict[str, Any]) -> None:
+    async def take_action(self) -> tuple[Action, ActionType] | None:
+        contents = self._context.compact()
+        tier = self._router.tier()
+        content, action, latency = await self._generate(tier, contents)
+        if self._router.should_escalate(tier, action):
+            self._router.record(tier, latency)
+            tier = "strong"
+            content, action, latency = await self._generate(tier, contents)
+        self._router.record(tier, latency, action)
+        if content is not None:
+            self._context.append(content)
+        if action is None:
+            return None
+        if action.to_action_type() == "toolcall":
+            await self.call_tools(
+                [
+                    (toolcall.tool_name, toolcall.to_fn_args())
+                    for toolcall in action.tool_calls()
+                ]
+            )
+        return action, action.to_action_type()
+
+    async def _run_tool(self, tool_name: Tools, tool_input: dict[str, Any]) -> str:
         try:
-            if tool_name != "parse_file":
-                result = TOOLS[tool_name](**tool_input)
-            else:
-                result = await TOOLS[tool_name](**tool_input)
+            result = await TOOL_RUNNER.run(tool_name, TOOLS[tool_name], tool_input)
         except Exception as e:
             result = f"An error occurred while calling tool {tool_name} with {tool_input}: {e}"
-        self._chat_history.append(
+        if tool_name != "read_result":
+            result = RESULT_STORE.inline(tool_name, str(result))
+        return str(result)
+
+    def _append_tool_result(self, tool_name: Tools, result: str) -> None:
+        self._context.append(
             Content(
                 role="user",
                 parts=[
-                    Part.from_text(text=f"Tool result for {tool_name}:\n\n{result}")
+                    Part.from_text(text=f"{TOOL_RESULT_PREFIX}{tool_name}:\n\n{result}")
                 ],
             )
         )
+
+    async def call_tool(self, tool_name: Tools, tool_input: dict[str, Any]) -> None:
+        self._append_tool_result(tool_name, await self._run_tool(tool_name, tool_input))
         return None
+
+    async def call_tools(self, tool_calls: list[tuple[Tools, dict[str, Any]]]) -> None:
+        """Run independent tool calls concurrently, appending their results in order"""
+        results = await asyncio.gather(
+            *(
+                self._run_tool(tool_name, tool_input)
+                for tool_name, tool_input in tool_calls
+            )
+        )
+        for (tool_name, _), result in zip(tool_calls, results):
+            self._append_tool_result(tool_name, result)
+        return None
+
+
+class AgentSessions:
+    """One agent, and thus one chat history, per exploration running in the process"""
+
+    def __init__(
+        self,
+        agent_factory: Callable[[], FsExplorerAgent] = FsExplorerAgent,
+        max_idle: float = SESSION_MAX_IDLE,
+    ) -> None:
+        self._agent_factory = agent_factory
+        self.max_idle = max_idle
+        self._agents: dict[str, tuple[FsExplorerAgent, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+    def get(self, session_id: str) -> FsExplorerAgent:
+        """The agent of a session, created on first use"""
+        now = time.monotonic()
+        # runs that ended without releasing their agent, e.g. timed out between steps
+        for idle_id, (_, last_used) in list(self._agents.items()):
+            if now - last_used > self.max_idle:
+                del self._agents[idle_id]
+        if (entry := self._agents.get(session_id)) is None:
+            agent = self._agent_factory()
+        else:
+            agent = entry[0]
+        self._agents[session_id] = (agent, now)
+        return agent
+
+    def release(self, session_id: str) -> FsExplorerAgent | None:
+        entry = self._agents.pop(session_id, None)
+        return None if entry is None else entry[0]
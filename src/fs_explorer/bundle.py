@@ -0,0 +1,190 @@
+import os
+import mmap
+import struct
+import tempfile
+
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+# layout: header | concatenated UTF-8 texts | path strings | path table | digest table.
+# Both tables have fixed-size records sorted by key, so that lookups are binary
+# searches over the memory map and nothing but the header is read into memory
+MAGIC = b"FSXB\x01"
+_HEADER = struct.Struct(">5sQQQQ")
+# path offset, path length, size, mtime_ns, digest, text offset, text length
+_PATH_RECORD = struct.Struct(">QIqq32sQQ")
+_DIGEST_RECORD = struct.Struct(">32sQQ")
+_TEXT_DIGEST_PREFIX = "text-"
+
+
+class BundleEntry(NamedTuple):
+    path: str
+    size: int | None
+    mtime_ns: int | None
+    digest: str
+
+
+class BundleReport(NamedTuple):
+    paths: int
+    documents: int
+    text_bytes: int
+    bundle_bytes: int
+
+
+def _digest_bytes(digest: str) -> bytes:
+    return bytes.fromhex(digest.removeprefix(_TEXT_DIGEST_PREFIX))
+
+
+def write_bundle(
+    entries: Iterable[tuple[BundleEntry, str]], path: Path
+) -> BundleReport:
+    """Write a bundle atomically: the file at `path` is either the old one or complete"""
+    os.makedirs(path.parent, exist_ok=True)
+    texts: dict[bytes, tuple[int, int]] = {}
+    records: list[tuple[bytes, BundleEntry, bytes]] = []
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            offset = _HEADER.size
+            for entry, text in entries:
+                key = _digest_bytes(entry.digest)
+                if key not in texts:
+                    data = text.encode("utf-8")
+                    f.write(data)
+                    texts[key] = (offset, len(data))
+                    offset += len(data)
+                records.append((entry.path.encode("utf-8"), entry, key))
+            text_bytes = offset - _HEADER.size
+            records.sort(key=lambda record: record[0])
+            path_offsets = []
+            for encoded, _, _ in records:
+                path_offsets.append(offset)
+                f.write(encoded)
+                offset += len(encoded)
+            paths_table = offset
+            for (encoded, entry, key), path_offset in zip(records, path_offsets):
+                text_offset, text_length = texts[key]
+                f.write(
+                    _PATH_RECORD.pack(
+                        path_offset,
+                        len(encoded),
+                        -1 if entry.size is None else entry.size,
+                        -1 if entry.mtime_ns is None else entry.mtime_ns,
+                        key,
+                        text_offset,
+                        text_length,
+                    )
+                )
+            digests_table = paths_table + len(records) * _PATH_RECORD.size
+            for key in sorted(texts):
+                f.write(_DIGEST_RECORD.pack(key, *texts[key]))
+            f.seek(0)
+            f.write(
+                _HEADER.pack(
+                    MAGIC, len(records), len(texts), paths_table, digests_table
+                )
+            )
+        os.chmod(temporary, 0o444)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return BundleReport(
+        paths=len(records),
+        documents=len(texts),
+        text_bytes=text_bytes,
+        bundle_bytes=os.path.getsize(path),
+    )
+
+
+class CacheBundle:
+    """Read-only view of a bundle, served from a memory map of the file"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._paths, self._documents, self._paths_table, self._digests_table = (
+            _HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a parsed files cache bundle")
+
+    def __len__(self) -> int:
+        return self._paths
+
+    @property
+    def documents(self) -> int:
+        return self._documents
+
+    def _path_record(self, index: int) -> tuple:
+        return _PATH_RECORD.unpack_from(
+            self._map, self._paths_table + index * _PATH_RECORD.size
+        )
+
+    def _path_at(self, record: tuple) -> bytes:
+        return self._map[record[0] : record[0] + record[1]]
+
+    def _entry(self, record: tuple) -> BundleEntry:
+        size, mtime_ns, key = record[2], record[3], record[4]
+        digest = key.hex() if size >= 0 else _TEXT_DIGEST_PREFIX + key.hex()
+        return BundleEntry(
+            path=self._path_at(record).decode("utf-8"),
+            size=None if size < 0 else size,
+            mtime_ns=None if mtime_ns < 0 else mtime_ns,
+            digest=digest,
+        )
+
+    def lookup(self, resolved_path: str) -> BundleEntry | None:
+        target = resolved_path.encode("utf-8")
+        low, high = 0, self._paths
+        while low < high:
+            middle = (low + high) // 2
+            if self._path_at(self._path_record(middle)) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._paths:
+            record = self._path_record(low)
+            if self._path_at(record) == target:
+                return self._entry(record)
+        return None
+
+    def _find_document(self, digest: str) -> tuple[int, int] | None:
+        try:
+            target = _digest_bytes(digest)
+        except ValueError:
+            return None
+        low, high = 0, self._documents
+        while low < high:
+            middle = (low + high) // 2
+            key, offset, length = _DIGEST_RECORD.unpack_from(
+                self._map, self._digests_table + middle * _DIGEST_RECORD.size
+            )
+            if key == target:
+                return offset, length
+            if key < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def has_document(self, digest: str) -> bool:
+        return self._find_document(digest) is not None
+
+    def get_text(self, digest: str) -> str | None:
+        if (found := self._find_document(digest)) is None:
+            return None
+        offset, length = found
+        return self._map[offset : offset + length].decode("utf-8")
+
+    def iter_entries(self) -> Iterator[tuple[BundleEntry, str]]:
+        for index in range(self._paths):
+            record = self._path_record(index)
+            text = self._map[record[5] : record[5] + record[6]].decode("utf-8")
+            yield self._entry(record), text
+
+    def close(self) -> None:
+        self._map.close()
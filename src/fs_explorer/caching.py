@@ -1,95 +1,846 @@
 import os
+import sys
+import json
+import atexit
+import time
 import asyncio
+import hashlib
+import itertools
 import logging
+import threading
+import weakref
 
-from typing import cast
+from collections import OrderedDict
+from typing import Any, Iterator, Literal, NamedTuple, TextIO, cast
 from diskcache import Cache
 from pathlib import Path
-from llama_cloud_services.parse.utils import ResultType
-from llama_cloud_services.parse.types import JobResult
-from llama_cloud_services import LlamaParse
+from .bundle import BundleEntry, BundleReport, CacheBundle, write_bundle
+from .scheduler import ParseScheduler
+from .parsers import Parser
+from .parsing import PARSE_POOL
+from .compression import (
+    compress_text,
+    decompress_text,
+    is_compressed,
+    train_dictionary,
+)
 
 CACHING_DIR = Path("tmp/cache")
+HASH_CHUNK_SIZE = 1024 * 1024
+COMPRESS_ENTRIES = os.getenv("FS_EXPLORER_CACHE_COMPRESSION", "1") != "0"
+DICTIONARY_SAMPLE_SIZE = 500
+MANIFEST_PATH = CACHING_DIR.parent / "load-cache-manifest.jsonl"
+MEMORY_CACHE_BYTES = int(os.getenv("FS_EXPLORER_MEMORY_CACHE_MB", "64")) * 1024 * 1024
+MAX_MEMORY_PATHS = 10_000
+# the shared lookup counters are updated in batches, not on every lookup: after
+# STATS_FLUSH_EVERY lookups or STATS_FLUSH_SECONDS, and when the process exits
+STATS_FLUSH_EVERY = 100
+STATS_FLUSH_SECONDS = 5.0
+
+# size policy of the parsed documents store (the metadata store is never evicted from)
+EvictionPolicy = Literal["lru", "lfu", "lrs", "none"]
+_EVICTION_POLICIES: dict[str, str] = {
+    "lru": "least-recently-used",
+    "lfu": "least-frequently-used",
+    "lrs": "least-recently-stored",
+    "none": "none",
+}
+CACHE_SIZE_LIMIT = int(os.getenv("FS_EXPLORER_CACHE_MAX_MB", "1024")) * 1024 * 1024
+# lru and lfu turn every cache hit into a write to the SQLite index (diskcache
+# records the access time or count), which serializes concurrent readers: they
+# are opt-in, the default only writes when an entry is stored
+CACHE_EVICTION_POLICY = cast(
+    EvictionPolicy, os.getenv("FS_EXPLORER_CACHE_EVICTION", "lrs")
+)
+DEFAULT_BUNDLE_PATH = CACHING_DIR.parent / "cache.bundle"
+# read-only bundle (see `fs_explorer.bundle`) consulted when the cache itself misses
+CACHE_BUNDLE = (
+    Path(os.environ["FS_EXPLORER_CACHE_BUNDLE"])
+    if os.getenv("FS_EXPLORER_CACHE_BUNDLE")
+    else None
+)
+# seconds after which a parsed document expires, no expiration if unset
+CACHE_TTL = (
+    float(os.environ["FS_EXPLORER_CACHE_TTL"])
+    if os.getenv("FS_EXPLORER_CACHE_TTL")
+    else None
+)
+WALK_BATCH_SIZE = 256
+QUEUE_SIZE_PER_WORKER = 4
+
+
+class CachedFileMetadata(NamedTuple):
+    size: int | None
+    mtime_ns: int | None
+    digest: str
+
+
+def file_digest(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _path_key(resolved_path: str) -> tuple[str, str]:
+    return ("path", resolved_path)
+
+
+def _blob_key(digest: str) -> tuple[str, str]:
+    return ("blob", digest)
+
+
+class CompressionReport(NamedTuple):
+    entries: int
+    compressed: int
+    raw_bytes: int
+    stored_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+
+
+class CacheStats(NamedTuple):
+    entries: int
+    total_bytes: int
+    hits: int
+    misses: int
+
+    @property
+    def average_entry_bytes(self) -> float:
+        return self.total_bytes / self.entries if self.entries else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class GarbageCollectionReport(NamedTuple):
+    removed_paths: int
+    removed_entries: int
+    expired_entries: int
+    reclaimed_bytes: int
+
+
+class MemoryTierStats(NamedTuple):
+    entries: int
+    total_bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _MemoryTier:
+    """
+    In-process LRU of decoded parsed text, keyed by source digest and bounded by
+    (approximate) memory size. Entries are immutable: a digest always maps to the
+    same text, so the tier cannot go stale when other processes write to the cache.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        # digest -> (text, expiration timestamp of the on-disk entry)
+        self._entries: OrderedDict[str, tuple[str, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _discard(self, digest: str) -> None:
+        if (previous := self._entries.pop(digest, None)) is not None:
+            self.total_bytes -= sys.getsizeof(previous[0])
+
+    def get(self, digest: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                self._discard(digest)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(digest)
+            return entry[0]
+
+    def put(self, digest: str, content: str, expire_at: float | None) -> None:
+        size = sys.getsizeof(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(digest)
+            self._entries[digest] = (content, expire_at)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= sys.getsizeof(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> MemoryTierStats:
+        return MemoryTierStats(
+            entries=len(self._entries),
+            total_bytes=self.total_bytes,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
 
 
 class ParsedFileCache:
-    def __init__(self) -> None:
-        self._cache = Cache(directory=str(CACHING_DIR))
-        self._is_warmed_up = CACHING_DIR.is_dir()
+    """
+    Content-addressed cache of parsed files.
+
+    Parsed text is stored once per source content hash (`("blob", digest)`), while
+    every path maps to the size, mtime and digest of the file it was parsed from
+    (`("path", resolved_path)`), so that lookups can be validated with a single
+    `stat` and identical files at different paths share one entry.
+
+    Path metadata and the lookup counters live in a separate store
+    (`<directory>/metadata`), so that the main store only holds parsed documents and
+    its entry count and volume can be read in constant time.
+
+    Parsed text is stored zlib-compressed (see `fs_explorer.compression`), using a
+    preset dictionary trained on the cached corpus for small entries once
+    `train_dictionary` has been called. Uncompressed values are still read
+    transparently, and `compress_entries` migrates them in place.
+
+    Decoded text and path metadata are also kept in memory (up to `memory_bytes`,
+    0 disables it), so that repeated reads of the same document skip SQLite and
+    decompression. Path metadata is validated with `stat` just like on disk.
+    Both in-memory maps are locked, so the cache can be used from worker threads.
+
+    The parsed documents store is bounded by `size_limit` (bytes), evicting entries
+    according to `eviction_policy`, and entries expire after `ttl` seconds if set.
+    An evicted or expired document is simply a miss: its path metadata stays valid.
+
+    A bundle exported from another cache can be mounted read-only (`bundle`): its
+    path metadata and documents are served straight from a memory map when this
+    cache has no entry of its own.
+    """
+
+    def __init__(
+        self,
+        directory: Path = CACHING_DIR,
+        compress: bool = COMPRESS_ENTRIES,
+        memory_bytes: int = MEMORY_CACHE_BYTES,
+        size_limit: int = CACHE_SIZE_LIMIT,
+        eviction_policy: EvictionPolicy = CACHE_EVICTION_POLICY,
+        ttl: float | None = CACHE_TTL,
+        bundle: Path | None = CACHE_BUNDLE,
+    ) -> None:
+        if eviction_policy not in _EVICTION_POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {eviction_policy!r}, expected one of {', '.join(_EVICTION_POLICIES)}"
+            )
+        self._directory = directory
+        self._compress = compress
+        self._ttl = ttl
+        self._cache = Cache(
+            directory=str(directory),
+            size_limit=size_limit,
+            eviction_policy=_EVICTION_POLICIES[eviction_policy],
+        )
+        # path metadata, counters and compression dictionaries must never be evicted
+        self._metadata = Cache(
+            directory=str(directory / "metadata"), eviction_policy="none"
+        )
+        self._dictionaries: dict[int, bytes] = {}
+        self._is_warmed_up = directory.is_dir()
+        self._memory = _MemoryTier(memory_bytes) if memory_bytes > 0 else None
+        self._paths: OrderedDict[str, CachedFileMetadata] = OrderedDict()
+        self._paths_lock = threading.Lock()
+        self._pending_stats = {"hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+        self._stats_flushed_at = time.monotonic()
+        self._bundle = CacheBundle(bundle) if bundle is not None else None
+        _OPEN_CACHES.add(self)
 
     def warmup(self) -> None:
         if not self._is_warmed_up:
-            os.makedirs(CACHING_DIR, exist_ok=True)
+            os.makedirs(self._directory, exist_ok=True)
             self._is_warmed_up = True
         return None
 
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
     @property
     def is_empty(self) -> bool:
-        return len(list(self._cache.iterkeys())) == 0
+        return len(self._cache) == 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _flush_stats(self) -> None:
+        with self._stats_lock:
+            pending = self._pending_stats
+            self._pending_stats = {"hits": 0, "misses": 0}
+            self._stats_flushed_at = time.monotonic()
+        for name, count in pending.items():
+            if count:
+                self._metadata.incr(("stats", name), count)
+
+    def stats(self) -> CacheStats:
+        self._flush_stats()
+        return CacheStats(
+            entries=len(self._cache),
+            total_bytes=self._cache.volume(),
+            hits=cast(int, self._metadata.get(("stats", "hits"), 0)),
+            misses=cast(int, self._metadata.get(("stats", "misses"), 0)),
+        )
+
+    def memory_stats(self) -> MemoryTierStats | None:
+        return self._memory.stats() if self._memory is not None else None
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._pending_stats = {"hits": 0, "misses": 0}
+        self._metadata.delete(("stats", "hits"))
+        self._metadata.delete(("stats", "misses"))
+
+    def _remember_path(self, resolved_path: str, metadata: CachedFileMetadata) -> None:
+        if self._memory is None:
+            return
+        with self._paths_lock:
+            self._paths[resolved_path] = metadata
+            self._paths.move_to_end(resolved_path)
+            if len(self._paths) > MAX_MEMORY_PATHS:
+                self._paths.popitem(last=False)
+
+    def _get_metadata(self, resolved_path: str) -> CachedFileMetadata | None:
+        if (remembered := self._paths.get(resolved_path)) is not None:
+            return remembered
+        metadata = self._metadata.get(_path_key(resolved_path))
+        if metadata is None:
+            if self._bundle is not None:
+                if (entry := self._bundle.lookup(resolved_path)) is not None:
+                    return CachedFileMetadata(entry.size, entry.mtime_ns, entry.digest)
+            return None
+        remembered = CachedFileMetadata(*cast(tuple, metadata))
+        self._remember_path(resolved_path, remembered)
+        return remembered
+
+    def _set_metadata(self, resolved_path: str, metadata: CachedFileMetadata) -> None:
+        # stored as a plain tuple, so that the cache can be read without this module
+        self._metadata.set(_path_key(resolved_path), tuple(metadata))
+        self._remember_path(resolved_path, metadata)
+
+    def _get_dictionary(self, dictionary_id: int) -> bytes:
+        if dictionary_id not in self._dictionaries:
+            self._dictionaries[dictionary_id] = cast(
+                bytes, self._metadata[("zdict", dictionary_id)]
+            )
+        return self._dictionaries[dictionary_id]
+
+    def _get_value(self, key: str | tuple[str, str]) -> str | None:
+        return self._decode(self._cache.get(key))
+
+    def _decode(self, value: object) -> str | None:
+        if is_compressed(value):
+            return decompress_text(cast(bytes, value), self._get_dictionary)
+        return cast(str | None, value)
+
+    def _compress_text(self, content: str) -> bytes:
+        dictionary_id = cast(int, self._metadata.get(("zdict", "current"), 0))
+        dictionary = self._get_dictionary(dictionary_id) if dictionary_id else None
+        return compress_text(content, dictionary, dictionary_id)
+
+    def _encode(self, content: str) -> str | bytes:
+        return self._compress_text(content) if self._compress else content
+
+    def _get_blob(self, digest: str) -> str | None:
+        if self._memory is not None:
+            if (content := self._memory.get(digest)) is not None:
+                return content
+        value, expire_at = cast(
+            tuple[Any, float | None],
+            self._cache.get(_blob_key(digest), expire_time=True),
+        )
+        content = self._decode(value)
+        if self._memory is not None and content is not None:
+            self._memory.put(digest, content, expire_at)
+        if content is None and self._bundle is not None:
+            # not worth keeping in the memory tier: the bundle text is not compressed
+            return self._bundle.get_text(digest)
+        return content
+
+    def _has_blob(self, digest: str) -> bool:
+        if _blob_key(digest) in self._cache:
+            return True
+        return self._bundle is not None and self._bundle.has_document(digest)
 
     def add_file(self, file_path: str, content: str) -> None:
         resolved_path = str(Path(file_path).resolve())
-        self._cache.add(resolved_path, content)
+        try:
+            stat = os.stat(resolved_path)
+            metadata = CachedFileMetadata(
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                digest=file_digest(resolved_path),
+            )
+        except OSError:
+            # the source is not readable: address the entry by its parsed content
+            metadata = CachedFileMetadata(
+                size=None,
+                mtime_ns=None,
+                digest="text-" + hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            )
+        self._cache.set(
+            _blob_key(metadata.digest), self._encode(content), expire=self._ttl
+        )
+        self._set_metadata(resolved_path, metadata)
+        if self._memory is not None:
+            expire_at = time.time() + self._ttl if self._ttl is not None else None
+            self._memory.put(metadata.digest, content, expire_at)
+        # drop the entry written by the older, path-keyed format
+        self._cache.delete(resolved_path)
 
-    def get_file(self, file_path: str) -> str | None:
+    def _is_valid_legacy(self, resolved_path: str, stat: os.stat_result) -> bool:
+        """
+        Whether there is an entry of the older, path-keyed format for this file that
+        is still valid. Such entries have no size, mtime or digest: one stored before
+        the last modification of the file is stale, and is dropped.
+        """
+        # the store time is only kept in diskcache's own table
+        db_key, raw = self._cache._disk.put(resolved_path)
+        row = self._cache._sql(
+            "SELECT store_time FROM Cache WHERE key = ? AND raw = ?", (db_key, raw)
+        ).fetchone()
+        if row is None:
+            return False
+        if stat.st_mtime_ns / 1e9 > row[0]:
+            self._cache.delete(resolved_path)
+            return False
+        return True
+
+    def has_file(self, file_path: str) -> bool:
         resolved_path = str(Path(file_path).resolve())
-        return cast(str | None, self._cache.get(resolved_path))
+        metadata = self._get_metadata(resolved_path)
+        try:
+            stat = os.stat(resolved_path)
+        except OSError:
+            return metadata is not None and self._has_blob(metadata.digest)
+        if metadata is None or (metadata.size, metadata.mtime_ns) != (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            if self._is_valid_legacy(resolved_path, stat):
+                return True
+            metadata = CachedFileMetadata(
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                digest=file_digest(resolved_path),
+            )
+            self._set_metadata(resolved_path, metadata)
+        return self._has_blob(metadata.digest)
+
+    def get_file(self, file_path: str) -> str | None:
+        content = self._lookup(str(Path(file_path).resolve()))
+        with self._stats_lock:
+            self._pending_stats["hits" if content is not None else "misses"] += 1
+            flush = (
+                sum(self._pending_stats.values()) >= STATS_FLUSH_EVERY
+                or time.monotonic() - self._stats_flushed_at >= STATS_FLUSH_SECONDS
+            )
+        if flush:
+            self._flush_stats()
+        return content
+
+    def _lookup(self, resolved_path: str) -> str | None:
+        metadata = self._get_metadata(resolved_path)
+        try:
+            stat = os.stat(resolved_path)
+        except OSError:
+            # the source is gone: serve whatever was cached for this path
+            if metadata is not None:
+                return self._get_blob(metadata.digest)
+            return self._get_value(resolved_path)
+        if metadata is not None and (metadata.size, metadata.mtime_ns) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            return self._get_blob(metadata.digest)
+        # new or modified file: hash it, as its content might already be cached
+        digest = file_digest(resolved_path)
+        content = self._get_blob(digest)
+        if (
+            content is None
+            and metadata is None
+            and self._is_valid_legacy(resolved_path, stat)
+        ):
+            content = self._get_value(resolved_path)
+            if content is not None:
+                self._cache.set(
+                    _blob_key(digest), self._encode(content), expire=self._ttl
+                )
+                self._cache.delete(resolved_path)
+        # remembering the digest also makes later misses for this file cheap
+        self._set_metadata(
+            resolved_path,
+            CachedFileMetadata(
+                size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest
+            ),
+        )
+        return content
+
+    def iter_files(self) -> Iterator[tuple[str, str]]:
+        for entry, content in self._iter_entries():
+            yield entry.path, content
+
+    def _iter_entries(self) -> Iterator[tuple[BundleEntry, str]]:
+        seen: set[str] = set()
+        for key in self._metadata.iterkeys():
+            if isinstance(key, tuple) and key[0] == "path":
+                metadata = self._get_metadata(key[1])
+                if metadata is not None:
+                    content = self._get_blob(metadata.digest)
+                    if content is not None:
+                        seen.add(key[1])
+                        yield BundleEntry(key[1], *metadata), content
+        for key in self._cache.iterkeys():
+            if isinstance(key, str):
+                content = self._get_value(key)
+                if content is not None:
+                    seen.add(key)
+                    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                    yield BundleEntry(key, None, None, "text-" + digest), content
+        if self._bundle is not None:
+            for entry, content in self._bundle.iter_entries():
+                if entry.path not in seen:
+                    yield entry, content
+
+    def export_bundle(self, path: Path) -> BundleReport:
+        """Pack every cached document (and the mounted bundle) into a single bundle file"""
+        return write_bundle(self._iter_entries(), path)
+
+    def import_bundle(self, path: Path) -> int:
+        """Copy the entries of a bundle into this cache, without any parse or hash"""
+        bundle = CacheBundle(path)
+        imported = 0
+        try:
+            for entry, content in bundle.iter_entries():
+                if _blob_key(entry.digest) not in self._cache:
+                    self._cache.set(
+                        _blob_key(entry.digest), self._encode(content), expire=self._ttl
+                    )
+                self._set_metadata(
+                    entry.path,
+                    CachedFileMetadata(entry.size, entry.mtime_ns, entry.digest),
+                )
+                imported += 1
+        finally:
+            bundle.close()
+        return imported
+
+    def train_dictionary(self, sample_size: int = DICTIONARY_SAMPLE_SIZE) -> int:
+        samples = [
+            content for _, content in itertools.islice(self.iter_files(), sample_size)
+        ]
+        dictionary = train_dictionary(samples)
+        if not dictionary:
+            return 0
+        # dictionaries are never overwritten: older entries keep pointing to theirs
+        dictionary_id = cast(int, self._metadata.incr(("zdict", "last_id")))
+        self._metadata.set(("zdict", dictionary_id), dictionary)
+        self._metadata.set(("zdict", "current"), dictionary_id)
+        return dictionary_id
+
+    def compress_entries(self) -> CompressionReport:
+        entries = compressed = raw_bytes = stored_bytes = 0
+        for key in self._cache.iterkeys():
+            value, expire_at = cast(
+                tuple[Any, float | None], self._cache.get(key, expire_time=True)
+            )
+            if value is None:
+                continue
+            entries += 1
+            if isinstance(value, str):
+                raw_bytes += len(value.encode("utf-8"))
+                value = self._compress_text(value)
+                # a migrated entry expires when the original one would have
+                expire = expire_at - time.time() if expire_at is not None else None
+                self._cache.set(key, value, expire=expire)
+                compressed += 1
+            else:
+                content = self._get_value(key) or ""
+                raw_bytes += len(content.encode("utf-8"))
+            stored_bytes += len(cast(bytes, value))
+        return CompressionReport(
+            entries=entries,
+            compressed=compressed,
+            raw_bytes=raw_bytes,
+            stored_bytes=stored_bytes,
+        )
+
+    def collect_garbage(self) -> GarbageCollectionReport:
+        """
+        Drop the entries of source files that no longer exist, the parsed documents
+        that no path refers to anymore and the expired ones, then enforce the size limit.
+        """
+        removed_paths = removed_entries = reclaimed = 0
+        referenced: set[str] = set()
+        for key in list(self._metadata.iterkeys()):
+            if not (isinstance(key, tuple) and key[0] == "path"):
+                continue
+            metadata = self._get_metadata(key[1])
+            if os.path.exists(key[1]):
+                if metadata is not None:
+                    referenced.add(metadata.digest)
+                continue
+            self._metadata.delete(key)
+            removed_paths += 1
+        for key in list(self._cache.iterkeys()):
+            if isinstance(key, tuple) and key[0] == "blob":
+                orphan = key[1] not in referenced
+            else:
+                # entry of the older, path-keyed format
+                orphan = not os.path.exists(cast(str, key))
+            if not orphan:
+                continue
+            value = self._cache.get(key)
+            if self._cache.delete(key):
+                removed_entries += 1
+                if isinstance(value, str):
+                    reclaimed += len(value.encode("utf-8"))
+                elif isinstance(value, bytes):
+                    reclaimed += len(value)
+        count_before = len(self._cache)
+        volume_before = self._cache.volume()
+        expired = self._cache.expire()
+        self._cache.cull()
+        reclaimed += max(volume_before - self._cache.volume(), 0)
+        removed_entries += count_before - len(self._cache) - expired
+        self._paths.clear()
+        if self._memory is not None:
+            self._memory.clear()
+        return GarbageCollectionReport(
+            removed_paths=removed_paths,
+            removed_entries=removed_entries,
+            expired_entries=expired,
+            reclaimed_bytes=reclaimed,
+        )
 
     def close(self) -> None:
+        _OPEN_CACHES.discard(self)
+        self._flush_stats()
+        if self._bundle is not None:
+            self._bundle.close()
         self._cache.close()
+        self._metadata.close()
+
+
+# caches whose pending lookup counters are flushed at exit, as `close` is optional
+_OPEN_CACHES: weakref.WeakSet[ParsedFileCache] = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_caches() -> None:
+    for cache in list(_OPEN_CACHES):
+        try:
+            cache._flush_stats()
+        except Exception as e:
+            # e.g. the cache directory was removed in the meantime
+            logging.info(
+                f"Could not save the lookup counters of {cache.directory}: {e}"
+            )
 
 
 CACHE = ParsedFileCache()
 
 
-async def parse_and_cache(directory: str, recursive: bool, to_skip: list[str]) -> None:
+class LoadCacheReport(NamedTuple):
+    parsed: int
+    skipped: int
+    failed: int
+    resumed: int
+
+
+class _LoadCacheManifest:
+    """
+    Append-only (JSON lines) record of a `load-cache` run: a header with the run
+    parameters, then one line per processed file. An interrupted run with the same
+    parameters resumes from it; a completed run removes it.
+    """
+
+    def __init__(self, path: Path, parameters: dict[str, Any]) -> None:
+        self._path = path
+        self._parameters = parameters
+        self._file: TextIO | None = None
+
+    def open(self) -> set[str]:
+        done: set[str] = set()
+        if self._path.is_file():
+            with open(self._path, "r") as f:
+                lines = f.read().splitlines()
+            header = json.loads(lines[0]) if lines else None
+            if header == self._parameters:
+                for line in lines[1:]:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # the last line of a run that was killed mid-write
+                        continue
+                    if record["status"] in ("parsed", "skipped"):
+                        done.add(record["file"])
+                self._file = open(self._path, "a")
+                return done
+        os.makedirs(self._path.parent, exist_ok=True)
+        self._file = open(self._path, "w")
+        self._file.write(json.dumps(self._parameters) + "\n")
+        self._file.flush()
+        return done
+
+    def record(self, file_path: str, status: str, error: str | None = None) -> None:
+        if self._file is not None:
+            self._file.write(
+                json.dumps({"file": file_path, "status": status, "error": error}) + "\n"
+            )
+            self._file.flush()
+
+    def close(self, completed: bool) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if completed:
+            self._path.unlink(missing_ok=True)
+
+
+def iter_files_to_parse(
+    directory: str, recursive: bool, to_skip: list[str]
+) -> Iterator[str]:
+    """
+    Lazily walk a directory for the files to parse. Entries in `to_skip` are paths
+    relative to the directory: a skipped directory is not descended into.
+    """
+    root = os.path.abspath(directory)
+    skipped = {os.path.normpath(path) for path in to_skip}
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            if os.path.relpath(entry.path, root) in skipped:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
+            except OSError:
+                continue
+        if recursive:
+            stack.extend(reversed(subdirectories))
+
+
+async def parse_and_cache(
+    directory: str,
+    recursive: bool,
+    to_skip: list[str],
+    incremental: bool = True,
+    manifest_path: Path = MANIFEST_PATH,
+    cache: ParsedFileCache = CACHE,
+    parser: Parser | None = None,
+    scheduler: ParseScheduler | None = None,
+) -> LoadCacheReport:
     logging.basicConfig(
         filename="fs-explorer.log",
         filemode="w",
         level=logging.INFO,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
-    CACHE.warmup()
+    cache.warmup()
     dir_path = Path(directory)
-    to_skip_resolved = [str((dir_path / path).resolve()) for path in to_skip]
-    if not recursive:
-        files = []
-        fls = os.listdir(dir_path)
-        for fl in fls:
-            resolved = str(Path(dir_path / fl).resolve())
-            if resolved not in to_skip_resolved:
-                files.append(resolved)
-    else:
-        files = []
-        for root, dirs, fls in os.walk(dir_path):
-            dirs[:] = [
-                str((Path(root) / d).resolve())
-                for d in dirs
-                if d not in to_skip_resolved
-            ]  # type: ignore[invalid-assignment]
-            fls[:] = [
-                str((Path(root) / f).resolve())
-                for f in fls
-                if f not in to_skip_resolved
-            ]  # type: ignore[invalid-assignment]
-            for fl in fls:
-                files.append(str((Path(root) / fl).resolve()))
-    semaphore = asyncio.Semaphore(5)
-    parser = LlamaParse(
-        api_key=cast(str, os.getenv("LLAMA_CLOUD_API_KEY")),
-        result_type=ResultType.TXT,
-        fast_mode=True,
+    manifest = _LoadCacheManifest(
+        manifest_path,
+        {
+            "directory": str(dir_path.resolve()),
+            "recursive": recursive,
+            "skip": sorted(to_skip),
+            "incremental": incremental,
+        },
     )
+    done = manifest.open()
+    counts = {"parsed": 0, "skipped": 0, "failed": 0, "resumed": 0}
+    if scheduler is None:
+        scheduler = ParseScheduler()
+    if parser is None:
+        parser = PARSE_POOL.backend(scheduler)
 
     async def parse_job(file_path: str) -> None:
-        async with semaphore:
-            result = cast(JobResult, await parser.aparse(file_path=file_path))
-            if result.error is None:
-                text = await result.aget_text()
-                CACHE.add_file(file_path, text)
-            else:
-                logging.info(
-                    f"Could not parse file {file_path} because of {result.error}"
-                )
+        if file_path in done:
+            counts["resumed"] += 1
+            return None
+        error = None
+        try:
+            # both may hash the whole file: keep them off the event loop
+            if incremental and await asyncio.to_thread(cache.has_file, file_path):
+                counts["skipped"] += 1
+                manifest.record(file_path, "skipped")
+                return None
+            text = await parser.parse(file_path)
+            await asyncio.to_thread(cache.add_file, file_path, text)
+        except Exception as e:
+            error = str(e)
+        if error is None:
+            counts["parsed"] += 1
+            manifest.record(file_path, "parsed")
+        else:
+            counts["failed"] += 1
+            manifest.record(file_path, "failed", error)
+            logging.info(f"Could not parse file {file_path} because of {error}")
+
+    # the walker streams into a bounded queue drained by a fixed pool of workers (the
+    # scheduler decides how many of them parse at once), so memory stays flat
+    workers = scheduler.max_concurrency
+    queue: asyncio.Queue[str | None] = asyncio.Queue(
+        maxsize=QUEUE_SIZE_PER_WORKER * workers
+    )
+
+    async def walk() -> None:
+        paths = iter_files_to_parse(directory, recursive, to_skip)
+        # the walk does blocking I/O: advance it in a thread, one batch at a time
+        while batch := await asyncio.to_thread(
+            lambda: list(itertools.islice(paths, WALK_BATCH_SIZE))
+        ):
+            for file_path in batch:
+                await queue.put(file_path)
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work() -> None:
+        while (file_path := await queue.get()) is not None:
+            await parse_job(file_path)
 
-    await asyncio.gather(*(parse_job(file) for file in files))
+    tasks = [asyncio.ensure_future(walk())] + [
+        asyncio.ensure_future(work()) for _ in range(workers)
+    ]
+    completed = False
+    try:
+        await asyncio.gather(*tasks)
+        completed = True
+    finally:
+        for task in tasks:
+            task.cancel()
+        # keep the manifest around when interrupted, so that the next run resumes
+        manifest.close(completed=completed)
+    return LoadCacheReport(**counts)
@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+
+from pathlib import Path
+from typing import Any, Literal, cast
+from google.genai import Client as GenAIClient
+from google.genai.types import Content, GenerateContentResponse
+
+# - passthrough: always call the model, the cassette is not used
+# - record: replay the responses already on the cassette, call the model and
+#   append the response for the others
+# - replay: only replay, a request missing from the cassette is an error
+CassetteMode = Literal["passthrough", "record", "replay"]
+CASSETTE_MODE = cast(
+    CassetteMode, os.getenv("FS_EXPLORER_CASSETTE_MODE", "passthrough")
+)
+DEFAULT_CASSETTE_PATH = Path("tmp/cassette.jsonl")
+CASSETTE_PATH = Path(os.getenv("FS_EXPLORER_CASSETTE", str(DEFAULT_CASSETTE_PATH)))
+
+
+class CassetteMiss(LookupError):
+    """A request was not found on a cassette in replay mode"""
+
+
+def request_key(model: str, contents: list[Content], config: dict[str, Any]) -> str:
+    """Stable hash of everything that determines the response to a request"""
+    request = {
+        "model": model,
+        "config": config,
+        "contents": [
+            content.model_dump(mode="json", exclude_none=True) for content in contents
+        ],
+    }
+    encoded = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCassette:
+    """Model responses recorded to a JSONL file, one `{"key", "response"}` object per line"""
+
+    def __init__(
+        self, path: Path = CASSETTE_PATH, mode: CassetteMode = CASSETTE_MODE
+    ) -> None:
+        if mode not in ("passthrough", "record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._responses: dict[str, str] | None = None
+
+    def _load(self) -> dict[str, str]:
+        if self._responses is None:
+            self._responses = {}
+            if self.path.is_file():
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            self._responses[record["key"]] = json.dumps(
+                                record["response"]
+                            )
+        return self._responses
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def _record(self, key: str, response: GenerateContentResponse) -> None:
+        encoded = response.model_dump_json(exclude_none=True)
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "response": json.loads(encoded)}) + "\n")
+        self._load()[key] = encoded
+
+    async def generate_content(
+        self,
+        client: GenAIClient,
+        model: str,
+        contents: list[Content],
+        config: dict[str, Any],
+    ) -> GenerateContentResponse:
+        if self.mode == "passthrough":
+            return await client.aio.models.generate_content(
+                model=model,
+                contents=contents,  # type: ignore
+                config=config,  # type: ignore
+            )
+        key = request_key(model, contents, config)
+        if (recorded := self._load().get(key)) is not None:
+            self.hits += 1
+            return GenerateContentResponse.model_validate_json(recorded)
+        self.misses += 1
+        if self.mode == "replay":
+            raise CassetteMiss(
+                f"no response recorded on {self.path} for this request ({key[:12]}): record it first with FS_EXPLORER_CASSETTE_MODE=record"
+            )
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=contents,  # type: ignore
+            config=config,  # type: ignore
+        )
+        self._record(key, response)
+        return response
@@ -0,0 +1,85 @@
+import zlib
+import struct
+
+from collections import Counter
+from typing import Callable, Iterable
+
+# compressed values are stored as MAGIC + dictionary id (0 = no dictionary) + zlib stream
+MAGIC = b"FSXZ\x01"
+_HEADER = struct.Struct(">I")
+HEADER_SIZE = len(MAGIC) + _HEADER.size
+COMPRESSION_LEVEL = 6
+# zlib only looks back 32KB, so a bigger preset dictionary would be wasted
+MAX_DICTIONARY_BYTES = 32 * 1024
+# the dictionary mostly pays off on entries that are too small to build their own context
+SMALL_ENTRY_BYTES = 16 * 1024
+MIN_DICTIONARY_SEGMENT = 8
+
+
+def is_compressed(value: object) -> bool:
+    return isinstance(value, bytes) and value.startswith(MAGIC)
+
+
+def compress_text(
+    text: str, dictionary: bytes | None = None, dictionary_id: int = 0
+) -> bytes:
+    data = text.encode("utf-8")
+    if dictionary is not None and dictionary_id and len(data) <= SMALL_ENTRY_BYTES:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        dictionary_id = 0
+    return (
+        MAGIC
+        + _HEADER.pack(dictionary_id)
+        + compressor.compress(data)
+        + compressor.flush()
+    )
+
+
+def decompress_text(value: bytes, get_dictionary: Callable[[int], bytes]) -> str:
+    (dictionary_id,) = _HEADER.unpack_from(value, len(MAGIC))
+    if dictionary_id:
+        decompressor = zlib.decompressobj(zdict=get_dictionary(dictionary_id))
+    else:
+        decompressor = zlib.decompressobj()
+    data = decompressor.decompress(value[HEADER_SIZE:]) + decompressor.flush()
+    return data.decode("utf-8")
+
+
+def train_dictionary(
+    samples: Iterable[str], max_bytes: int = MAX_DICTIONARY_BYTES
+) -> bytes:
+    """
+    Build a zlib preset dictionary out of the lines and words that recur across
+    the sampled documents (headers, footers, boilerplate, domain vocabulary).
+    """
+    lines: Counter[str] = Counter()
+    words: Counter[str] = Counter()
+    for sample in samples:
+        lines.update(
+            {
+                line.strip()
+                for line in sample.splitlines()
+                if len(line.strip()) >= MIN_DICTIONARY_SEGMENT
+            }
+        )
+        words.update(
+            {word for word in sample.split() if len(word) >= MIN_DICTIONARY_SEGMENT}
+        )
+    segments = [
+        (count * len(segment), segment + "\n")
+        for segment, count in list(lines.items()) + list(words.items())
+        if count > 1
+    ]
+    segments.sort(reverse=True)
+    chosen: list[bytes] = []
+    size = 0
+    for _, segment in segments:
+        encoded = segment.encode("utf-8")
+        if size + len(encoded) > max_bytes:
+            continue
+        chosen.append(encoded)
+        size += len(encoded)
+    # zlib finds matches near the end of the dictionary more cheaply: most valuable last
+    return b"".join(reversed(chosen))
@@ -0,0 +1,151 @@
+import os
+
+from typing import NamedTuple
+from google.genai.types import Content, Part
+
+# rough estimate, good enough to keep the history within a budget without a
+# round trip to the `count_tokens` endpoint on every step
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKEN_BUDGET = int(os.getenv("FS_EXPLORER_CONTEXT_TOKENS", "32000"))
+# messages at the end of the history that are always sent verbatim
+KEEP_RECENT_MESSAGES = 6
+TOOL_RESULT_PREFIX = "Tool result for "
+ELIDED_PREVIEW_CHARS = 300
+ELISION_NOTE = " more characters elided to keep the context within budget: call the tool again if you need them]"
+
+
+class ContextStep(NamedTuple):
+    step: int
+    messages: int
+    tokens: int
+    tokens_saved: int
+
+
+def estimate_tokens(content: Content) -> int:
+    chars = sum(len(part.text or "") for part in content.parts or [])
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def _text(content: Content) -> str:
+    return "".join(part.text or "" for part in content.parts or [])
+
+
+def _is_tool_result(content: Content) -> bool:
+    return content.role == "user" and _text(content).startswith(TOOL_RESULT_PREFIX)
+
+
+def elide_tool_result(content: Content) -> Content:
+    text = _text(content)
+    header, _, output = text.partition("\n\n")
+    # already elided at a previous step: eliding the preview again would lose the count
+    if len(output) <= ELIDED_PREVIEW_CHARS or text.endswith(ELISION_NOTE):
+        return content
+    elided = len(output) - ELIDED_PREVIEW_CHARS
+    return Content(
+        role=content.role,
+        parts=[
+            Part.from_text(
+                text=f"{header}\n\n{output[:ELIDED_PREVIEW_CHARS]}\n[... {elided}{ELISION_NOTE}"
+            )
+        ],
+    )
+
+
+class ChatContext:
+    """
+    Chat history sent to the model, kept within a token budget.
+
+    The system prompt and the task are always kept, as are the last
+    `keep_recent` messages. When the history exceeds the budget, older tool
+    results are cut down to a short preview first and, if that is not enough,
+    the oldest messages are dropped and replaced by a note.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        budget: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent: int = KEEP_RECENT_MESSAGES,
+    ) -> None:
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.messages: list[Content] = [
+            Content(role="system", parts=[Part.from_text(text=system_prompt)])
+        ]
+        self.steps: list[ContextStep] = []
+        # tokens of every message ever added, as if nothing had been compacted
+        self._raw_tokens = estimate_tokens(self.messages[0])
+        self._dropped = 0
+
+    def append(self, content: Content) -> None:
+        self.messages.append(content)
+        self._raw_tokens += estimate_tokens(content)
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(content) for content in self.messages)
+
+    @property
+    def tokens_saved(self) -> int:
+        """Tokens not sent to the model over the whole session thanks to compaction"""
+        return sum(step.tokens_saved for step in self.steps)
+
+    def _pinned(self) -> int:
+        """Number of leading messages that are never compacted: system prompt, task and drop note"""
+        return min(len(self.messages), 3 if self._dropped else 2)
+
+    def compact(self) -> list[Content]:
+        """Compact the history if needed and record what is about to be sent"""
+        tokens = self.tokens
+        if tokens > self.budget:
+            tokens = self._elide_tool_results(tokens)
+        if tokens > self.budget:
+            tokens = self._drop_oldest(tokens)
+        self.steps.append(
+            ContextStep(
+                step=len(self.steps) + 1,
+                messages=len(self.messages),
+                tokens=tokens,
+                tokens_saved=self._raw_tokens - tokens,
+            )
+        )
+        return self.messages
+
+    def _elide_tool_results(self, tokens: int) -> int:
+        for index in range(self._pinned(), len(self.messages) - self.keep_recent):
+            content = self.messages[index]
+            if not _is_tool_result(content):
+                continue
+            elided = elide_tool_result(content)
+            tokens += estimate_tokens(elided) - estimate_tokens(content)
+            self.messages[index] = elided
+            if tokens <= self.budget:
+                break
+        return tokens
+
+    def _drop_oldest(self, tokens: int) -> int:
+        start = self._pinned()
+        end = len(self.messages) - self.keep_recent
+        if self._dropped:
+            tokens -= estimate_tokens(self.messages[start - 1])
+            del self.messages[start - 1]
+            start -= 1
+            end -= 1
+        dropped = 0
+        while start + dropped < end and tokens > self.budget:
+            tokens -= estimate_tokens(self.messages[start + dropped])
+            dropped += 1
+        del self.messages[start : start + dropped]
+        self._dropped += dropped
+        if self._dropped:
+            note = Content(
+                role="user",
+                parts=[
+                    Part.from_text(
+                        text=f"[{self._dropped} earlier messages of this session were removed to keep the context within budget]"
+                    )
+                ],
+            )
+            self.messages.insert(start, note)
+            tokens += estimate_tokens(note)
+        return tokens
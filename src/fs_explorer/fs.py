@@ -1,60 +1,400 @@
 import os
-import re
+import asyncio
 import glob
+import bisect
+import mmap
+import threading
 
-from typing import cast
-from llama_cloud_services.parse.utils import ResultType
-from llama_cloud_services.parse.types import JobResult
-from llama_cloud_services import LlamaParse
+from array import array
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Iterator, Literal, NamedTuple
 from .caching import CACHE, CACHING_DIR
+from .parsing import PARSE_POOL
+from .parsers import LOCAL_PARSER
+from .pages import format_outline, parse_page_range, split_pages
+from .index import INDEX
+from .fulltext import FULLTEXT_INDEX
+from .search import (
+    DEFAULT_MAX_TOTAL_MATCHES,
+    FileMatches,
+    format_matches,
+    search_tree,
+)
 
+# defined next to the matcher, so that isolated workers only import `search`
+from .search import grep_file_content as grep_file_content
 
-def describe_dir_content(directory: str) -> str:
+DEFAULT_PAGE_LINES = 1000
+DEFAULT_PAGE_BYTES = 64 * 1024
+MAX_LINE_INDEXES = 64
+DEFAULT_DIR_ENTRIES = 200
+MAX_SUMMARY_EXTENSIONS = 10
+# longer parsed documents are read one page range at a time
+MAX_PAGES_WITHOUT_RANGE = 10
+
+
+class _LineIndex:
+    """Offsets of the line starts of a file, extended lazily as pages are requested"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.starts = array("Q", [0])
+        self.complete = size == 0
+        # tools may run concurrently on a thread pool, see `FsExplorerAgent.call_tools`
+        self._lock = threading.Lock()
+
+    def extend_to(self, mm: mmap.mmap, line: int) -> None:
+        with self._lock:
+            pos = self.starts[-1]
+            while len(self.starts) <= line and not self.complete:
+                newline = mm.find(b"\n", pos)
+                if newline == -1 or newline + 1 >= self.size:
+                    self.complete = True
+                    break
+                pos = newline + 1
+                self.starts.append(pos)
+
+    def end_of(self, line: int) -> int:
+        if line + 1 < len(self.starts):
+            return self.starts[line + 1]
+        return self.size
+
+
+_LINE_INDEXES: OrderedDict[tuple[str, int, int], _LineIndex] = OrderedDict()
+_LINE_INDEXES_LOCK = threading.Lock()
+
+
+def _get_line_index(file_path: str, stat: os.stat_result) -> _LineIndex:
+    key = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _LINE_INDEXES_LOCK:
+        index = _LINE_INDEXES.get(key)
+        if index is None:
+            index = _LineIndex(stat.st_size)
+            _LINE_INDEXES[key] = index
+            if len(_LINE_INDEXES) > MAX_LINE_INDEXES:
+                _LINE_INDEXES.popitem(last=False)
+        else:
+            _LINE_INDEXES.move_to_end(key)
+    return index
+
+
+def _char_boundary(mm: mmap.mmap, pos: int) -> int:
+    # move back to the start of a UTF-8 sequence, so that pages never split a character
+    while 0 < pos < len(mm) and mm[pos] & 0xC0 == 0x80:
+        pos -= 1
+    return pos
+
+
+def _read_lines(
+    file_path: str,
+    mm: mmap.mmap,
+    index: _LineIndex,
+    offset: int,
+    limit: int,
+    tail: bool,
+    max_bytes: int = DEFAULT_PAGE_BYTES,
+) -> str:
+    if tail:
+        end = index.size
+        start = end - 1 if mm[end - 1 : end] == b"\n" else end
+        for _ in range(limit):
+            start = mm.rfind(b"\n", 0, start)
+            if start == -1:
+                break
+        start += 1
+        if end - start > max_bytes:
+            # a few very long lines: fall back to the last bytes of the file
+            return _read_bytes(file_path, mm, 0, max_bytes, True)
+        content = mm[start:end].decode("utf-8", errors="replace")
+        if start == 0:
+            return content
+        return (
+            content
+            + f"\n\n[Showing the last {limit} lines of {file_path}, starting at byte {start}. To read earlier content, call `read` with unit='byte' and an offset lower than {start}]"
+        )
+    index.extend_to(mm, offset + limit)
+    if offset >= len(index.starts):
+        return f"Offset {offset} is beyond the end of {file_path}, which has {len(index.starts)} lines"
+    last = min(offset + limit, len(index.starts)) - 1
+    start = index.starts[offset]
+    if index.end_of(last) - start > max_bytes:
+        # end the page at the last line that fits in `max_bytes`
+        fitting = bisect.bisect_right(
+            index.starts, start + max_bytes, offset + 1, last + 1
+        )
+        last = fitting - 2
+        if last < offset:
+            # a single line longer than a page: read it one byte page at a time
+            return _read_bytes(file_path, mm, start, max_bytes, False)
+    content = mm[start : index.end_of(last)].decode("utf-8", errors="replace")
+    if index.end_of(last) >= index.size:
+        return content
+    return (
+        content
+        + f"\n\n[Showing lines {offset + 1}-{last + 1} of {file_path}. The file continues: to read the next page, call `read` with offset={last + 1} and unit='line']"
+    )
+
+
+def _read_bytes(
+    file_path: str, mm: mmap.mmap, offset: int, limit: int, tail: bool
+) -> str:
+    size = len(mm)
+    if tail:
+        offset = max(size - limit, 0)
+    if offset >= size:
+        return (
+            f"Offset {offset} is beyond the end of {file_path}, which has {size} bytes"
+        )
+    start = _char_boundary(mm, offset)
+    end = _char_boundary(mm, min(offset + limit, size))
+    if end <= start:
+        end = min(offset + limit, size)
+    content = mm[start:end].decode("utf-8", errors="replace")
+    if end >= size:
+        if start == 0:
+            return content
+        return (
+            content
+            + f"\n\n[Showing bytes {start}-{end - 1} of {file_path}, which ends here. To read earlier content, call `read` with unit='byte' and an offset lower than {start}]"
+        )
+    return (
+        content
+        + f"\n\n[Showing bytes {start}-{end - 1} of {file_path} ({size} bytes in total). The file continues: to read the next page, call `read` with offset={end} and unit='byte']"
+    )
+
+
+class _DirEntryInfo(NamedTuple):
+    name: str
+    path: str
+    is_dir: bool
+    size: int | None = None
+    mtime: float | None = None
+
+
+def _scan_dir(directory: str, with_stat: bool) -> list[_DirEntryInfo]:
+    entries: list[_DirEntryInfo] = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            # is_dir() relies on the d_type returned by readdir, no extra stat needed
+            is_dir = entry.is_dir()
+            if with_stat:
+                try:
+                    stat = entry.stat()
+                    size, mtime = stat.st_size, stat.st_mtime
+                except OSError:
+                    size, mtime = None, None
+            else:
+                size, mtime = None, None
+            entries.append(
+                _DirEntryInfo(
+                    name=entry.name,
+                    path=os.path.join(directory, entry.name),
+                    is_dir=is_dir,
+                    size=size,
+                    mtime=mtime,
+                )
+            )
+    return entries
+
+
+def _with_stat(entry: _DirEntryInfo) -> _DirEntryInfo:
+    if entry.size is not None:
+        return entry
+    try:
+        stat = os.stat(entry.path)
+    except OSError:
+        return entry
+    return entry._replace(size=stat.st_size, mtime=stat.st_mtime)
+
+
+def _format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    value = size / 1024
+    for unit in ("KB", "MB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+def _format_entry(entry: _DirEntryInfo, details: bool) -> str:
+    if not details or entry.mtime is None:
+        return entry.path
+    modified = datetime.fromtimestamp(entry.mtime).strftime("%Y-%m-%d %H:%M")
+    if entry.is_dir or entry.size is None:
+        return f"{entry.path} (modified {modified})"
+    return f"{entry.path} ({_format_size(entry.size)}, modified {modified})"
+
+
+def _summarize_entries(entries: list[_DirEntryInfo]) -> str:
+    folders = sum(1 for entry in entries if entry.is_dir)
+    extensions = Counter(
+        os.path.splitext(entry.name)[1].lower() or "(no extension)"
+        for entry in entries
+        if not entry.is_dir
+    )
+    parts = [f"{folders} folders"] if folders else []
+    most_common = extensions.most_common(MAX_SUMMARY_EXTENSIONS)
+    parts.extend(f"{count} {extension} files" for extension, count in most_common)
+    others = sum(extensions.values()) - sum(count for _, count in most_common)
+    if others:
+        parts.append(f"{others} other files")
+    return ", ".join(parts)
+
+
+def describe_dir_content(
+    directory: str,
+    offset: int = 0,
+    limit: int = DEFAULT_DIR_ENTRIES,
+    sort_by: Literal["name", "size", "mtime"] = "name",
+    details: bool = False,
+) -> str:
     if not os.path.exists(directory) or not os.path.isdir(directory):
         return f"No such directory: {directory}"
-    children = os.listdir(directory)
-    if not children:
+    offset, limit = max(int(offset), 0), max(int(limit), 1)
+    indexed = INDEX.list_dir(directory)
+    if indexed is not None:
+        entries = [
+            _DirEntryInfo(
+                name=entry.name,
+                path=os.path.join(directory, entry.name),
+                is_dir=entry.is_dir,
+                size=entry.size,
+                mtime=entry.mtime,
+            )
+            for entry in indexed
+        ]
+    else:
+        entries = _scan_dir(directory, with_stat=sort_by != "name")
+    if not entries:
         return f"Directory {directory} is empty"
+    if sort_by == "name":
+        entries.sort(key=lambda entry: entry.name)
+    elif sort_by == "size":
+        # the size of a directory entry says nothing about its content
+        entries.sort(
+            key=lambda entry: (-(0 if entry.is_dir else entry.size or 0), entry.name)
+        )
+    else:
+        entries.sort(key=lambda entry: (-(entry.mtime or 0), entry.name))
+    page = entries[offset : offset + limit]
+    if details:
+        page = [_with_stat(entry) for entry in page]
+    files = [_format_entry(entry, details) for entry in page if not entry.is_dir]
+    directories = [_format_entry(entry, details) for entry in page if entry.is_dir]
     description = f"Content of {directory}\n"
-    files = []
-    directories = []
-    for child in children:
-        fullpath = os.path.join(directory, child)
-        if os.path.isfile(fullpath):
-            files.append(fullpath)
-        else:
-            directories.append(fullpath)
-    description += "FILES:\n- " + "\n- ".join(files)
+    if files:
+        description += "FILES:\n- " + "\n- ".join(files)
+    elif len(page) < len(entries):
+        description += "No files in this page of the folder"
+    else:
+        description += "This folder does not have any files"
     if not directories:
         description += "\nThis folder does not have any sub-folders"
     else:
         description += "\nSUBFOLDERS:\n- " + "\n- ".join(directories)
+    if len(page) < len(entries):
+        description += f"\n\n[Showing entries {offset + 1}-{offset + len(page)} of {len(entries)}, sorted by {sort_by}. All entries: {_summarize_entries(entries)}."
+        if offset + len(page) < len(entries):
+            description += f" To list the next page, call `describe` with offset={offset + len(page)}."
+        description += " You can also use `glob` to narrow down the listing]"
     return description
 
 
-def read_file(file_path: str) -> str:
+def read_file(
+    file_path: str,
+    offset: int | None = None,
+    limit: int | None = None,
+    unit: Literal["line", "byte"] = "line",
+    tail: bool = False,
+) -> str:
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         return f"No such file: {file_path}"
-    with open(file_path, "r") as f:
-        return f.read()
+    offset = max(int(offset or 0), 0)
+    if limit is None:
+        limit = DEFAULT_PAGE_LINES if unit == "line" else DEFAULT_PAGE_BYTES
+    limit = int(limit)
+    if limit <= 0:
+        return f"The page limit must be a positive number, got {limit}"
+    stat = os.stat(file_path)
+    if stat.st_size == 0:
+        return ""
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if unit == "byte":
+                return _read_bytes(file_path, mm, offset, limit, tail)
+            index = _get_line_index(file_path, stat)
+            return _read_lines(file_path, mm, index, offset, limit, tail)
 
 
-def grep_file_content(file_path: str, pattern: str) -> str:
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
-        return f"No such file: {file_path}"
-    with open(file_path, "r") as f:
-        content = f.read()
-    r = re.compile(pattern=pattern, flags=re.MULTILINE)
-    matches = r.findall(content)
-    if matches:
-        return f"MATCHES for {pattern} in {file_path}:\n\n- " + "\n- ".join(matches)
-    return "No matches found"
+def _describe_file_matches(
+    results: Iterator[FileMatches], title: str, narrowing_hint: str
+) -> str:
+    sections: list[str] = []
+    truncated = False
+    for file_matches in results:
+        sections.append(
+            f"== {file_matches.file_path} ==\n" + format_matches(file_matches.matches)
+        )
+        truncated = file_matches.truncated
+    if not sections:
+        return "No matches found"
+    description = f"{title}:\n\n" + "\n\n".join(sections)
+    if truncated:
+        description += f"\n\n[Stopped because the result budget was exhausted: there may be more matches. {narrowing_hint}]"
+    return description
+
+
+def search_files(
+    directory: str,
+    pattern: str,
+    file_pattern: str = "*",
+    max_matches: int = DEFAULT_MAX_TOTAL_MATCHES,
+    context_lines: int = 0,
+) -> str:
+    if not os.path.exists(directory) or not os.path.isdir(directory):
+        return f"No such directory: {directory}"
+    results = search_tree(
+        directory,
+        pattern,
+        file_pattern=file_pattern,
+        max_matches=int(max_matches),
+        context_lines=int(context_lines),
+    )
+    return _describe_file_matches(
+        results,
+        f"MATCHES for {pattern} in {directory}",
+        "Use a more specific pattern or `file_pattern`, or search a sub-directory",
+    )
+
+
+def search_fulltext_index(
+    pattern: str,
+    max_matches: int = DEFAULT_MAX_TOTAL_MATCHES,
+    context_lines: int = 0,
+) -> str:
+    if not FULLTEXT_INDEX.path.is_file():
+        return "The full-text index has not been built: use `search` or `grep` instead"
+    results = FULLTEXT_INDEX.search(
+        pattern, max_matches=int(max_matches), context_lines=int(context_lines)
+    )
+    return _describe_file_matches(
+        results,
+        f"MATCHES for {pattern} in the full-text index",
+        "Use a more specific pattern",
+    )
 
 
 def glob_paths(directory: str, pattern: str) -> str:
     if not os.path.exists(directory) or not os.path.isdir(directory):
         return f"No such directory: {directory}"
-    matches = glob.glob(f"./{directory}/{pattern}")
+    indexed = INDEX.glob(directory, pattern)
+    if indexed is not None:
+        matches = [f"./{directory}/{match}" for match in indexed]
+    else:
+        matches = sorted(glob.glob(f"./{directory}/{pattern}"))
     if matches:
         return f"MATCHES for {pattern} in {directory}:\n\n- " + "\n- ".join(matches)
     return "No matches found"
@@ -71,24 +411,45 @@ def check_api_key() -> str:
         if CACHING_DIR.is_dir():
             message += "LLAMA_CLOUD_API_KEY is not set and you can use 'parse_file', but you will only have access to cached files. You should try to use the tool nevertheless."
         else:
-            message += "LLAMA_CLOUD_API_KEY is not set and you cannot use the 'parse_file' tool"
+            message += "LLAMA_CLOUD_API_KEY is not set: you can use the 'parse_file' tool only for the documents that can be parsed locally (.docx, .pptx, .xlsx and PDFs with a text layer)"
         return message
 
 
-async def parse_file(file_path: str) -> str:
+async def _parsed_pages(file_path: str) -> list[str] | str:
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         return f"No such file: {file_path}"
-    if (content := CACHE.get_file(file_path)) is not None:
-        return content
-    if os.getenv("LLAMA_CLOUD_API_KEY") is None:
+    # the lookup may hash the whole file: keep it off the event loop
+    if (content := await asyncio.to_thread(CACHE.get_file, file_path)) is not None:
+        return split_pages(content)
+    if os.getenv("LLAMA_CLOUD_API_KEY") is None and not LOCAL_PARSER.supports(
+        file_path
+    ):
         return f"Not possible to parse {file_path} because it has not been cached and the necessary credentials (`LLAMA_CLOUD_API_KEY`) are not set in the environment"
-    parser = LlamaParse(
-        api_key=cast(str, os.getenv("LLAMA_CLOUD_API_KEY")),
-        result_type=ResultType.TXT,
-        fast_mode=True,
+    try:
+        return split_pages(await PARSE_POOL.parse(file_path, cache=CACHE))
+    except Exception as e:
+        return f"There was an error while parsing the file {file_path}: {e}"
+
+
+async def parse_file(file_path: str, pages: str | None = None) -> str:
+    parsed = await _parsed_pages(file_path)
+    if isinstance(parsed, str):
+        return parsed
+    if pages is None:
+        if len(parsed) <= MAX_PAGES_WITHOUT_RANGE:
+            return "\n\n".join(parsed)
+        return f"{format_outline(file_path, parsed)}\n\nThis document is too long to be read at once: call `parse_file` again with `pages` set to the page range you need (e.g. '3' or '10-12')"
+    try:
+        selected = parse_page_range(pages, len(parsed))
+    except ValueError as e:
+        return f"Could not read {file_path}: {e}"
+    return "\n\n".join(
+        f"--- Page {page} of {len(parsed)} ---\n{parsed[page - 1]}" for page in selected
     )
-    result = cast(JobResult, await parser.aparse(file_path=file_path))
-    if result.error is None:
-        return await result.aget_text()
-    else:
-        return f"There was an error while parsing the file {file_path}: {result.error} (code: {result.error_code})"
+
+
+async def document_outline(file_path: str) -> str:
+    parsed = await _parsed_pages(file_path)
+    if isinstance(parsed, str):
+        return parsed
+    return format_outline(file_path, parsed)
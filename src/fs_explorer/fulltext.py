@@ -0,0 +1,322 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import sqlite3
+
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+from .caching import CACHE, CACHING_DIR, ParsedFileCache
+from .search import (
+    DEFAULT_MAX_TOTAL_MATCHES,
+    FileMatches,
+    LineMatch,
+    compile_pattern,
+    grep_buffer,
+    grep_path,
+    is_binary,
+    iter_text_files,
+)
+
+try:
+    from re import _parser as sre_parse  # type: ignore[attr-defined]
+except ImportError:  # Python 3.10
+    import sre_parse  # type: ignore[no-redef]
+
+FULLTEXT_INDEX_PATH = CACHING_DIR.parent / "fulltext.sqlite"
+MAX_INDEXED_FILE_BYTES = 64 * 1024 * 1024
+MAX_QUERY_ALTERNATIVES = 16
+COMMIT_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    indexed INTEGER NOT NULL,
+    content BLOB,
+    UNIQUE (path, source)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings(document_id);
+"""
+
+# a query plan is an OR of alternatives, each one an AND of required substrings.
+# `None` means that the pattern has no usable literal and every document is a candidate
+QueryPlan = list[list[str]] | None
+
+
+class FulltextReport(NamedTuple):
+    indexed_files: int
+    indexed_parsed: int
+    unchanged: int
+    removed: int
+    elapsed: float
+
+
+def trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _combine(left: list[list[str]], right: list[list[str]]) -> list[list[str]]:
+    if len(left) * len(right) > MAX_QUERY_ALTERNATIVES:
+        # too many alternatives: keep the more selective side only
+        return left if len(left) <= len(right) else right
+    return [a + b for a in left for b in right]
+
+
+def _plan(parsed: Any) -> QueryPlan:
+    # an `sre_parse` SubPattern, or the item list of one: a sequence of (op, args)
+    plan: list[list[str]] = [[]]
+    run = ""
+
+    def flush() -> None:
+        nonlocal run, plan
+        if len(run) >= 3:
+            plan = [alternative + [run] for alternative in plan]
+        run = ""
+
+    for op, av in parsed:
+        name = str(op)
+        if name == "LITERAL":
+            run += chr(av)
+            continue
+        flush()
+        inner: QueryPlan = None
+        if name in ("SUBPATTERN", "ATOMIC_GROUP"):
+            inner = _plan(av[-1] if name == "SUBPATTERN" else av)
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            if av[0] >= 1:
+                inner = _plan(av[2])
+        elif name == "BRANCH":
+            branches = [_plan(branch) for branch in av[1]]
+            if all(branch is not None for branch in branches):
+                inner = [alt for branch in branches for alt in branch or []]
+                if len(inner) > MAX_QUERY_ALTERNATIVES or [] in inner:
+                    inner = None
+        if inner is not None:
+            plan = _combine(plan, inner)
+    flush()
+    if plan == [[]]:
+        return None
+    return plan
+
+
+def query_plan(pattern: str) -> QueryPlan:
+    try:
+        parsed = sre_parse.parse(pattern, re.MULTILINE)
+    except re.error:
+        return None
+    return _plan(parsed)
+
+
+class FulltextIndex:
+    def __init__(
+        self, path: Path = FULLTEXT_INDEX_PATH, cache: ParsedFileCache = CACHE
+    ) -> None:
+        self.path = path
+        self.cache = cache
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.path.parent, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), timeout=30)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _store(
+        self,
+        connection: sqlite3.Connection,
+        path: str,
+        source: str,
+        digest: str,
+        text: str | None,
+        content: bytes | None = None,
+    ) -> None:
+        row = connection.execute(
+            "SELECT id FROM documents WHERE path = ? AND source = ?", (path, source)
+        ).fetchone()
+        if row is not None:
+            connection.execute("DELETE FROM postings WHERE document_id = ?", (row[0],))
+            connection.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        document_id = connection.execute(
+            "INSERT INTO documents (path, source, digest, indexed, content) VALUES (?, ?, ?, ?, ?)",
+            (path, source, digest, int(text is not None), content),
+        ).lastrowid
+        if text is not None:
+            connection.executemany(
+                "INSERT INTO postings VALUES (?, ?)",
+                ((trigram, document_id) for trigram in trigrams(text)),
+            )
+
+    def _remove_missing(
+        self, connection: sqlite3.Connection, source: str, seen: set[str], root: str
+    ) -> int:
+        removed = 0
+        for document_id, path in connection.execute(
+            "SELECT id, path FROM documents WHERE source = ?", (source,)
+        ).fetchall():
+            in_scope = source == "parsed" or path.startswith(
+                root.rstrip(os.sep) + os.sep
+            )
+            if in_scope and path not in seen:
+                connection.execute(
+                    "DELETE FROM postings WHERE document_id = ?", (document_id,)
+                )
+                connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+                removed += 1
+        return removed
+
+    def build(self, directory: str, include_parsed: bool = True) -> FulltextReport:
+        start = time.perf_counter()
+        root = os.path.abspath(directory)
+        indexed_files = indexed_parsed = unchanged = changes = 0
+        with closing(self._connect()) as connection:
+            digests = dict(
+                connection.execute(
+                    "SELECT path || char(0) || source, digest FROM documents"
+                ).fetchall()
+            )
+            seen: set[str] = set()
+            # never index our own state (this index and its journals, the parse cache)
+            state_paths = (
+                os.path.abspath(self.path),
+                os.path.abspath(self.cache.directory) + os.sep,
+            )
+            for file_path in iter_text_files(root):
+                if file_path.startswith(state_paths):
+                    continue
+                try:
+                    stat = os.stat(file_path)
+                    if is_binary(file_path):
+                        continue
+                except OSError:
+                    continue
+                seen.add(file_path)
+                digest = f"{stat.st_size}:{stat.st_mtime_ns}"
+                if digests.get(f"{file_path}\0file") == digest:
+                    unchanged += 1
+                    continue
+                text = None
+                if stat.st_size <= MAX_INDEXED_FILE_BYTES:
+                    # the bytes grep scans, without newline translation
+                    with open(file_path, "rb") as f:
+                        text = f.read().decode("utf-8", errors="replace")
+                # files too large to index are stored without postings: always candidates
+                self._store(connection, file_path, "file", digest, text)
+                indexed_files += 1
+                changes += 1
+                if changes % COMMIT_EVERY == 0:
+                    connection.commit()
+            removed = self._remove_missing(connection, "file", seen, root)
+            if include_parsed:
+                seen = set()
+                for file_path, text in self.cache.iter_files():
+                    seen.add(file_path)
+                    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                    if digests.get(f"{file_path}\0parsed") == digest:
+                        unchanged += 1
+                        continue
+                    self._store(
+                        connection,
+                        file_path,
+                        "parsed",
+                        digest,
+                        text,
+                        zlib.compress(text.encode("utf-8")),
+                    )
+                    indexed_parsed += 1
+                    changes += 1
+                    if changes % COMMIT_EVERY == 0:
+                        connection.commit()
+                removed += self._remove_missing(connection, "parsed", seen, root)
+            connection.commit()
+        return FulltextReport(
+            indexed_files=indexed_files,
+            indexed_parsed=indexed_parsed,
+            unchanged=unchanged,
+            removed=removed,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def candidates(
+        self, connection: sqlite3.Connection, pattern: str
+    ) -> list[tuple[int, str, str]]:
+        plan = query_plan(pattern)
+        query = "SELECT id, path, source FROM documents"
+        if plan is None:
+            return connection.execute(query + " ORDER BY path, source").fetchall()
+        ids: set[int] = {
+            document_id
+            for (document_id,) in connection.execute(
+                "SELECT id FROM documents WHERE indexed = 0"
+            )
+        }
+        for alternative in plan:
+            required = sorted(set().union(*(trigrams(part) for part in alternative)))
+            placeholders = ", ".join("?" * len(required))
+            ids.update(
+                document_id
+                for (document_id,) in connection.execute(
+                    f"SELECT document_id FROM postings WHERE trigram IN ({placeholders}) GROUP BY document_id HAVING COUNT(*) = ?",
+                    (*required, len(required)),
+                )
+            )
+        rows: list[tuple[int, str, str]] = []
+        candidate_ids = sorted(ids)
+        for i in range(0, len(candidate_ids), 500):
+            chunk = candidate_ids[i : i + 500]
+            rows.extend(
+                connection.execute(
+                    query + f" WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+            )
+        return sorted(rows, key=lambda row: (row[1], row[2]))
+
+    def search(
+        self,
+        pattern: str,
+        max_matches: int = DEFAULT_MAX_TOTAL_MATCHES,
+        context_lines: int = 0,
+    ) -> Iterator[FileMatches]:
+        regex = compile_pattern(pattern)
+        if not self.path.is_file():
+            return
+        budget = max_matches
+        with closing(self._connect()) as connection:
+            for document_id, path, source in self.candidates(connection, pattern):
+                if source == "file":
+                    try:
+                        result = grep_path(path, pattern, budget, context_lines)
+                    except OSError:
+                        continue
+                else:
+                    (content,) = connection.execute(
+                        "SELECT content FROM documents WHERE id = ?", (document_id,)
+                    ).fetchone()
+                    result = grep_buffer(
+                        zlib.decompress(content), regex, budget, context_lines
+                    )
+                if not result.matches:
+                    continue
+                matches: list[LineMatch] = result.matches
+                budget -= len(matches)
+                truncated = result.truncated or budget <= 0
+                yield FileMatches(
+                    file_path=path if source == "file" else f"{path} (parsed)",
+                    matches=matches,
+                    truncated=truncated,
+                )
+                if truncated:
+                    return
+
+
+FULLTEXT_INDEX = FulltextIndex()
@@ -0,0 +1,275 @@
+import os
+import time
+import fnmatch
+import sqlite3
+
+from contextlib import closing
+from pathlib import Path
+from typing import Literal, NamedTuple, cast
+
+from .caching import CACHING_DIR
+
+INDEX_PATH = CACHING_DIR.parent / "index.sqlite"
+DEFAULT_MAX_AGE = float(os.getenv("FS_EXPLORER_INDEX_MAX_AGE", "300"))
+COMMIT_EVERY = 1000
+
+# what to do when the index covering a directory is older than its max age:
+# answer from the live filesystem ("live") or refresh the index first ("refresh")
+StalenessPolicy = Literal["live", "refresh"]
+DEFAULT_STALENESS_POLICY = cast(
+    StalenessPolicy, os.getenv("FS_EXPLORER_INDEX_STALENESS", "live")
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+
+class IndexedEntry(NamedTuple):
+    path: str
+    name: str
+    is_dir: bool
+    size: int | None
+    mtime: float | None
+
+
+class IndexReport(NamedTuple):
+    root: str
+    scanned_directories: int
+    unchanged_directories: int
+    updated_entries: int
+    removed_entries: int
+    elapsed: float
+
+
+def _like_prefix(path: str) -> str:
+    escaped = path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.rstrip(os.sep) + os.sep + "%"
+
+
+class MetadataIndex:
+    def __init__(
+        self,
+        path: Path = INDEX_PATH,
+        max_age: float = DEFAULT_MAX_AGE,
+        staleness_policy: StalenessPolicy = DEFAULT_STALENESS_POLICY,
+    ) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.staleness_policy = staleness_policy
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(self.path.parent, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), timeout=30)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def build(self, root: str) -> IndexReport:
+        root = os.path.abspath(root)
+        with closing(self._connect()) as connection:
+            with connection:
+                self._forget(connection, root)
+                connection.execute("DELETE FROM roots WHERE path = ?", (root,))
+            return self._refresh(connection, root)
+
+    def refresh(self, root: str) -> IndexReport:
+        with closing(self._connect()) as connection:
+            return self._refresh(connection, os.path.abspath(root))
+
+    def _forget(self, connection: sqlite3.Connection, path: str) -> int:
+        removed = connection.execute(
+            "DELETE FROM entries WHERE path LIKE ? ESCAPE '\\'", (_like_prefix(path),)
+        ).rowcount
+        connection.execute(
+            "DELETE FROM directories WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+            (path, _like_prefix(path)),
+        )
+        return removed
+
+    def _refresh(self, connection: sqlite3.Connection, root: str) -> IndexReport:
+        start = time.perf_counter()
+        scanned = unchanged = updated = removed = 0
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            row = connection.execute(
+                "SELECT mtime_ns FROM directories WHERE path = ?", (directory,)
+            ).fetchone()
+            if row is not None and row[0] == mtime_ns:
+                # no child was added, removed or renamed: only descend
+                unchanged += 1
+                stack.extend(
+                    path
+                    for (path,) in connection.execute(
+                        "SELECT path FROM entries WHERE parent = ? AND is_dir = 1",
+                        (directory,),
+                    )
+                )
+                continue
+            scanned += 1
+            rows = []
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        is_dir = entry.is_dir()
+                        try:
+                            stat = entry.stat()
+                            size, mtime = stat.st_size, stat.st_mtime
+                        except OSError:
+                            size, mtime = None, None
+                        rows.append(
+                            (
+                                entry.path,
+                                directory,
+                                entry.name,
+                                "" if is_dir else os.path.splitext(entry.name)[1],
+                                int(is_dir),
+                                size,
+                                mtime,
+                            )
+                        )
+                        if is_dir and not entry.is_symlink():
+                            stack.append(entry.path)
+            except OSError:
+                continue
+            current = {row[0] for row in rows}
+            for (path,) in connection.execute(
+                "SELECT path FROM entries WHERE parent = ?", (directory,)
+            ).fetchall():
+                if path not in current:
+                    connection.execute("DELETE FROM entries WHERE path = ?", (path,))
+                    removed += 1 + self._forget(connection, path)
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?)",
+                (directory, mtime_ns),
+            )
+            updated += len(rows)
+            if scanned % COMMIT_EVERY == 0:
+                connection.commit()
+        connection.execute(
+            "INSERT OR REPLACE INTO roots VALUES (?, ?)", (root, time.time())
+        )
+        connection.commit()
+        return IndexReport(
+            root=root,
+            scanned_directories=scanned,
+            unchanged_directories=unchanged,
+            updated_entries=updated,
+            removed_entries=removed,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _covering_root(
+        self, connection: sqlite3.Connection, directory: str
+    ) -> tuple[str, float] | None:
+        for root, refreshed_at in connection.execute(
+            "SELECT path, refreshed_at FROM roots"
+        ):
+            if directory == root or directory.startswith(root.rstrip(os.sep) + os.sep):
+                return root, refreshed_at
+        return None
+
+    def _fresh_connection(self, directory: str) -> sqlite3.Connection | None:
+        if not self.path.is_file():
+            return None
+        connection = self._connect()
+        covering = self._covering_root(connection, directory)
+        if covering is None:
+            connection.close()
+            return None
+        root, refreshed_at = covering
+        if time.time() - refreshed_at > self.max_age:
+            if self.staleness_policy != "refresh":
+                connection.close()
+                return None
+            self._refresh(connection, root)
+        return connection
+
+    def list_dir(self, directory: str) -> list[IndexedEntry] | None:
+        directory = os.path.abspath(directory)
+        connection = self._fresh_connection(directory)
+        if connection is None:
+            return None
+        with closing(connection):
+            if (
+                connection.execute(
+                    "SELECT 1 FROM directories WHERE path = ?", (directory,)
+                ).fetchone()
+                is None
+            ):
+                return None
+            return [
+                IndexedEntry(
+                    path=path,
+                    name=name,
+                    is_dir=bool(is_dir),
+                    size=size,
+                    mtime=mtime,
+                )
+                for path, name, is_dir, size, mtime in connection.execute(
+                    "SELECT path, name, is_dir, size, mtime FROM entries WHERE parent = ?",
+                    (directory,),
+                )
+            ]
+
+    def glob(self, directory: str, pattern: str) -> list[str] | None:
+        segments = pattern.split("/")
+        if pattern.startswith("/") or ".." in segments or "" in segments:
+            return None
+        directory = os.path.abspath(directory)
+        connection = self._fresh_connection(directory)
+        if connection is None:
+            return None
+        with closing(connection):
+            if len(segments) == 1:
+                candidates = connection.execute(
+                    "SELECT path FROM entries WHERE parent = ?", (directory,)
+                )
+            else:
+                candidates = connection.execute(
+                    "SELECT path FROM entries WHERE path LIKE ? ESCAPE '\\'",
+                    (_like_prefix(directory),),
+                )
+            matches: list[str] = []
+            for (path,) in candidates:
+                relative = os.path.relpath(path, directory).split(os.sep)
+                if len(relative) == len(segments) and all(
+                    _match_segment(name, segment)
+                    for name, segment in zip(relative, segments)
+                ):
+                    matches.append("/".join(relative))
+            return sorted(matches)
+
+
+def _match_segment(name: str, segment: str) -> bool:
+    # same rules as `glob`: hidden names only match patterns that start with a dot
+    if name.startswith(".") and not segment.startswith("."):
+        return False
+    return fnmatch.fnmatchcase(name, segment)
+
+
+INDEX = MetadataIndex()
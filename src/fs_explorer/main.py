@@ -1,11 +1,14 @@
 import json
+import uuid
 import asyncio
 
+from pathlib import Path
 from typer import Typer, Option
 from typing import Annotated
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.console import Console
+from rich.table import Table
 
 from .workflow import (
     workflow,
@@ -14,66 +17,106 @@ from .workflow import (
     GoDeeperEvent,
     AskHumanEvent,
     HumanAnswerEvent,
+    SESSIONS,
 )
-from .caching import parse_and_cache, CACHE
+from .caching import (
+    parse_and_cache,
+    CACHE,
+    CACHE_BUNDLE,
+    CACHE_EVICTION_POLICY,
+    CACHE_SIZE_LIMIT,
+    CACHE_TTL,
+    DEFAULT_BUNDLE_PATH,
+)
+from .scheduler import ParseScheduler
+from .index import INDEX, IndexReport
+from .fulltext import FULLTEXT_INDEX
+from .fs import search_fulltext_index
 
 app = Typer()
+index_app = Typer(
+    help="Manage the on-disk metadata index used to answer `glob` and directory listings without walking the filesystem"
+)
+app.add_typer(index_app, name="index")
+cache_app = Typer(help="Inspect and manage the persistent cache of parsed files")
+app.add_typer(cache_app, name="cache")
 
 
 async def run_workflow(task: str):
     console = Console()
-    handler = workflow.run(start_event=InputEvent(task=task))
-    with console.status(status="Working on your request...") as status:
-        async for event in handler.stream_events():
-            if isinstance(event, ToolCallEvent):
-                status.update("Tool calling...")
-                content = f"Calling tool `{event.tool_name}` with input:\n\n```\n{json.dumps(event.tool_input, indent=2)}\n```\n\nThe tool call is motivated by: {event.reason}"
-                panel = Panel(
-                    Markdown(content),
-                    title_align="left",
-                    title="Tool Call",
-                    border_style="bold yellow",
-                )
-                console.print(panel)
-                status.update("Working on the next move...")
-            elif isinstance(event, GoDeeperEvent):
-                status.update("Going deeper into the filesystem...")
-                content = f"Going to directory: `{event.directory}` because of: {event.reason}"
-                panel = Panel(
-                    Markdown(content),
-                    title_align="left",
-                    title="Moving within the file system",
-                    border_style="bold magenta",
-                )
-                console.print(panel)
-                status.update("Working on the next move...")
-            elif isinstance(event, AskHumanEvent):
-                status.stop()
-                console.print()
-                answer = console.input(
-                    f"[bold cyan]Human response required[/]\n[bold]Question:[/]\n{event.question}\n[bold]Reason for asking[/]\n{event.reason}\n[bold cyan]Your answer:[/] "
-                )
-                while answer.strip() == "":
-                    console.print("[bold red]You need to provide an answer[/]\n")
+    session_id = uuid.uuid4().hex
+    # keep a reference to the agent of the run, to report on it once it is released
+    agent = SESSIONS.get(session_id)
+    try:
+        handler = workflow.run(start_event=InputEvent(task=task, session_id=session_id))
+        with console.status(status="Working on your request...") as status:
+            async for event in handler.stream_events():
+                if isinstance(event, ToolCallEvent):
+                    status.update("Tool calling...")
+                    content = f"Calling tool `{event.tool_name}` with input:\n\n```\n{json.dumps(event.tool_input, indent=2)}\n```\n\nThe tool call is motivated by: {event.reason}"
+                    panel = Panel(
+                        Markdown(content),
+                        title_align="left",
+                        title="Tool Call",
+                        border_style="bold yellow",
+                    )
+                    console.print(panel)
+                    status.update("Working on the next move...")
+                elif isinstance(event, GoDeeperEvent):
+                    status.update("Going deeper into the filesystem...")
+                    content = f"Going to directory: `{event.directory}` because of: {event.reason}"
+                    panel = Panel(
+                        Markdown(content),
+                        title_align="left",
+                        title="Moving within the file system",
+                        border_style="bold magenta",
+                    )
+                    console.print(panel)
+                    status.update("Working on the next move...")
+                elif isinstance(event, AskHumanEvent):
+                    status.stop()
+                    console.print()
                     answer = console.input(
                         f"[bold cyan]Human response required[/]\n[bold]Question:[/]\n{event.question}\n[bold]Reason for asking[/]\n{event.reason}\n[bold cyan]Your answer:[/] "
                     )
-                handler.ctx.send_event(HumanAnswerEvent(response=answer.strip()))
-                console.print()
-                status.start()
-                status.update("Working on your request...")
-        result = await handler
-        status.update("Gathering the final result...")
-        await asyncio.sleep(0.1)
-        content = result.final_result
-        panel = Panel(
-            Markdown(content),
-            title_align="left",
-            title="Final result",
-            border_style="bold green",
+                    while answer.strip() == "":
+                        console.print("[bold red]You need to provide an answer[/]\n")
+                        answer = console.input(
+                            f"[bold cyan]Human response required[/]\n[bold]Question:[/]\n{event.question}\n[bold]Reason for asking[/]\n{event.reason}\n[bold cyan]Your answer:[/] "
+                        )
+                    handler.ctx.send_event(HumanAnswerEvent(response=answer.strip()))
+                    console.print()
+                    status.start()
+                    status.update("Working on your request...")
+            result = await handler
+            status.update("Gathering the final result...")
+            await asyncio.sleep(0.1)
+            content = result.final_result
+            panel = Panel(
+                Markdown(content),
+                title_align="left",
+                title="Final result",
+                border_style="bold green",
+            )
+            console.print(panel)
+            status.stop()
+    finally:
+        SESSIONS.release(session_id)
+    if steps := agent.context_steps:
+        console.print(
+            f"[dim]{len(steps)} steps, {steps[-1].tokens:,} context tokens in the last one, "
+            f"{agent.tokens_saved:,} tokens saved by compacting the history[/]"
+        )
+    for tier, metrics in agent.tier_metrics().items():
+        if metrics.calls:
+            console.print(
+                f"[dim]{tier} model ({metrics.model}): {metrics.calls} calls, "
+                f"{metrics.average_latency:.2f}s on average, {metrics.total_latency:.1f}s in total[/]"
+            )
+    if (cassette := agent.cassette).mode != "passthrough":
+        console.print(
+            f"[dim]{cassette.hits} of {cassette.hits + cassette.misses} model responses replayed from {cassette.path}[/]"
         )
-        console.print(panel)
-        status.stop()
     return None
 
 
@@ -121,11 +164,47 @@ def load_cache(
         Option(
             "--skip",
             "-s",
-            help="Skip one or more directories or files within the target directory. The path should be relative to the target directory (e.g. `testfile.txt` and not `data/testfile.txt` if `data` is the target directory). Can be used multiple times. Defaults to an empty list. Used only if `--recursive` is set.",
+            help="Skip one or more directories or files within the target directory. The path should be relative to the target directory (e.g. `testfile.txt` and not `data/testfile.txt` if `data` is the target directory). Skipped directories are not descended into. Can be used multiple times. Defaults to an empty list.",
         ),
     ] = [],
+    incremental: Annotated[
+        bool,
+        Option(
+            "--incremental/--full",
+            help="Skip the files that already have a valid cached entry (default), or re-parse everything",
+            is_flag=True,
+        ),
+    ] = True,
+    concurrency: Annotated[
+        int,
+        Option(
+            "--concurrency",
+            "-c",
+            help="Number of files parsed concurrently at the start. The scheduler then adapts it to the observed latency and rate limiting.",
+        ),
+    ] = 5,
+    max_concurrency: Annotated[
+        int,
+        Option(
+            "--max-concurrency",
+            help="Upper bound for the adaptive concurrency",
+        ),
+    ] = 32,
 ) -> None:
-    asyncio.run(parse_and_cache(directory, recursive, to_skip))
+    scheduler = ParseScheduler(
+        initial_concurrency=concurrency, max_concurrency=max_concurrency
+    )
+    report = asyncio.run(
+        parse_and_cache(directory, recursive, to_skip, incremental, scheduler=scheduler)
+    )
+    metrics = scheduler.metrics()
+    console = Console()
+    console.print(
+        f"[bold green]Parsed {report.parsed} files[/], skipped {report.skipped} already cached, resumed past {report.resumed} from an interrupted run, [bold red]{report.failed} failed[/] (see fs-explorer.log)"
+    )
+    console.print(
+        f"LlamaParse throughput: {metrics.throughput:.2f} files/s, average latency {metrics.average_latency:.2f}s, {metrics.retries} retries ({metrics.throttled} rate limited), final concurrency {metrics.concurrency}"
+    )
 
 
 @app.command(
@@ -164,3 +243,183 @@ def get_cached(
         console.print(panel)
     else:
         console.print(f"[bold yellow]No cached content for {file}[/]")
+
+
+def _print_index_report(report: IndexReport) -> None:
+    console = Console()
+    console.print(
+        f"[bold green]Indexed {report.root}[/] in {report.elapsed:.2f}s: {report.scanned_directories} directories scanned, {report.unchanged_directories} unchanged, {report.updated_entries} entries updated, {report.removed_entries} removed"
+    )
+
+
+@index_app.command(
+    name="build",
+    help="Build the metadata index for a directory from scratch",
+)
+def build_index(
+    directory: Annotated[
+        str,
+        Option(
+            "--directory",
+            "-d",
+            help="Directory to index (recursively). Defaults to current working directory.",
+        ),
+    ] = ".",
+) -> None:
+    _print_index_report(INDEX.build(directory))
+
+
+@index_app.command(
+    name="refresh",
+    help="Incrementally refresh the metadata index for a directory, re-listing only the directories whose modification time changed",
+)
+def refresh_index(
+    directory: Annotated[
+        str,
+        Option(
+            "--directory",
+            "-d",
+            help="Indexed directory to refresh. Defaults to current working directory.",
+        ),
+    ] = ".",
+) -> None:
+    _print_index_report(INDEX.refresh(directory))
+
+
+@index_app.command(
+    name="fulltext",
+    help="Build or incrementally update the trigram full-text index over the text files of a directory and over the cached parsed files",
+)
+def build_fulltext_index(
+    directory: Annotated[
+        str,
+        Option(
+            "--directory",
+            "-d",
+            help="Directory whose text files should be indexed (recursively). Defaults to current working directory.",
+        ),
+    ] = ".",
+    include_parsed: Annotated[
+        bool,
+        Option(
+            "--parsed/--no-parsed",
+            help="Also index the content of the cached parsed files",
+            is_flag=True,
+        ),
+    ] = True,
+) -> None:
+    report = FULLTEXT_INDEX.build(directory, include_parsed=include_parsed)
+    console = Console()
+    console.print(
+        f"[bold green]Full-text index updated[/] in {report.elapsed:.2f}s: {report.indexed_files} text files and {report.indexed_parsed} parsed files indexed, {report.unchanged} unchanged, {report.removed} removed"
+    )
+
+
+@index_app.command(
+    name="search",
+    help="Search a regular expression with the full-text index",
+)
+def search_index(
+    pattern: Annotated[
+        str,
+        Option("--pattern", "-p", help="Regular expression to search for"),
+    ],
+    max_matches: Annotated[
+        int,
+        Option("--max", "-m", help="Max matching lines to display. Defaults to 200"),
+    ] = 200,
+) -> None:
+    console = Console()
+    console.print(search_fulltext_index(pattern, max_matches=max_matches), markup=False)
+
+
+@cache_app.command(
+    name="stats",
+    help="Show the size of the parsed files cache and how often it has been hit",
+)
+def cache_stats() -> None:
+    stats = CACHE.stats()
+    table = Table(title="Parsed files cache", title_justify="left")
+    table.add_column("Metric", style="bold")
+    table.add_column("Value", justify="right")
+    table.add_row("Entries", f"{stats.entries:,}")
+    table.add_row("Size on disk", f"{stats.total_bytes / 1024 / 1024:,.2f} MB")
+    table.add_row("Average entry size", f"{stats.average_entry_bytes / 1024:,.2f} KB")
+    table.add_row("Hits", f"{stats.hits:,}")
+    table.add_row("Misses", f"{stats.misses:,}")
+    table.add_row("Hit rate", f"{stats.hit_rate:.1%}")
+    table.add_row("Size limit", f"{CACHE_SIZE_LIMIT / 1024 / 1024:,.0f} MB")
+    table.add_row("Eviction policy", CACHE_EVICTION_POLICY)
+    table.add_row("Time to live", f"{CACHE_TTL:,.0f} s" if CACHE_TTL else "none")
+    table.add_row("Mounted bundle", str(CACHE_BUNDLE) if CACHE_BUNDLE else "none")
+    Console().print(table)
+
+
+@cache_app.command(
+    name="export",
+    help="Pack the parsed files cache into a single read-only bundle, that other machines can import or mount directly (FS_EXPLORER_CACHE_BUNDLE)",
+)
+def cache_export(
+    output: Annotated[
+        str,
+        Option("--output", "-o", help="Path of the bundle to write"),
+    ] = str(DEFAULT_BUNDLE_PATH),
+) -> None:
+    report = CACHE.export_bundle(Path(output))
+    Console().print(
+        f"[bold green]Exported {report.documents} documents for {report.paths} files[/] to {output} ({report.bundle_bytes / 1024 / 1024:,.2f} MB)"
+    )
+
+
+@cache_app.command(
+    name="import",
+    help="Copy the entries of a bundle into the parsed files cache. To serve a bundle without copying it, set FS_EXPLORER_CACHE_BUNDLE to its path instead",
+)
+def cache_import(
+    bundle: Annotated[
+        str,
+        Option("--bundle", "-b", help="Path of the bundle to import"),
+    ] = str(DEFAULT_BUNDLE_PATH),
+) -> None:
+    imported = CACHE.import_bundle(Path(bundle))
+    Console().print(f"[bold green]Imported {imported} files[/] from {bundle}")
+
+
+@cache_app.command(
+    name="gc",
+    help="Remove the cached entries of files that no longer exist, as well as the expired ones, and enforce the cache size limit (FS_EXPLORER_CACHE_MAX_MB, FS_EXPLORER_CACHE_EVICTION and FS_EXPLORER_CACHE_TTL)",
+)
+def cache_gc() -> None:
+    report = CACHE.collect_garbage()
+    Console().print(
+        f"[bold green]Reclaimed {report.reclaimed_bytes / 1024 / 1024:,.2f} MB[/]: dropped {report.removed_paths} deleted source files, {report.removed_entries} unreferenced or evicted entries and {report.expired_entries} expired entries"
+    )
+
+
+@cache_app.command(
+    name="compress",
+    help="Compress the cached entries that are still stored as plain text, optionally training a compression dictionary on the cached corpus first",
+)
+def cache_compress(
+    train: Annotated[
+        bool,
+        Option(
+            "--train/--no-train",
+            help="Train a new compression dictionary on a sample of the cached files before compressing",
+            is_flag=True,
+        ),
+    ] = True,
+) -> None:
+    console = Console()
+    if train:
+        dictionary_id = CACHE.train_dictionary()
+        if dictionary_id:
+            console.print(f"Trained compression dictionary #{dictionary_id}")
+        else:
+            console.print(
+                "[bold yellow]Not enough recurring content to train a dictionary[/]"
+            )
+    report = CACHE.compress_entries()
+    console.print(
+        f"[bold green]Compressed {report.compressed} of {report.entries} entries[/]: {report.raw_bytes / 1024 / 1024:,.2f} MB of text stored in {report.stored_bytes / 1024 / 1024:,.2f} MB (ratio {report.ratio:.1f}x)"
+    )
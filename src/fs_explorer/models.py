@@ -1,7 +1,18 @@
 from pydantic import BaseModel, Field
 from typing import TypeAlias, Literal, Any
 
-Tools: TypeAlias = Literal["read", "grep", "glob", "check_api_key", "parse_file"]
+Tools: TypeAlias = Literal[
+    "read",
+    "grep",
+    "search",
+    "search_index",
+    "glob",
+    "describe",
+    "check_api_key",
+    "parse_file",
+    "outline",
+    "read_result",
+]
 ActionType: TypeAlias = Literal["stop", "godeeper", "toolcall", "askhuman"]
 
 
@@ -43,16 +54,42 @@ class ToolCallAction(BaseModel):
         return args
 
 
+class ToolCallBatchAction(BaseModel):
+    """Action that is used to call several independent tools at once, for example to read a few candidate files"""
+
+    tool_calls: list[ToolCallAction] = Field(
+        min_length=1,
+        description="Tool calls to perform concurrently, none of them depending on the result of another",
+    )
+
+
 class Action(BaseModel):
     """Action to take based on the current chat history"""
 
-    action: ToolCallAction | GoDeeperAction | StopAction | AskHumanAction = Field(
-        description="Action specification for the next step"
-    )
+    action: (
+        ToolCallAction
+        | ToolCallBatchAction
+        | GoDeeperAction
+        | StopAction
+        | AskHumanAction
+    ) = Field(description="Action specification for the next step")
     reason: str = Field(description="Reason for taking this specific action")
+    confidence: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+        description="How confident you are that this is the right action, between 0 (guessing) and 1 (certain)",
+    )
 
-    def to_action_type(self) -> ActionType:
+    def tool_calls(self) -> list[ToolCallAction]:
         if isinstance(self.action, ToolCallAction):
+            return [self.action]
+        elif isinstance(self.action, ToolCallBatchAction):
+            return self.action.tool_calls
+        return []
+
+    def to_action_type(self) -> ActionType:
+        if isinstance(self.action, (ToolCallAction, ToolCallBatchAction)):
             return "toolcall"
         elif isinstance(self.action, GoDeeperAction):
             return "godeeper"
@@ -0,0 +1,80 @@
+import re
+
+from typing import NamedTuple
+
+# parsed documents are stored as a single text, with a form feed between pages
+PAGE_SEPARATOR = "\f"
+MAX_OUTLINE_ENTRIES = 200
+MAX_TITLE_CHARS = 80
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+class OutlineEntry(NamedTuple):
+    page: int
+    level: int
+    title: str
+
+
+def join_pages(pages: list[str]) -> str:
+    return PAGE_SEPARATOR.join(page.replace(PAGE_SEPARATOR, "\n") for page in pages)
+
+
+def split_pages(text: str) -> list[str]:
+    return text.split(PAGE_SEPARATOR)
+
+
+def parse_page_range(spec: str, page_count: int) -> list[int]:
+    """
+    Page numbers (1-based) selected by a spec like "12", "3-5" or "1,4,10-12".
+    Open ranges ("10-", "-3") extend to the end or the start of the document.
+    """
+    selected: list[int] = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        try:
+            first = int(start) if start else 1
+            last = (int(end) if end else page_count) if sep else first
+        except ValueError:
+            raise ValueError(f"invalid page range: {part!r}")
+        if first < 1 or last > page_count or first > last:
+            raise ValueError(
+                f"page range {part!r} is out of bounds (the document has {page_count} pages)"
+            )
+        selected.extend(page for page in range(first, last + 1) if page not in selected)
+    if not selected:
+        raise ValueError(f"invalid page range: {spec!r}")
+    return selected
+
+
+def outline(pages: list[str]) -> list[OutlineEntry]:
+    """Markdown headings of each page, or its first line when it has none"""
+    entries: list[OutlineEntry] = []
+    for number, page in enumerate(pages, start=1):
+        lines = [line.strip() for line in page.splitlines() if line.strip()]
+        headings = [
+            OutlineEntry(number, len(match.group(1)), match.group(2))
+            for line in lines
+            if (match := _HEADING.match(line)) is not None
+        ]
+        if headings:
+            entries.extend(headings)
+        elif lines:
+            entries.append(OutlineEntry(number, 0, lines[0]))
+    return entries
+
+
+def format_outline(file_path: str, pages: list[str]) -> str:
+    entries = outline(pages)
+    lines = [f"{file_path}: {len(pages)} pages", "", "Outline (page: heading):"]
+    for entry in entries[:MAX_OUTLINE_ENTRIES]:
+        title = entry.title
+        if len(title) > MAX_TITLE_CHARS:
+            title = title[:MAX_TITLE_CHARS] + "…"
+        indent = "  " * max(entry.level - 1, 0)
+        lines.append(f"  {entry.page}: {indent}{title}")
+    if len(entries) > MAX_OUTLINE_ENTRIES:
+        lines.append(f"  ... {len(entries) - MAX_OUTLINE_ENTRIES} more entries")
+    return "\n".join(lines)
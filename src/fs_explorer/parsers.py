@@ -0,0 +1,203 @@
+import os
+import re
+import string
+import asyncio
+import zipfile
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Protocol, cast
+from xml.etree import ElementTree
+from llama_cloud_services.parse.types import JobResult
+from llama_cloud_services import LlamaParse
+from pypdf import PdfReader
+from .pages import join_pages
+from .scheduler import ParseFailed, ParseScheduler, result_text
+
+LOCAL_PARSE_WORKERS = min(os.cpu_count() or 1, 8)
+# below this many characters per page, a PDF is most likely scanned (no text layer)
+MIN_PDF_CHARS_PER_PAGE = 100
+MIN_READABLE_RATIO = 0.9
+OOXML_EXTENSIONS = frozenset({".docx", ".pptx", ".xlsx"})
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_PRINTABLE = frozenset(string.printable)
+
+
+class Parser(Protocol):
+    async def parse(self, file_path: str) -> str: ...
+
+
+def _sort_numbered(names: list[str], pattern: str) -> list[str]:
+    numbered = []
+    for name in names:
+        if (match := re.fullmatch(pattern, name)) is not None:
+            numbered.append((int(match.group(1)), name))
+    return [name for _, name in sorted(numbered)]
+
+
+def _paragraphs(root: ElementTree.Element, namespace: str) -> list[str]:
+    paragraphs = []
+    for paragraph in root.iter(f"{namespace}p"):
+        parts = []
+        for element in paragraph.iter():
+            if element.tag == f"{namespace}t" and element.text:
+                parts.append(element.text)
+            elif element.tag == f"{namespace}tab":
+                parts.append("\t")
+            elif element.tag in (f"{namespace}br", f"{namespace}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return paragraphs
+
+
+def _docx_pages(archive: zipfile.ZipFile) -> list[str]:
+    root = ElementTree.fromstring(archive.read("word/document.xml"))
+    return ["\n".join(_paragraphs(root, _W))]
+
+
+def _pptx_pages(archive: zipfile.ZipFile) -> list[str]:
+    slides = _sort_numbered(archive.namelist(), r"ppt/slides/slide(\d+)\.xml")
+    return [
+        "\n".join(_paragraphs(ElementTree.fromstring(archive.read(slide)), _A))
+        for slide in slides
+    ]
+
+
+def _xlsx_pages(archive: zipfile.ZipFile) -> list[str]:
+    names = archive.namelist()
+    shared: list[str] = []
+    if "xl/sharedStrings.xml" in names:
+        root = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+        shared = [
+            "".join(t.text or "" for t in item.iter(f"{_S}t"))
+            for item in root.iter(f"{_S}si")
+        ]
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    titles = [sheet.get("name", "") for sheet in workbook.iter(f"{_S}sheet")]
+    pages = []
+    sheets = _sort_numbered(names, r"xl/worksheets/sheet(\d+)\.xml")
+    for i, sheet in enumerate(sheets):
+        lines = [f"# {titles[i]}" if i < len(titles) else f"# Sheet {i + 1}"]
+        for row in ElementTree.fromstring(archive.read(sheet)).iter(f"{_S}row"):
+            cells = []
+            for cell in row.iter(f"{_S}c"):
+                kind = cell.get("t")
+                value = cell.find(f"{_S}v")
+                if kind == "inlineStr":
+                    cells.append("".join(t.text or "" for t in cell.iter(f"{_S}t")))
+                elif value is None or value.text is None:
+                    cells.append("")
+                elif kind == "s":
+                    cells.append(shared[int(value.text)])
+                else:
+                    cells.append(value.text)
+            lines.append("\t".join(cells).rstrip("\t"))
+        pages.append("\n".join(lines))
+    return pages
+
+
+def _pdf_pages(file_path: str) -> list[str]:
+    reader = PdfReader(file_path)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def extract_pages(file_path: str) -> list[str]:
+    """Text of each page (slide, sheet) of a document, extracted without any network call"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".pdf":
+        return _pdf_pages(file_path)
+    if extension in OOXML_EXTENSIONS:
+        with zipfile.ZipFile(file_path) as archive:
+            if extension == ".docx":
+                return _docx_pages(archive)
+            if extension == ".pptx":
+                return _pptx_pages(archive)
+            return _xlsx_pages(archive)
+    raise ParseFailed(f"{extension or 'this file type'} cannot be parsed locally")
+
+
+def is_low_quality(pages: list[str], file_path: str) -> bool:
+    text = "".join(pages).strip()
+    if not text:
+        return True
+    readable = sum(c in _PRINTABLE or c.isalnum() for c in text)
+    if readable / len(text) < MIN_READABLE_RATIO:
+        return True
+    return (
+        file_path.lower().endswith(".pdf")
+        and len(text) / max(len(pages), 1) < MIN_PDF_CHARS_PER_PAGE
+    )
+
+
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        _PROCESS_POOL = ProcessPoolExecutor(
+            max_workers=LOCAL_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _PROCESS_POOL
+
+
+class LocalParser:
+    """Text-layer PDFs and OOXML documents, parsed in a process pool"""
+
+    def supports(self, file_path: str) -> bool:
+        extension = os.path.splitext(file_path)[1].lower()
+        return extension in OOXML_EXTENSIONS or extension == ".pdf"
+
+    async def parse(self, file_path: str) -> str:
+        if not self.supports(file_path):
+            raise ParseFailed(f"{file_path} cannot be parsed locally")
+        loop = asyncio.get_running_loop()
+        pages = await loop.run_in_executor(
+            _get_process_pool(), extract_pages, file_path
+        )
+        if is_low_quality(pages, file_path):
+            raise ParseFailed(f"the local text of {file_path} is empty or unreadable")
+        return join_pages(pages)
+
+
+class RemoteParser:
+    """LlamaParse, with the calls paced and retried by a scheduler"""
+
+    def __init__(self, client: LlamaParse, scheduler: ParseScheduler) -> None:
+        self.client = client
+        self.scheduler = scheduler
+
+    async def parse(self, file_path: str) -> str:
+        async def job() -> str:
+            result = await self.client.aparse(file_path=file_path)
+            return await result_text(cast(JobResult, result))
+
+        return await self.scheduler.run(job)
+
+
+class RoutingParser:
+    """Local parsing first, the remote parser only when the local result is missing or poor"""
+
+    def __init__(self, local: LocalParser, remote: Parser | None) -> None:
+        self.local = local
+        self.remote = remote
+
+    async def parse(self, file_path: str) -> str:
+        if self.local.supports(file_path):
+            try:
+                return await self.local.parse(file_path)
+            except Exception:
+                if self.remote is None:
+                    raise
+        if self.remote is None:
+            raise ParseFailed(
+                f"{file_path} cannot be parsed locally and no remote parser is configured (`LLAMA_CLOUD_API_KEY` is not set)"
+            )
+        return await self.remote.parse(file_path)
+
+
+LOCAL_PARSER = LocalParser()
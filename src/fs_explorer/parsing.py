@@ -0,0 +1,121 @@
+import os
+import asyncio
+import weakref
+
+import httpx
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+from llama_cloud_services.parse.utils import ResultType
+from llama_cloud_services import LlamaParse
+from .scheduler import ParseScheduler
+from .parsers import LOCAL_PARSER, LocalParser, RemoteParser, RoutingParser
+
+if TYPE_CHECKING:
+    from .caching import ParsedFileCache
+
+MAX_CONNECTIONS = 32
+HTTP_TIMEOUT = 60.0
+
+
+def _new_client(api_key: str) -> LlamaParse:
+    return LlamaParse(
+        api_key=api_key,
+        result_type=ResultType.TXT,
+        fast_mode=True,
+        custom_client=httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        ),
+    )
+
+
+class _LoopState:
+    def __init__(self, scheduler: ParseScheduler) -> None:
+        self.scheduler = scheduler
+        self.clients: dict[str, LlamaParse] = {}
+        self.in_flight: dict[str, asyncio.Future[str]] = {}
+
+
+class ParsePool:
+    """
+    Process-wide LlamaParse clients and in-flight parse jobs. Clients are reused
+    (with their HTTP connection pool) per API key, and concurrent requests for the
+    same file share a single parse job, routed to the local parser first. State,
+    the scheduler included, is kept per event loop, since HTTP connections, futures
+    and the scheduler's condition cannot cross loops.
+    """
+
+    def __init__(
+        self,
+        scheduler_factory: Callable[[], ParseScheduler] = ParseScheduler,
+        client_factory: Callable[[str], LlamaParse] = _new_client,
+        local: LocalParser = LOCAL_PARSER,
+    ) -> None:
+        self._scheduler_factory = scheduler_factory
+        self.local = local
+        self._client_factory = client_factory
+        self._states: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, _LoopState
+        ] = weakref.WeakKeyDictionary()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        if (state := self._states.get(loop)) is None:
+            state = self._states[loop] = _LoopState(self._scheduler_factory())
+        return state
+
+    @property
+    def scheduler(self) -> ParseScheduler:
+        """Scheduler of the parse jobs started from the running event loop"""
+        return self._state().scheduler
+
+    def get_client(self, api_key: str) -> LlamaParse:
+        clients = self._state().clients
+        if (client := clients.get(api_key)) is None:
+            client = clients[api_key] = self._client_factory(api_key)
+        return client
+
+    def backend(self, scheduler: ParseScheduler | None = None) -> RoutingParser:
+        """Local parser first, then LlamaParse if `LLAMA_CLOUD_API_KEY` is set"""
+        api_key = os.getenv("LLAMA_CLOUD_API_KEY")
+        remote = None
+        if api_key is not None:
+            remote = RemoteParser(self.get_client(api_key), scheduler or self.scheduler)
+        return RoutingParser(self.local, remote)
+
+    def in_flight(self) -> int:
+        return len(self._state().in_flight)
+
+    async def _parse(self, resolved_path: str, cache: "ParsedFileCache") -> str:
+        # a job for this file may have finished between the caller's cache lookup and now
+        # both may hash the whole file and do SQLite I/O: keep them off the event loop
+        if (
+            content := await asyncio.to_thread(cache.get_file, resolved_path)
+        ) is not None:
+            return content
+        text = await self.backend().parse(resolved_path)
+        await asyncio.to_thread(cache.add_file, resolved_path, text)
+        return text
+
+    async def parse(self, file_path: str, cache: "ParsedFileCache") -> str:
+        """Parse a file (or join the parse already running for it) and write the result through to the cache"""
+        resolved_path = str(Path(file_path).resolve())
+        in_flight = self._state().in_flight
+        if (future := in_flight.get(resolved_path)) is None:
+            future = in_flight[resolved_path] = asyncio.ensure_future(
+                self._parse(resolved_path, cache)
+            )
+
+            def done(future: asyncio.Future[str]) -> None:
+                in_flight.pop(resolved_path, None)
+                # retrieved here too, in case every waiter has been cancelled
+                if not future.cancelled():
+                    future.exception()
+
+            future.add_done_callback(done)
+        # a cancelled caller must not cancel the job for the others waiting on it
+        return await asyncio.shield(future)
+
+
+PARSE_POOL = ParsePool()
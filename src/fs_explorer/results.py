@@ -0,0 +1,77 @@
+import os
+import hashlib
+
+from collections import OrderedDict
+
+# tool results longer than this are kept out of the chat history: only a preview
+# and a handle to page through the rest with `read_result` are sent to the model
+INLINE_RESULT_CHARS = int(os.getenv("FS_EXPLORER_INLINE_RESULT_CHARS", "8000"))
+RESULT_PREVIEW_CHARS = 2000
+MAX_STORED_RESULT_CHARS = 64 * 1024 * 1024
+
+
+class ResultStore:
+    """In-memory store of large tool results, evicting the least recently used ones"""
+
+    def __init__(
+        self,
+        inline_chars: int = INLINE_RESULT_CHARS,
+        preview_chars: int = RESULT_PREVIEW_CHARS,
+        max_chars: int = MAX_STORED_RESULT_CHARS,
+    ) -> None:
+        self.inline_chars = inline_chars
+        self.preview_chars = preview_chars
+        self.max_chars = max_chars
+        self._results: OrderedDict[str, str] = OrderedDict()
+        self._chars = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def put(self, text: str) -> str:
+        # content-derived, so that replaying a session sends the same requests
+        handle = f"result-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]}"
+        if handle in self._results:
+            self._results.move_to_end(handle)
+            return handle
+        self._results[handle] = text
+        self._chars += len(text)
+        while self._chars > self.max_chars and len(self._results) > 1:
+            _, evicted = self._results.popitem(last=False)
+            self._chars -= len(evicted)
+        return handle
+
+    def get(self, handle: str) -> str | None:
+        if (text := self._results.get(handle)) is not None:
+            self._results.move_to_end(handle)
+        return text
+
+    def inline(self, tool_name: str, result: str) -> str:
+        """The result itself if it is short enough, otherwise a preview and a handle"""
+        if len(result) <= self.inline_chars:
+            return result
+        handle = self.put(result)
+        preview = result[: self.preview_chars]
+        return (
+            f"The result of `{tool_name}` is {len(result):,} characters long and was stored as `{handle}`: "
+            f"here are the first {len(preview):,}. Call `read_result` with handle='{handle}' and offset={len(preview)} to read more.\n\n{preview}"
+        )
+
+    def read(self, handle: str, offset: int = 0, limit: int | None = None) -> str:
+        if (text := self.get(handle)) is None:
+            return f"No stored result with handle {handle!r}: it may have been evicted, call the original tool again"
+        limit = self.inline_chars if limit is None else min(limit, self.inline_chars)
+        if offset < 0 or offset >= len(text):
+            return f"Offset {offset} is out of bounds: `{handle}` is {len(text):,} characters long"
+        end = min(offset + max(limit, 1), len(text))
+        page = text[offset:end]
+        if end < len(text):
+            page += f"\n\n[characters {offset}-{end} of {len(text):,}: call `read_result` with offset={end} to continue]"
+        return page
+
+
+RESULT_STORE = ResultStore()
+
+
+def read_result(handle: str, offset: int = 0, limit: int | None = None) -> str:
+    return RESULT_STORE.read(handle, offset, limit)
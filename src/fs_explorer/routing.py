@@ -0,0 +1,111 @@
+import os
+
+from typing import Literal, NamedTuple, cast
+
+from .models import Action
+
+Tier = Literal["fast", "strong"]
+# - tiered: navigation and tool selection go to the fast model, the final answer
+#   and the steps after repeated low-confidence actions go to the strong one
+# - single: every step goes to the strong model
+RoutingPolicy = Literal["tiered", "single"]
+STRONG_MODEL = os.getenv("FS_EXPLORER_MODEL", "gemini-3-flash-preview")
+FAST_MODEL = os.getenv("FS_EXPLORER_FAST_MODEL", "gemini-2.5-flash-lite")
+ROUTING_POLICY = cast(RoutingPolicy, os.getenv("FS_EXPLORER_ROUTING", "tiered"))
+LOW_CONFIDENCE = 0.5
+ESCALATE_AFTER = 2
+
+
+class TierMetrics(NamedTuple):
+    model: str
+    calls: int
+    average_latency: float
+    total_latency: float
+
+
+def _tool_calls(action: Action) -> list[tuple[str, dict]]:
+    return [
+        (toolcall.tool_name, toolcall.to_fn_args()) for toolcall in action.tool_calls()
+    ]
+
+
+class ModelRouter:
+    """Chooses the model of each agent step and keeps per-tier latency"""
+
+    def __init__(
+        self,
+        strong_model: str = STRONG_MODEL,
+        fast_model: str = FAST_MODEL,
+        policy: RoutingPolicy = ROUTING_POLICY,
+        low_confidence: float = LOW_CONFIDENCE,
+        escalate_after: int = ESCALATE_AFTER,
+    ) -> None:
+        if policy not in ("tiered", "single"):
+            raise ValueError(f"unknown routing policy: {policy!r}")
+        self.models: dict[Tier, str] = {"fast": fast_model, "strong": strong_model}
+        self.policy = policy
+        self.low_confidence = low_confidence
+        self.escalate_after = escalate_after
+        self._uncertain_steps = 0
+        self._last_tool_calls: list[tuple[str, dict]] | None = None
+        # answers of the fast model that were asked again to the strong one
+        self.escalations = 0
+        self._calls: dict[Tier, int] = {"fast": 0, "strong": 0}
+        self._latency: dict[Tier, float] = {"fast": 0.0, "strong": 0.0}
+
+    @property
+    def tiered(self) -> bool:
+        return self.policy == "tiered" and self.models["fast"] != self.models["strong"]
+
+    def tier(self) -> Tier:
+        """Tier of the next step"""
+        if not self.tiered or self._uncertain_steps >= self.escalate_after:
+            return "strong"
+        return "fast"
+
+    def _is_uncertain(self, action: Action) -> bool:
+        if action.to_action_type() == "askhuman":
+            return True
+        if action.confidence < self.low_confidence:
+            return True
+        # the same tool calls twice in a row: the model is going around in circles
+        tool_calls = _tool_calls(action)
+        return bool(tool_calls) and tool_calls == self._last_tool_calls
+
+    def should_escalate(self, tier: Tier, action: Action | None) -> bool:
+        """Whether the answer of the fast model should be asked again to the strong one"""
+        if tier != "fast":
+            return False
+        # the final answer, or an action the fast model could not produce
+        if action is None or action.to_action_type() == "stop":
+            self.escalations += 1
+            return True
+        return False
+
+    def record(self, tier: Tier, latency: float, action: Action | None = None) -> None:
+        """Record a model call, and the action taken unless it was discarded"""
+        self._calls[tier] += 1
+        self._latency[tier] += latency
+        if action is None:
+            return
+        # once escalated, a confident step of the strong model hands back to the fast one
+        if self._is_uncertain(action):
+            self._uncertain_steps += 1
+        else:
+            self._uncertain_steps = 0
+        self._last_tool_calls = _tool_calls(action)
+
+    def metrics(self) -> dict[Tier, TierMetrics]:
+        return {
+            tier: TierMetrics(
+                model=self.models[tier],
+                calls=self._calls[tier],
+                average_latency=(
+                    self._latency[tier] / self._calls[tier]
+                    if self._calls[tier]
+                    else 0.0
+                ),
+                total_latency=self._latency[tier],
+            )
+            for tier in self._calls
+        }
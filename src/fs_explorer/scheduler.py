@@ -0,0 +1,238 @@
+import time
+import random
+import asyncio
+
+from collections import deque
+from typing import Awaitable, Callable, NamedTuple, TypeVar
+from llama_cloud_services.parse.types import JobResult
+from .pages import join_pages
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# status codes that mean "slow down", as opposed to a one-off server hiccup
+OVERLOAD_STATUS_CODES = frozenset({429, 503})
+THROUGHPUT_WINDOW = 60.0
+
+
+class TransientParseError(Exception):
+    """Parse failure that is worth retrying (rate limits, timeouts, 5xx errors)"""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class SchedulerMetrics(NamedTuple):
+    concurrency: int
+    in_flight: int
+    queued: int
+    completed: int
+    failed: int
+    retries: int
+    throttled: int
+    average_latency: float
+    throughput: float
+
+
+def status_code_of(error: BaseException) -> int | None:
+    for candidate in (error, getattr(error, "response", None)):
+        code = getattr(candidate, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def _retry_after_of(error: BaseException) -> float | None:
+    if isinstance(error, TransientParseError):
+        return error.retry_after
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers["retry-after"]) if headers is not None else None
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, (TransientParseError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = status_code_of(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS_CODES
+    # network failures of the HTTP client (e.g. httpx.TransportError)
+    return type(error).__name__ in (
+        "ConnectError",
+        "ReadTimeout",
+        "RemoteProtocolError",
+    )
+
+
+class ParseScheduler:
+    """
+    Runs parse jobs with an adaptive concurrency limit (AIMD): the limit grows by
+    one after a full window of fast successes, and is halved when the backend
+    signals overload (429/503) or latency degrades well past the best observed.
+    Transient failures are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 5,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        latency_tolerance: float = 2.0,
+        classify: Callable[[BaseException], bool] = is_transient,
+    ) -> None:
+        self._limit = max(min_concurrency, min(initial_concurrency, max_concurrency))
+        self._min = min_concurrency
+        self._max = max_concurrency
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._latency_tolerance = latency_tolerance
+        self._classify = classify
+        self._condition: asyncio.Condition | None = None
+        self._in_flight = 0
+        self._queued = 0
+        self._successes_in_window = 0
+        self._last_decrease = 0.0
+        self._best_latency: float | None = None
+        self._latency_total = 0.0
+        self._completed = 0
+        self._failed = 0
+        self._retries = 0
+        self._throttled = 0
+        self._completions: deque[float] = deque()
+
+    @property
+    def concurrency(self) -> int:
+        return self._limit
+
+    @property
+    def max_concurrency(self) -> int:
+        return self._max
+
+    def _get_condition(self) -> asyncio.Condition:
+        # created lazily, so that the scheduler can be built outside of an event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self._queued += 1
+            try:
+                await condition.wait_for(lambda: self._in_flight < self._limit)
+            finally:
+                self._queued -= 1
+            self._in_flight += 1
+
+    async def _release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        self._completed += 1
+        self._latency_total += latency
+        now = time.monotonic()
+        self._completions.append(now)
+        while self._completions and now - self._completions[0] > THROUGHPUT_WINDOW:
+            self._completions.popleft()
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        if latency > self._best_latency * self._latency_tolerance and latency > 0.05:
+            self._decrease(now, halve=False)
+            return
+        self._successes_in_window += 1
+        if self._successes_in_window >= self._limit:
+            self._successes_in_window = 0
+            self._limit = min(self._limit + 1, self._max)
+
+    def _decrease(self, now: float, halve: bool) -> None:
+        # at most one decrease per round-trip, so that one burst of errors counts once
+        if now - self._last_decrease < (self._best_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._successes_in_window = 0
+        self._limit = max(self._min, self._limit // 2 if halve else self._limit - 1)
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        retry_after = _retry_after_of(error)
+        if retry_after is not None:
+            return min(retry_after, self._max_delay)
+        return random.uniform(0, min(self._max_delay, self._base_delay * 2**attempt))
+
+    async def run(self, job: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            await self._acquire()
+            start = time.monotonic()
+            try:
+                result = await job()
+            except Exception as e:
+                transient = self._classify(e)
+                if transient and status_code_of(e) in OVERLOAD_STATUS_CODES:
+                    self._throttled += 1
+                    self._decrease(time.monotonic(), halve=True)
+                if not transient or attempt >= self._max_retries:
+                    self._failed += 1
+                    raise
+                self._retries += 1
+                delay = self._backoff(attempt, e)
+            else:
+                self._on_success(time.monotonic() - start)
+                return result
+            finally:
+                # also when the job is cancelled (e.g. a tool timeout), or the slot leaks
+                await asyncio.shield(self._release())
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def metrics(self) -> SchedulerMetrics:
+        now = time.monotonic()
+        recent = [t for t in self._completions if now - t <= THROUGHPUT_WINDOW]
+        span = now - recent[0] if len(recent) > 1 else 0.0
+        return SchedulerMetrics(
+            concurrency=self._limit,
+            in_flight=self._in_flight,
+            queued=self._queued,
+            completed=self._completed,
+            failed=self._failed,
+            retries=self._retries,
+            throttled=self._throttled,
+            average_latency=(
+                self._latency_total / self._completed if self._completed else 0.0
+            ),
+            throughput=len(recent) / span if span > 0 else float(len(recent)),
+        )
+
+
+class ParseFailed(Exception):
+    """Parse job that completed with a permanent error"""
+
+
+async def result_text(result: JobResult) -> str:
+    """Text of a parse job result (pages separated by form feeds), raising a (transient or permanent) error if the job failed"""
+    if result.error is None:
+        if result.pages:
+            return join_pages([page.text or "" for page in result.pages])
+        return await result.aget_text()
+    try:
+        code = int(result.error_code or "")
+    except ValueError:
+        code = None
+    if code in TRANSIENT_STATUS_CODES:
+        raise TransientParseError(result.error, status_code=code)
+    raise ParseFailed(result.error)
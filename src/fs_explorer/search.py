@@ -0,0 +1,350 @@
+import os
+import re
+import mmap
+import fnmatch
+import itertools
+import multiprocessing
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterator, NamedTuple
+
+DEFAULT_MAX_MATCHES = 100
+DEFAULT_MAX_TOTAL_MATCHES = 200
+DEFAULT_MAX_OUTPUT_BYTES = 64 * 1024
+BINARY_SNIFF_BYTES = 8192
+PARALLEL_MIN_FILES = 16
+SEARCH_WORKERS = os.cpu_count() or 1
+IGNORED_DIRECTORIES = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".tox",
+        ".nox",
+    }
+)
+MAX_LINE_BYTES = 1000
+COUNT_CHUNK_SIZE = 1024 * 1024
+
+
+class LineMatch(NamedTuple):
+    line_number: int
+    line: str
+    before: list[str]
+    after: list[str]
+
+
+class GrepResult(NamedTuple):
+    matches: list[LineMatch]
+    truncated: bool
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, flags: int = re.MULTILINE) -> re.Pattern[bytes]:
+    return re.compile(pattern.encode("utf-8"), flags)
+
+
+def _count_newlines(buffer: bytes | mmap.mmap, start: int, end: int) -> int:
+    # slicing an mmap copies, so count in bounded chunks to keep memory flat
+    count = 0
+    while start < end:
+        stop = min(start + COUNT_CHUNK_SIZE, end)
+        count += buffer[start:stop].count(b"\n")
+        start = stop
+    return count
+
+
+def _line_bounds(buffer: bytes | mmap.mmap, pos: int) -> tuple[int, int]:
+    start = buffer.rfind(b"\n", 0, pos) + 1
+    end = buffer.find(b"\n", pos)
+    return start, (len(buffer) if end == -1 else end)
+
+
+def _decode_line(
+    buffer: bytes | mmap.mmap, start: int, end: int, anchor: int | None = None
+) -> str:
+    if end - start <= MAX_LINE_BYTES:
+        return buffer[start:end].decode("utf-8", errors="replace").rstrip("\r")
+    anchor = start if anchor is None else anchor
+    window_start = max(start, anchor - MAX_LINE_BYTES // 2)
+    window_end = min(end, window_start + MAX_LINE_BYTES)
+    line = buffer[window_start:window_end].decode("utf-8", errors="replace")
+    return (
+        ("..." if window_start > start else "")
+        + line
+        + ("..." if window_end < end else "")
+    )
+
+
+def _context_before(
+    buffer: bytes | mmap.mmap, line_start: int, count: int
+) -> list[str]:
+    lines: list[str] = []
+    end = line_start - 1
+    while count > 0 and end >= 0:
+        start = buffer.rfind(b"\n", 0, end) + 1
+        lines.append(_decode_line(buffer, start, end))
+        end = start - 1
+        count -= 1
+    return lines[::-1]
+
+
+def _context_after(buffer: bytes | mmap.mmap, line_end: int, count: int) -> list[str]:
+    lines: list[str] = []
+    start = line_end + 1
+    while count > 0 and start < len(buffer):
+        end = buffer.find(b"\n", start)
+        end = len(buffer) if end == -1 else end
+        lines.append(_decode_line(buffer, start, end))
+        start = end + 1
+        count -= 1
+    return lines
+
+
+def grep_buffer(
+    buffer: bytes | mmap.mmap,
+    regex: re.Pattern[bytes],
+    max_matches: int = DEFAULT_MAX_MATCHES,
+    context_lines: int = 0,
+) -> GrepResult:
+    matches: list[LineMatch] = []
+    pos = 0
+    counted_to = 0
+    line_number = 1
+    size = len(buffer)
+    # the position after a trailing newline (or in an empty buffer) starts no line
+    end = size - 1 if size == 0 or buffer[size - 1 : size] == b"\n" else size
+    while pos <= end:
+        match = regex.search(buffer, pos)
+        if match is None or match.start() > end:
+            return GrepResult(matches=matches, truncated=False)
+        if len(matches) >= max_matches:
+            return GrepResult(matches=matches, truncated=True)
+        line_start, line_end = _line_bounds(buffer, match.start())
+        line_number += _count_newlines(buffer, counted_to, line_start)
+        counted_to = line_start
+        matches.append(
+            LineMatch(
+                line_number=line_number,
+                line=_decode_line(buffer, line_start, line_end, match.start()),
+                before=_context_before(buffer, line_start, context_lines),
+                after=_context_after(buffer, line_end, context_lines),
+            )
+        )
+        # one hit per line: resume the scan from the next line
+        pos = line_end + 1
+    return GrepResult(matches=matches, truncated=False)
+
+
+def grep_path(
+    file_path: str,
+    pattern: str,
+    max_matches: int = DEFAULT_MAX_MATCHES,
+    context_lines: int = 0,
+) -> GrepResult:
+    regex = compile_pattern(pattern)
+    if os.path.getsize(file_path) == 0:
+        return GrepResult(matches=[], truncated=False)
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return grep_buffer(mm, regex, max_matches, context_lines)
+
+
+def format_matches(matches: list[LineMatch]) -> str:
+    # grep-style output: `N:` for matching lines, `N-` for context, `--` between hunks
+    numbered: dict[int, str] = {}
+    for match in matches:
+        first = match.line_number - len(match.before)
+        for number, line in enumerate(match.before, start=first):
+            numbered.setdefault(number, f"{number}-{line}")
+        for number, line in enumerate(match.after, start=match.line_number + 1):
+            numbered.setdefault(number, f"{number}-{line}")
+        numbered[match.line_number] = f"{match.line_number}:{match.line}"
+    with_context = any(match.before or match.after for match in matches)
+    lines: list[str] = []
+    previous: int | None = None
+    for number in sorted(numbered):
+        if with_context and previous is not None and number > previous + 1:
+            lines.append("--")
+        lines.append(numbered[number])
+        previous = number
+    return "\n".join(lines)
+
+
+def grep_file_content(
+    file_path: str,
+    pattern: str,
+    max_matches: int = DEFAULT_MAX_MATCHES,
+    context_lines: int = 0,
+) -> str:
+    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+        return f"No such file: {file_path}"
+    result = grep_path(file_path, pattern, int(max_matches), int(context_lines))
+    if not result.matches:
+        return "No matches found"
+    description = f"MATCHES for {pattern} in {file_path}:\n\n" + format_matches(
+        result.matches
+    )
+    if result.truncated:
+        description += f"\n\n[Stopped after {len(result.matches)} matching lines: there are more matches in the file. Use a more specific pattern or a higher `max_matches` to see them]"
+    return description
+
+
+class FileMatches(NamedTuple):
+    file_path: str
+    matches: list[LineMatch]
+    truncated: bool
+
+
+def is_binary(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return b"\0" in f.read(BINARY_SNIFF_BYTES)
+
+
+def _load_ignore_patterns(directory: str) -> list[str]:
+    patterns: list[str] = []
+    ignore_file = os.path.join(directory, ".gitignore")
+    if not os.path.isfile(ignore_file):
+        return patterns
+    with open(ignore_file, "r", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            # negations are not supported: keeping those files is the safe default
+            if line and not line.startswith(("#", "!")):
+                patterns.append(line.lstrip("/"))
+    return patterns
+
+
+def _is_ignored(
+    relative_path: str, name: str, is_dir: bool, patterns: list[str]
+) -> bool:
+    for pattern in patterns:
+        if pattern.endswith("/"):
+            if not is_dir:
+                continue
+            pattern = pattern.rstrip("/")
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern):
+            return True
+    return False
+
+
+def iter_text_files(directory: str, file_pattern: str = "*") -> Iterator[str]:
+    patterns = _load_ignore_patterns(directory)
+    for root, dirs, files in os.walk(directory):
+        relative_root = os.path.relpath(root, directory)
+        relative_root = "" if relative_root == "." else relative_root
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if d not in IGNORED_DIRECTORIES
+            and not _is_ignored(os.path.join(relative_root, d), d, True, patterns)
+        )
+        for name in sorted(files):
+            if not fnmatch.fnmatch(name, file_pattern) or _is_ignored(
+                os.path.join(relative_root, name), name, False, patterns
+            ):
+                continue
+            yield os.path.join(root, name)
+
+
+def _search_file(
+    file_path: str, pattern: str, max_matches: int, context_lines: int
+) -> list[LineMatch] | None:
+    try:
+        if is_binary(file_path):
+            return None
+        return grep_path(file_path, pattern, max_matches, context_lines).matches
+    except OSError:
+        return None
+
+
+_PROCESS_POOL: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        _PROCESS_POOL = ProcessPoolExecutor(
+            max_workers=SEARCH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _PROCESS_POOL
+
+
+def _match_size(match: LineMatch) -> int:
+    return len(match.line) + sum(len(line) for line in match.before + match.after)
+
+
+def search_tree(
+    directory: str,
+    pattern: str,
+    file_pattern: str = "*",
+    max_matches: int = DEFAULT_MAX_TOTAL_MATCHES,
+    max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+    context_lines: int = 0,
+) -> Iterator[FileMatches]:
+    # fail early on invalid patterns, before fanning out
+    compile_pattern(pattern)
+    paths = iter_text_files(directory, file_pattern)
+    first_paths = list(itertools.islice(paths, PARALLEL_MIN_FILES))
+    budget_matches, budget_bytes = max_matches, max_bytes
+    if len(first_paths) < PARALLEL_MIN_FILES:
+        results: Iterator[tuple[str, list[LineMatch] | None]] = (
+            (path, _search_file(path, pattern, max_matches, context_lines))
+            for path in first_paths
+        )
+        pending: deque[tuple[str, Future]] = deque()
+    else:
+        pool = _get_process_pool()
+        window = 4 * SEARCH_WORKERS
+        pending = deque()
+
+        def ordered_results() -> Iterator[tuple[str, list[LineMatch] | None]]:
+            # keep a bounded window of in-flight files, consumed in walk order
+            for path in itertools.chain(first_paths, paths):
+                pending.append(
+                    (
+                        path,
+                        pool.submit(
+                            _search_file, path, pattern, max_matches, context_lines
+                        ),
+                    )
+                )
+                if len(pending) >= window:
+                    done_path, future = pending.popleft()
+                    yield done_path, future.result()
+            while pending:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+
+        results = ordered_results()
+    try:
+        for path, matches in results:
+            if not matches:
+                continue
+            kept: list[LineMatch] = []
+            for match in matches:
+                size = _match_size(match)
+                if budget_matches <= 0 or (kept and size > budget_bytes):
+                    break
+                kept.append(match)
+                budget_matches -= 1
+                budget_bytes -= size
+            truncated = len(kept) < len(matches) or budget_bytes <= 0
+            if not truncated and budget_matches <= 0:
+                truncated = True
+            yield FileMatches(file_path=path, matches=kept, truncated=truncated)
+            if truncated:
+                return
+    finally:
+        for _, future in pending:
+            future.cancel()
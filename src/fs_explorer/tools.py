@@ -0,0 +1,130 @@
+import os
+import asyncio
+import inspect
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+TOOL_THREADS = int(os.getenv("FS_EXPLORER_TOOL_THREADS", "8"))
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("FS_EXPLORER_TOOL_TIMEOUT", "30"))
+# tools that are expected to take longer than the default timeout
+TOOL_TIMEOUTS: dict[str, float] = {
+    "search": 120.0,
+    "parse_file": 600.0,
+    "outline": 600.0,
+}
+MAX_TOOL_TIMEOUT = max(DEFAULT_TOOL_TIMEOUT, *TOOL_TIMEOUTS.values())
+# a catastrophic regex cannot be interrupted in a thread, but its process can be killed
+ISOLATED_TOOLS = (
+    frozenset({"grep"})
+    if os.getenv("FS_EXPLORER_ISOLATE_GREP", "1") != "0"
+    else frozenset()
+)
+ISOLATED_WORKERS = 2
+
+
+class ToolTimeout(Exception):
+    """A tool call did not complete within its timeout"""
+
+
+class ToolRunner:
+    """
+    Runs tool calls without blocking the event loop.
+
+    Async tools run on the loop and are cancelled on timeout. Sync tools run on a
+    bounded thread pool shared by all the sessions of the process: a call still
+    queued when it times out never starts, but a thread that is already running
+    cannot be interrupted. Tools in `isolated` run in a process pool instead,
+    whose workers are killed when a call times out (failing the other isolated
+    calls in flight, which is the price of actually stopping it). The pool is
+    started, and restarted after a kill, ahead of the calls: a spawned worker
+    imports the module of the tool, so isolated tools should live in lightweight
+    modules.
+    """
+
+    def __init__(
+        self,
+        threads: int = TOOL_THREADS,
+        default_timeout: float = DEFAULT_TOOL_TIMEOUT,
+        timeouts: dict[str, float] = TOOL_TIMEOUTS,
+        isolated: frozenset[str] = ISOLATED_TOOLS,
+        isolated_workers: int = ISOLATED_WORKERS,
+    ) -> None:
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts
+        self.isolated = isolated
+        self.isolated_workers = isolated_workers
+        self._threads = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="fs-explorer-tool"
+        )
+        self._processes: ProcessPoolExecutor | None = None
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.timeouts.get(tool_name, self.default_timeout)
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.isolated_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            # a worker is spawned per submitted call until the pool is full
+            for _ in range(self.isolated_workers):
+                self._processes.submit(_ready)
+        return self._processes
+
+    def warm_up(self) -> None:
+        """Start the workers of the isolated tools before their first call"""
+        if self.isolated:
+            self._get_process_pool()
+
+    def _kill_process_pool(self) -> None:
+        if (pool := self._processes) is None:
+            return
+        self._processes = None
+        # `terminate_workers` only exists from Python 3.14
+        terminate = getattr(pool, "terminate_workers", None)
+        if callable(terminate):
+            terminate()
+            return
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(
+        self, tool_name: str, tool: Callable[..., Any], tool_input: dict[str, Any]
+    ) -> Any:
+        timeout = self.timeout_for(tool_name)
+        isolated = False
+        if inspect.iscoroutinefunction(tool):
+            awaitable = tool(**tool_input)
+        else:
+            loop = asyncio.get_running_loop()
+            isolated = tool_name in self.isolated
+            executor = self._get_process_pool() if isolated else self._threads
+            awaitable = loop.run_in_executor(executor, _call, tool, tool_input)
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            if isolated:
+                self._kill_process_pool()
+                self.warm_up()
+            raise ToolTimeout(
+                f"{tool_name} did not complete within {timeout:g} seconds and was cancelled"
+            )
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._kill_process_pool()
+
+
+def _ready() -> None:
+    pass
+
+
+def _call(tool: Callable[..., Any], tool_input: dict[str, Any]) -> Any:
+    return tool(**tool_input)
+
+
+TOOL_RUNNER = ToolRunner()
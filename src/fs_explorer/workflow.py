@@ -1,3 +1,8 @@
+import os
+import uuid
+
+from contextlib import asynccontextmanager
+
 from workflows import Workflow, Context, step
 from workflows.events import (
     StartEvent,
@@ -8,22 +13,36 @@ from workflows.events import (
 )
 from workflows.resource import Resource
 from pydantic import BaseModel
-from typing import Annotated, cast, Any
-
-from .agent import FsExplorerAgent
-from .models import GoDeeperAction, ToolCallAction, StopAction, AskHumanAction
+from typing import Annotated, AsyncIterator, cast, Any
+
+from .agent import AgentSessions, FsExplorerAgent
+from .models import (
+    Action,
+    ActionType,
+    GoDeeperAction,
+    StopAction,
+    AskHumanAction,
+)
 from .fs import describe_dir_content
+from .tools import MAX_TOOL_TIMEOUT, TOOL_RUNNER
 
-AGENT = FsExplorerAgent()
+SESSIONS = AgentSessions()
+# a run makes several tool calls: it must outlast the longest single one
+WORKFLOW_TIMEOUT = float(
+    os.getenv("FS_EXPLORER_WORKFLOW_TIMEOUT", str(3 * MAX_TOOL_TIMEOUT))
+)
 
 
 class WorkflowState(BaseModel):
     intial_task: str = ""
     current_directory: str = "."
+    session_id: str = ""
 
 
 class InputEvent(StartEvent):
     task: str
+    # identifies the agent (and chat history) of the run, generated if not provided
+    session_id: str | None = None
 
 
 class GoDeeperEvent(Event):
@@ -51,8 +70,67 @@ class ExplorationEndEvent(StopEvent):
     error: str | None = None
 
 
-def get_agent(*args, **kwargs) -> FsExplorerAgent:
-    return AGENT
+async def _next_event(
+    ctx: Context[WorkflowState],
+    sessions: AgentSessions,
+    result: tuple[Action, ActionType] | None,
+) -> ExplorationEndEvent | ToolCallEvent | GoDeeperEvent | AskHumanEvent:
+    res = _to_event(ctx, result)
+    if isinstance(res, GoDeeperEvent):
+        async with ctx.store.edit_state() as state:
+            state.current_directory = res.directory
+    elif isinstance(res, ExplorationEndEvent):
+        # the exploration is over: its agent is not needed anymore
+        state = await ctx.store.get_state()
+        sessions.release(state.session_id)
+    return res
+
+
+def _to_event(
+    ctx: Context[WorkflowState], result: tuple[Action, ActionType] | None
+) -> ExplorationEndEvent | ToolCallEvent | GoDeeperEvent | AskHumanEvent:
+    if result is None:
+        return ExplorationEndEvent(error="Could not produce action to take")
+    action, action_type = result
+    if action_type == "godeeper":
+        godeeper = cast(GoDeeperAction, action.action)
+        res = GoDeeperEvent(directory=godeeper.directory, reason=action.reason)
+        ctx.write_event_to_stream(res)
+    elif action_type == "toolcall":
+        # the agent has already run the whole batch: every call is shown in the
+        # stream, and the last one moves the workflow on to the next step
+        for toolcall in action.tool_calls():
+            res = ToolCallEvent(
+                tool_name=toolcall.tool_name,
+                tool_input=toolcall.to_fn_args(),
+                reason=action.reason,
+            )
+            ctx.write_event_to_stream(res)
+    elif action_type == "askhuman":
+        askhuman = cast(AskHumanAction, action.action)
+        # this event is written to the stream by default
+        res = AskHumanEvent(question=askhuman.question, reason=action.reason)
+    else:
+        stopaction = cast(StopAction, action.action)
+        res = ExplorationEndEvent(final_result=stopaction.final_result)
+    return res
+
+
+@asynccontextmanager
+async def _session_agent(
+    ctx: Context[WorkflowState], sessions: AgentSessions
+) -> AsyncIterator[FsExplorerAgent]:
+    state = await ctx.store.get_state()
+    try:
+        yield sessions.get(state.session_id)
+    except BaseException:
+        # the step failed, timed out or was cancelled: the run is over
+        sessions.release(state.session_id)
+        raise
+
+
+def get_sessions(*args, **kwargs) -> AgentSessions:
+    return SESSIONS
 
 
 class FsExplorerWorkflow(Workflow):
@@ -61,154 +139,60 @@ class FsExplorerWorkflow(Workflow):
         self,
         ev: InputEvent,
         ctx: Context[WorkflowState],
-        agent: Annotated[FsExplorerAgent, Resource(get_agent)],
+        sessions: Annotated[AgentSessions, Resource(get_sessions)],
     ) -> ExplorationEndEvent | GoDeeperEvent | ToolCallEvent | AskHumanEvent:
         async with ctx.store.edit_state() as state:
             state.intial_task = ev.task
-        dirdescription = describe_dir_content(".")
-        agent.configure_task(
-            f"Given that the current directory ('.') looks like this:\n\n```text\n{dirdescription}\n```\n\nAnd that the user is giving you this task: '{ev.task}', what action should you take first?"
-        )
-        result = await agent.take_action()
-        if result is None:
-            return ExplorationEndEvent(error="Could not produce action to take")
-        action, action_type = result
-        if action_type == "godeeper":
-            godeeper = cast(GoDeeperAction, action.action)
-            res = GoDeeperEvent(directory=godeeper.directory, reason=action.reason)
-            async with ctx.store.edit_state() as state:
-                state.current_directory = godeeper.directory
-            ctx.write_event_to_stream(res)
-        elif action_type == "toolcall":
-            toolcall = cast(ToolCallAction, action.action)
-            res = ToolCallEvent(
-                tool_name=toolcall.tool_name,
-                tool_input=toolcall.to_fn_args(),
-                reason=action.reason,
+            state.session_id = ev.session_id or uuid.uuid4().hex
+        TOOL_RUNNER.warm_up()
+        async with _session_agent(ctx, sessions) as agent:
+            dirdescription = describe_dir_content(".")
+            agent.configure_task(
+                f"Given that the current directory ('.') looks like this:\n\n```text\n{dirdescription}\n```\n\nAnd that the user is giving you this task: '{ev.task}', what action should you take first?"
             )
-            ctx.write_event_to_stream(res)
-        elif action_type == "askhuman":
-            askhuman = cast(AskHumanAction, action.action)
-            # this event is written to the stream by default
-            res = AskHumanEvent(question=askhuman.question, reason=action.reason)
-        else:
-            stopaction = cast(StopAction, action.action)
-            res = ExplorationEndEvent(final_result=stopaction.final_result)
-        return res
+            return await _next_event(ctx, sessions, await agent.take_action())
 
     @step
     async def go_deeper_action(
         self,
         ev: GoDeeperEvent,
         ctx: Context[WorkflowState],
-        agent: Annotated[FsExplorerAgent, Resource(get_agent)],
+        sessions: Annotated[AgentSessions, Resource(get_sessions)],
     ) -> ExplorationEndEvent | ToolCallEvent | GoDeeperEvent | AskHumanEvent:
         state = await ctx.store.get_state()
-        dirdescription = describe_dir_content(state.current_directory)
-        agent.configure_task(
-            f"Given that the current directory ('{state.current_directory}') looks like this:\n\n```text\n{dirdescription}\n```\n\nAnd that the user is giving you this task: '{state.intial_task}', what action should you take next?"
-        )
-        result = await agent.take_action()
-        if result is None:
-            return ExplorationEndEvent(error="Could not produce action to take")
-        action, action_type = result
-        if action_type == "godeeper":
-            godeeper = cast(GoDeeperAction, action.action)
-            res = GoDeeperEvent(directory=godeeper.directory, reason=action.reason)
-            async with ctx.store.edit_state() as state:
-                state.current_directory = godeeper.directory
-            ctx.write_event_to_stream(res)
-        elif action_type == "toolcall":
-            toolcall = cast(ToolCallAction, action.action)
-            res = ToolCallEvent(
-                tool_name=toolcall.tool_name,
-                tool_input=toolcall.to_fn_args(),
-                reason=action.reason,
+        async with _session_agent(ctx, sessions) as agent:
+            dirdescription = describe_dir_content(state.current_directory)
+            agent.configure_task(
+                f"Given that the current directory ('{state.current_directory}') looks like this:\n\n```text\n{dirdescription}\n```\n\nAnd that the user is giving you this task: '{state.intial_task}', what action should you take next?"
             )
-            ctx.write_event_to_stream(res)
-        elif action_type == "askhuman":
-            askhuman = cast(AskHumanAction, action.action)
-            # this event is written to the stream by default
-            res = AskHumanEvent(question=askhuman.question, reason=action.reason)
-        else:
-            stopaction = cast(StopAction, action.action)
-            res = ExplorationEndEvent(final_result=stopaction.final_result)
-        return res
+            return await _next_event(ctx, sessions, await agent.take_action())
 
     @step
     async def receive_human_answer(
         self,
         ev: HumanAnswerEvent,
         ctx: Context[WorkflowState],
-        agent: Annotated[FsExplorerAgent, Resource(get_agent)],
+        sessions: Annotated[AgentSessions, Resource(get_sessions)],
     ) -> ExplorationEndEvent | ToolCallEvent | GoDeeperEvent | AskHumanEvent:
         state = await ctx.store.get_state()
-        agent.configure_task(
-            f"Human response to your question: {ev.response}\n\nBased on it, proceed with you exploration based on the original task: {state.intial_task}"
-        )
-        result = await agent.take_action()
-        if result is None:
-            return ExplorationEndEvent(error="Could not produce action to take")
-        action, action_type = result
-        if action_type == "godeeper":
-            godeeper = cast(GoDeeperAction, action.action)
-            res = GoDeeperEvent(directory=godeeper.directory, reason=action.reason)
-            async with ctx.store.edit_state() as state:
-                state.current_directory = godeeper.directory
-            ctx.write_event_to_stream(res)
-        elif action_type == "toolcall":
-            toolcall = cast(ToolCallAction, action.action)
-            res = ToolCallEvent(
-                tool_name=toolcall.tool_name,
-                tool_input=toolcall.to_fn_args(),
-                reason=action.reason,
+        async with _session_agent(ctx, sessions) as agent:
+            agent.configure_task(
+                f"Human response to your question: {ev.response}\n\nBased on it, proceed with you exploration based on the original task: {state.intial_task}"
             )
-            ctx.write_event_to_stream(res)
-        elif action_type == "askhuman":
-            askhuman = cast(AskHumanAction, action.action)
-            # this event is written to the stream by default
-            res = AskHumanEvent(question=askhuman.question, reason=action.reason)
-        else:
-            stopaction = cast(StopAction, action.action)
-            res = ExplorationEndEvent(final_result=stopaction.final_result)
-        return res
+            return await _next_event(ctx, sessions, await agent.take_action())
 
     @step
     async def tool_call_action(
         self,
         ev: ToolCallEvent,
         ctx: Context[WorkflowState],
-        agent: Annotated[FsExplorerAgent, Resource(get_agent)],
+        sessions: Annotated[AgentSessions, Resource(get_sessions)],
     ) -> ExplorationEndEvent | ToolCallEvent | GoDeeperEvent | AskHumanEvent:
-        agent.configure_task(
-            "Given the result from the tool call you just performed, what action should you take next?"
-        )
-        result = await agent.take_action()
-        if result is None:
-            return ExplorationEndEvent(error="Could not produce action to take")
-        action, action_type = result
-        if action_type == "godeeper":
-            godeeper = cast(GoDeeperAction, action.action)
-            res = GoDeeperEvent(directory=godeeper.directory, reason=action.reason)
-            async with ctx.store.edit_state() as state:
-                state.current_directory = godeeper.directory
-            ctx.write_event_to_stream(res)
-        elif action_type == "toolcall":
-            toolcall = cast(ToolCallAction, action.action)
-            res = ToolCallEvent(
-                tool_name=toolcall.tool_name,
-                tool_input=toolcall.to_fn_args(),
-                reason=action.reason,
+        async with _session_agent(ctx, sessions) as agent:
+            agent.configure_task(
+                "Given the results from the tool calls you just performed, what action should you take next?"
             )
-            ctx.write_event_to_stream(res)
-        elif action_type == "askhuman":
-            askhuman = cast(AskHumanAction, action.action)
-            # this event is written to the stream by default
-            res = AskHumanEvent(question=askhuman.question, reason=action.reason)
-        else:
-            stopaction = cast(StopAction, action.action)
-            res = ExplorationEndEvent(final_result=stopaction.final_result)
-        return res
+            return await _next_event(ctx, sessions, await agent.take_action())
 
 
-workflow = FsExplorerWorkflow(timeout=120)
+workflow = FsExplorerWorkflow(timeout=WORKFLOW_TIMEOUT)
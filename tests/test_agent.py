@@ -1,10 +1,12 @@
 import pytest
 import os
+import time
+import asyncio
 
 from unittest.mock import patch
 from google.genai import Client as GenAIClient
 from google.genai.types import HttpOptions
-from fs_explorer.agent import FsExplorerAgent, SYSTEM_PROMPT
+from fs_explorer.agent import FsExplorerAgent, SYSTEM_PROMPT, TOOLS
 from fs_explorer.models import Action, StopAction
 from .conftest import MockGenAIClient
 
@@ -47,3 +49,36 @@ async def test_agent_take_action():
     assert action.action.final_result == "this is a final result"
     assert action.reason == "I am done"
     assert action_type == "stop"
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"GOOGLE_API_KEY": "test-api-key"})
+async def test_agent_call_tools_concurrently():
+    def slow_read(file_path: str) -> str:
+        time.sleep(0.2)
+        return f"content of {file_path}"
+
+    async def slow_parse(file_path: str) -> str:
+        await asyncio.sleep(0.2)
+        return f"parsed {file_path}"
+
+    agent = FsExplorerAgent()
+    with patch.dict(TOOLS, {"read": slow_read, "parse_file": slow_parse}):
+        start = time.perf_counter()
+        await agent.call_tools(
+            [
+                ("read", {"file_path": "a.txt"}),
+                ("parse_file", {"file_path": "b.pdf"}),
+                ("read", {"file_path": "c.txt"}),
+                ("read", {"path": "missing argument"}),
+            ]
+        )
+        elapsed = time.perf_counter() - start
+    assert elapsed < 0.5
+    results = [content.parts[0].text for content in agent._chat_history[1:]]  # type: ignore
+    assert results[:3] == [
+        "Tool result for read:\n\ncontent of a.txt",
+        "Tool result for parse_file:\n\nparsed b.pdf",
+        "Tool result for read:\n\ncontent of c.txt",
+    ]
+    assert results[3].startswith("Tool result for read:\n\nAn error occurred")
@@ -0,0 +1,62 @@
+import os
+
+from pathlib import Path
+
+from fs_explorer.bundle import BundleEntry, CacheBundle, write_bundle
+from fs_explorer.caching import ParsedFileCache
+
+
+def test_write_and_read_bundle(tmp_path: Path) -> None:
+    entries = [
+        (
+            BundleEntry(f"/data/doc{i:03}.pdf", i, i * 1000, f"{i % 7:064x}"),
+            f"text {i % 7}",
+        )
+        for i in range(50)
+    ]
+    entries.append((BundleEntry("/gone.pdf", None, None, "text-" + "f" * 64), "gone"))
+    report = write_bundle(iter(entries), tmp_path / "cache.bundle")
+    assert (report.paths, report.documents) == (51, 8)
+    bundle = CacheBundle(tmp_path / "cache.bundle")
+    assert len(bundle) == 51
+    for entry, text in entries:
+        assert bundle.lookup(entry.path) == entry
+        assert bundle.get_text(entry.digest) == text
+    assert bundle.lookup("/data/doc050.pdf") is None
+    assert bundle.lookup("/") is None
+    assert not bundle.has_document("a" * 64)
+    assert sorted(bundle.iter_entries()) == sorted(entries)
+    bundle.close()
+
+
+def test_export_mount_and_import(tmp_path: Path) -> None:
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"doc{i}.pdf"
+        source.write_bytes(f"%PDF {i}".encode())
+        sources.append(str(source))
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    for i, source in enumerate(sources):
+        cache.add_file(source, f"parsed {i}")
+    report = cache.export_bundle(tmp_path / "cache.bundle")
+    assert (report.paths, report.documents) == (3, 3)
+    cache.close()
+    # a new node: empty cache, the bundle mounted read-only
+    mounted = ParsedFileCache(
+        directory=tmp_path / "node", memory_bytes=0, bundle=tmp_path / "cache.bundle"
+    )
+    assert mounted.is_empty
+    assert mounted.get_file(sources[0]) == "parsed 0"
+    assert mounted.has_file(sources[1])
+    # copied without preserving mtimes: the content hash still matches
+    os.utime(sources[2], ns=(0, 0))
+    assert mounted.get_file(sources[2]) == "parsed 2"
+    assert sorted(mounted.iter_files()) == [
+        (s, f"parsed {i}") for i, s in enumerate(sources)
+    ]
+    mounted.close()
+    imported = ParsedFileCache(directory=tmp_path / "imported")
+    assert imported.import_bundle(tmp_path / "cache.bundle") == 3
+    assert len(imported) == 3
+    assert imported.get_file(sources[1]) == "parsed 1"
+    imported.close()
@@ -0,0 +1,378 @@
+import os
+import sys
+import time
+import asyncio
+import pytest
+import subprocess
+
+from pathlib import Path
+from fs_explorer import caching
+from fs_explorer.caching import (
+    LoadCacheReport,
+    ParsedFileCache,
+    file_digest,
+    iter_files_to_parse,
+    parse_and_cache,
+)
+from fs_explorer.scheduler import ParseFailed
+
+
+def test_add_and_get_file(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF original")
+    assert cache.get_file(str(source)) is None
+    cache.add_file(str(source), "original text")
+    assert cache.get_file(str(source)) == "original text"
+    # re-adding overwrites the entry
+    cache.add_file(str(source), "reparsed text")
+    assert cache.get_file(str(source)) == "reparsed text"
+    cache.close()
+
+
+def test_modified_file_is_not_served_stale(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF original")
+    cache.add_file(str(source), "original text")
+    source.write_bytes(b"%PDF edited content")
+    assert cache.get_file(str(source)) is None
+    # touching the file without changing it keeps the entry valid
+    source.write_bytes(b"%PDF original")
+    os.utime(source, ns=(0, 0))
+    assert cache.get_file(str(source)) == "original text"
+    cache.close()
+
+
+def test_duplicates_share_one_blob(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF same")
+    second.write_bytes(b"%PDF same")
+    cache.add_file(str(first), "shared text")
+    assert cache.get_file(str(second)) == "shared text"
+    blobs = [k for k in cache._cache.iterkeys() if k[0] == "blob"]
+    assert blobs == [("blob", file_digest(str(first)))]
+    assert sorted(cache.iter_files()) == [
+        (str(first.resolve()), "shared text"),
+        (str(second.resolve()), "shared text"),
+    ]
+    cache.close()
+
+
+def test_legacy_entries(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    source = tmp_path / "old.pdf"
+    source.write_bytes(b"%PDF old")
+    cache._cache.set(str(source.resolve()), "legacy text")
+    assert list(cache.iter_files()) == [(str(source.resolve()), "legacy text")]
+    assert cache.get_file(str(source)) == "legacy text"
+    assert str(source.resolve()) not in cache._cache
+    assert cache.get_file(str(source)) == "legacy text"
+    # an entry stored before the last edit of its file is stale
+    edited = tmp_path / "edited.pdf"
+    edited.write_bytes(b"%PDF old")
+    cache._cache.set(str(edited.resolve()), "stale text")
+    time.sleep(0.01)
+    edited.write_bytes(b"%PDF edited")
+    assert not cache.has_file(str(edited))
+    assert cache.get_file(str(edited)) is None
+    assert str(edited.resolve()) not in cache._cache
+    cache.close()
+
+
+def test_size_and_stats(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    assert cache.is_empty
+    assert len(cache) == 0
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF first")
+    second.write_bytes(b"%PDF second")
+    cache.add_file(str(first), "first text")
+    assert not cache.is_empty
+    assert cache.get_file(str(first)) == "first text"
+    assert cache.get_file(str(first)) == "first text"
+    assert cache.get_file(str(second)) is None
+    cache.add_file(str(second), "second text")
+    stats = cache.stats()
+    assert (stats.entries, stats.hits, stats.misses) == (2, 2, 1)
+    assert stats.total_bytes > 0
+    assert stats.average_entry_bytes == stats.total_bytes / 2
+    assert stats.hit_rate == 2 / 3
+    cache.reset_stats()
+    assert cache.stats().hits == 0
+    cache.close()
+
+
+def test_cache_stats_are_shared(tmp_path: Path, monkeypatch) -> None:
+    source = tmp_path / "doc.pdf"
+    source.write_bytes(b"%PDF shared")
+    # a process that exits without closing its cache still records its lookups
+    script = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from fs_explorer.caching import ParsedFileCache\n"
+        "cache = ParsedFileCache(directory=Path(sys.argv[1]))\n"
+        "cache.add_file(sys.argv[2], 'text')\n"
+        "for _ in range(5):\n"
+        "    cache.get_file(sys.argv[2])\n"
+        "cache.get_file(sys.argv[2] + '.missing')\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", script, str(tmp_path / "cache"), str(source)],
+        cwd=tmp_path,
+        check=True,
+    )
+    stats = ParsedFileCache(directory=tmp_path / "cache").stats()
+    assert (stats.hits, stats.misses) == (5, 1)
+    # and a long-running one records them regularly, not only every 100 lookups
+    monkeypatch.setattr(caching, "STATS_FLUSH_SECONDS", 0.0)
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    assert cache.get_file(str(source)) == "text"
+    stats = ParsedFileCache(directory=tmp_path / "cache").stats()
+    assert (stats.hits, stats.misses) == (6, 1)
+    cache.close()
+
+
+def test_memory_tier(tmp_path: Path) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache", memory_bytes=64 * 1024)
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"doc{i}.pdf"
+        source.write_bytes(f"%PDF {i}".encode())
+        sources.append(str(source))
+        cache.add_file(str(source), f"{i}" * 30_000)
+    # only the two most recent documents fit in memory
+    memory = cache.memory_stats()
+    assert memory is not None
+    assert (memory.entries, memory.evictions) == (2, 1)
+    assert memory.total_bytes <= memory.max_bytes
+    assert cache.get_file(sources[2]) == "2" * 30_000
+    assert cache.get_file(sources[0]) == "0" * 30_000
+    memory = cache.memory_stats()
+    assert memory is not None
+    assert (memory.hits, memory.misses, memory.evictions) == (1, 1, 2)
+    # another process sharing the directory re-parses a modified file
+    other = ParsedFileCache(directory=tmp_path / "cache")
+    Path(sources[0]).write_bytes(b"%PDF edited")
+    other.add_file(sources[0], "edited text")
+    assert cache.get_file(sources[0]) == "edited text"
+    other.close()
+    assert (
+        ParsedFileCache(directory=tmp_path / "cache", memory_bytes=0).memory_stats()
+        is None
+    )
+    cache.close()
+
+
+def test_size_policy_and_garbage_collection(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        ParsedFileCache(directory=tmp_path / "invalid", eviction_policy="fifo")  # type: ignore[arg-type]
+    cache = ParsedFileCache(
+        directory=tmp_path / "cache", compress=False, memory_bytes=0, ttl=60
+    )
+    kept, deleted, edited = (
+        tmp_path / "kept.pdf",
+        tmp_path / "deleted.pdf",
+        tmp_path / "edited.pdf",
+    )
+    for source in (kept, deleted, edited):
+        source.write_bytes(f"%PDF {source.name}".encode())
+        cache.add_file(str(source), f"text of {source.name}")
+    deleted.unlink()
+    edited.write_bytes(b"%PDF edited")
+    cache.add_file(str(edited), "new text of edited.pdf")
+    report = cache.collect_garbage()
+    # the deleted source and the entry parsed from the old version of the edited one
+    assert (report.removed_paths, report.removed_entries, report.expired_entries) == (
+        1,
+        2,
+        0,
+    )
+    assert report.reclaimed_bytes >= len("text of deleted.pdf")
+    assert len(cache) == 2
+    assert cache.get_file(str(kept)) == "text of kept.pdf"
+    assert cache.get_file(str(deleted)) is None
+    cache.close()
+    # expired entries are misses, and collected
+    cache = ParsedFileCache(directory=tmp_path / "short-lived", ttl=0.01)
+    cache.add_file(str(kept), "text of kept.pdf")
+    time.sleep(0.05)
+    assert cache.get_file(str(kept)) is None
+    assert cache.collect_garbage().expired_entries == 1
+    assert len(cache) == 0
+    cache.close()
+
+
+def test_compression_and_migration(tmp_path: Path) -> None:
+    plain = ParsedFileCache(directory=tmp_path / "cache", compress=False, ttl=3600)
+    boilerplate = "Page header of a very repetitive document store\n"
+    for i in range(5):
+        source = tmp_path / f"doc{i}.pdf"
+        source.write_bytes(f"%PDF {i}".encode())
+        plain.add_file(str(source), boilerplate + f"document {i}\n" + boilerplate)
+    plain.close()
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    assert all(isinstance(cache._cache[key], str) for key in cache._cache)
+    assert cache.train_dictionary() == 1
+    report = cache.compress_entries()
+    assert (report.entries, report.compressed) == (5, 5)
+    assert report.stored_bytes < report.raw_bytes
+    assert all(isinstance(cache._cache[key], bytes) for key in cache._cache)
+    # the migrated entries keep their expiration
+    for key in cache._cache:
+        _, expire_at = cache._cache.get(key, expire_time=True)
+        assert time.time() < expire_at <= time.time() + 3600
+    assert cache.get_file(str(tmp_path / "doc3.pdf")) == (
+        boilerplate + "document 3\n" + boilerplate
+    )
+    new_source = tmp_path / "new.pdf"
+    new_source.write_bytes(b"%PDF new")
+    cache.add_file(str(new_source), boilerplate)
+    assert cache.get_file(str(new_source)) == boilerplate
+    assert cache.compress_entries().compressed == 0
+    cache.close()
+
+
+def test_iter_files_to_parse(tmp_path: Path) -> None:
+    for relative in (
+        "a.pdf",
+        "b.pdf",
+        "sub/c.pdf",
+        "sub/skipped.pdf",
+        "sub/deep/d.pdf",
+        "skipped/e.pdf",
+    ):
+        (tmp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative).write_bytes(b"%PDF")
+
+    def relative_files(recursive: bool, to_skip: list[str]) -> list[str]:
+        return [
+            os.path.relpath(path, tmp_path)
+            for path in iter_files_to_parse(str(tmp_path), recursive, to_skip)
+        ]
+
+    assert relative_files(False, ["b.pdf"]) == ["a.pdf"]
+    assert relative_files(True, ["skipped", "sub/skipped.pdf"]) == [
+        "a.pdf",
+        "b.pdf",
+        os.path.join("sub", "c.pdf"),
+        os.path.join("sub", "deep", "d.pdf"),
+    ]
+
+
+class FakeParser:
+    def __init__(self, failing: set[str] | None = None, crash_after: int = -1) -> None:
+        self.calls: list[str] = []
+        self.failing = failing or set()
+        self.crash_after = crash_after
+
+    async def parse(self, file_path: str) -> str:
+        if len(self.calls) == self.crash_after:
+            # what an interrupted run looks like from inside the event loop, once
+            # the parses before it have been written (off the loop) to the cache
+            await asyncio.sleep(0.2)
+            raise asyncio.CancelledError
+        self.calls.append(file_path)
+        if Path(file_path).name in self.failing:
+            raise ParseFailed("unsupported file")
+        return f"parsed {Path(file_path).name}"
+
+
+@pytest.mark.asyncio
+async def test_parse_and_cache_incremental(tmp_path: Path) -> None:
+    documents = tmp_path / "docs"
+    documents.mkdir()
+    for i in range(4):
+        (documents / f"doc{i}.pdf").write_bytes(f"%PDF {i}".encode())
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    manifest = tmp_path / "manifest.jsonl"
+    parser = FakeParser(failing={"doc3.pdf"})
+    report = await parse_and_cache(
+        str(documents),
+        True,
+        [],
+        manifest_path=manifest,
+        cache=cache,
+        parser=parser,
+    )
+    assert report == LoadCacheReport(parsed=3, skipped=0, failed=1, resumed=0)
+    assert cache.get_file(str(documents / "doc0.pdf")) == "parsed doc0.pdf"
+    assert not manifest.exists()
+    (documents / "doc4.pdf").write_bytes(b"%PDF 4")
+    parser = FakeParser()
+    report = await parse_and_cache(
+        str(documents),
+        True,
+        [],
+        manifest_path=manifest,
+        cache=cache,
+        parser=parser,
+    )
+    assert report == LoadCacheReport(parsed=2, skipped=3, failed=0, resumed=0)
+    assert sorted(Path(call).name for call in parser.calls) == ["doc3.pdf", "doc4.pdf"]
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_and_cache_unreadable_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    documents = tmp_path / "docs"
+    documents.mkdir()
+    for i in range(3):
+        (documents / f"doc{i}.pdf").write_bytes(f"%PDF {i}".encode())
+
+    def digest(file_path: str) -> str:
+        if Path(file_path).name == "doc1.pdf":
+            raise PermissionError(f"Permission denied: {file_path!r}")
+        return file_digest(file_path)
+
+    monkeypatch.setattr(caching, "file_digest", digest)
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    # the failed file is reported, the others are still parsed
+    report = await parse_and_cache(
+        str(documents),
+        True,
+        [],
+        manifest_path=tmp_path / "manifest.jsonl",
+        cache=cache,
+        parser=FakeParser(),
+    )
+    assert report == LoadCacheReport(parsed=2, skipped=0, failed=1, resumed=0)
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_and_cache_resumes(tmp_path: Path) -> None:
+    documents = tmp_path / "docs"
+    documents.mkdir()
+    for i in range(6):
+        (documents / f"doc{i}.pdf").write_bytes(f"%PDF {i}".encode())
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    manifest = tmp_path / "manifest.jsonl"
+    with pytest.raises(asyncio.CancelledError):
+        await parse_and_cache(
+            str(documents),
+            True,
+            [],
+            incremental=False,
+            manifest_path=manifest,
+            cache=cache,
+            parser=FakeParser(crash_after=2),
+        )
+    assert manifest.exists()
+    parser = FakeParser()
+    report = await parse_and_cache(
+        str(documents),
+        True,
+        [],
+        incremental=False,
+        manifest_path=manifest,
+        cache=cache,
+        parser=parser,
+    )
+    assert report == LoadCacheReport(parsed=4, skipped=0, failed=0, resumed=2)
+    assert len(parser.calls) == 4
+    assert not manifest.exists()
+    cache.close()
@@ -0,0 +1,79 @@
+import os
+import pytest
+
+from pathlib import Path
+from unittest.mock import patch
+from google.genai.types import Content, HttpOptions, Part
+from fs_explorer.agent import FsExplorerAgent
+from fs_explorer.cassette import CassetteMiss, ResponseCassette, request_key
+from .conftest import MockGenAIClient
+
+CONFIG = {"response_mime_type": "application/json"}
+
+
+class CountingClient(MockGenAIClient):
+    def __init__(self) -> None:
+        super().__init__("", http_options=HttpOptions(api_version="v1beta"))
+        self.calls = 0
+
+    @property
+    def aio(self):
+        self.calls += 1
+        return super().aio
+
+
+def history(task: str) -> list[Content]:
+    return [
+        Content(role="system", parts=[Part.from_text(text="system prompt")]),
+        Content(role="user", parts=[Part.from_text(text=task)]),
+    ]
+
+
+def test_request_key() -> None:
+    key = request_key("model", history("task"), CONFIG)
+    assert key == request_key("model", history("task"), dict(CONFIG))
+    assert key != request_key("model", history("other task"), CONFIG)
+    assert key != request_key("other-model", history("task"), CONFIG)
+    assert key != request_key("model", history("task"), {})
+
+
+@pytest.mark.asyncio
+async def test_cassette_record_and_replay(tmp_path: Path) -> None:
+    path = tmp_path / "cassette.jsonl"
+    client = CountingClient()
+    recorder = ResponseCassette(path, mode="record")
+    recorded = await recorder.generate_content(client, "model", history("task"), CONFIG)  # type: ignore[arg-type]
+    await recorder.generate_content(client, "model", history("task"), CONFIG)  # type: ignore[arg-type]
+    assert client.calls == 1
+    assert (recorder.hits, recorder.misses) == (1, 1)
+
+    player = ResponseCassette(path, mode="replay")
+    assert len(player) == 1
+    replayed = await player.generate_content(client, "model", history("task"), CONFIG)  # type: ignore[arg-type]
+    assert replayed.text == recorded.text
+    assert client.calls == 1
+    with pytest.raises(CassetteMiss):
+        await player.generate_content(client, "model", history("other"), CONFIG)  # type: ignore[arg-type]
+
+    passthrough = ResponseCassette(tmp_path / "unused.jsonl", mode="passthrough")
+    await passthrough.generate_content(client, "model", history("task"), CONFIG)  # type: ignore[arg-type]
+    assert client.calls == 2
+    assert not (tmp_path / "unused.jsonl").exists()
+    with pytest.raises(ValueError):
+        ResponseCassette(path, mode="rewind")  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"GOOGLE_API_KEY": "test-api-key"})
+async def test_agent_replays_cassette(tmp_path: Path) -> None:
+    path = tmp_path / "cassette.jsonl"
+    agent = FsExplorerAgent(cassette=ResponseCassette(path, mode="record"))
+    agent._client = CountingClient()  # type: ignore
+    agent.configure_task("this is a task")
+    recorded = await agent.take_action()
+
+    agent = FsExplorerAgent(cassette=ResponseCassette(path, mode="replay"))
+    agent._client = client = CountingClient()  # type: ignore
+    agent.configure_task("this is a task")
+    assert await agent.take_action() == recorded
+    assert client.calls == 0
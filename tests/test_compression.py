@@ -0,0 +1,38 @@
+import zlib
+
+from fs_explorer.compression import (
+    HEADER_SIZE,
+    MAX_DICTIONARY_BYTES,
+    compress_text,
+    decompress_text,
+    is_compressed,
+    train_dictionary,
+)
+
+
+def no_dictionary(dictionary_id: int) -> bytes:
+    raise AssertionError("no dictionary should be needed")
+
+
+def test_roundtrip() -> None:
+    text = "Parsed document text, with accents: àèìòù\n" * 100
+    value = compress_text(text)
+    assert is_compressed(value)
+    assert not is_compressed(text)
+    assert len(value) < len(text.encode("utf-8")) / 4
+    assert decompress_text(value, no_dictionary) == text
+
+
+def test_dictionary() -> None:
+    boilerplate = "CONFIDENTIAL - Superior Court of Justice - Motion Record"
+    samples = [f"{boilerplate}\ncase number {i}\n{boilerplate}" for i in range(10)]
+    dictionary = train_dictionary(samples)
+    assert boilerplate.encode() in dictionary
+    assert len(dictionary) <= MAX_DICTIONARY_BYTES
+    text = f"{boilerplate}\ncase number 42"
+    value = compress_text(text, dictionary, 7)
+    assert len(value) < len(compress_text(text))
+    assert decompress_text(value, {7: dictionary}.__getitem__) == text
+    # large entries do not use the dictionary
+    value = compress_text(text * 1000, dictionary, 7)
+    assert zlib.decompress(value[HEADER_SIZE:]).decode() == text * 1000
@@ -0,0 +1,77 @@
+from google.genai.types import Content, Part
+
+from fs_explorer.context import ChatContext, estimate_tokens
+
+
+def message(role: str, text: str) -> Content:
+    return Content(role=role, parts=[Part.from_text(text=text)])
+
+
+def text(content: Content) -> str:
+    return content.parts[0].text  # type: ignore
+
+
+def fill(context: ChatContext, steps: int, output_chars: int) -> None:
+    for step in range(steps):
+        context.append(message("model", f'{{"action": "read file{step}.txt"}}'))
+        context.append(
+            message("user", f"Tool result for read:\n\n{str(step) * output_chars}")
+        )
+        context.append(message("user", "What action should you take next?"))
+
+
+def test_context_under_budget_is_untouched() -> None:
+    context = ChatContext("system prompt", budget=10_000)
+    context.append(message("user", "the task"))
+    fill(context, 3, 100)
+    before = [text(content) for content in context.messages]
+    assert [text(content) for content in context.compact()] == before
+    assert context.steps[-1].tokens_saved == 0
+    assert context.tokens_saved == 0
+
+
+def test_context_elides_old_tool_results() -> None:
+    context = ChatContext("system prompt", budget=2_000, keep_recent=3)
+    context.append(message("user", "the task"))
+    fill(context, 5, 2_000)
+    raw = context.tokens
+    messages = context.compact()
+    assert context.tokens <= 2_000
+    assert text(messages[0]) == "system prompt"
+    assert text(messages[1]) == "the task"
+    # the most recent tool result is sent verbatim, the older ones are cut down
+    assert text(messages[-2]).endswith("4" * 2_000)
+    assert "more characters elided" in text(messages[3])
+    step = context.steps[-1]
+    assert step.tokens == context.tokens
+    assert step.tokens_saved == raw - context.tokens > 0
+
+
+def test_context_elides_tool_results_once() -> None:
+    context = ChatContext("system prompt", budget=2_000, keep_recent=3)
+    context.append(message("user", "the task"))
+    fill(context, 5, 2_000)
+    elided = text(context.compact()[3])
+    assert "[... 1700 more characters elided" in elided
+    # the next steps push the history over the budget again
+    fill(context, 2, 2_000)
+    assert text(context.compact()[3]) == elided
+    assert context.tokens <= 2_000
+
+
+def test_context_drops_oldest_messages() -> None:
+    context = ChatContext("system prompt", budget=300, keep_recent=3)
+    context.append(message("user", "the task"))
+    fill(context, 10, 2_000)
+    messages = context.compact()
+    assert context.tokens <= 300 + estimate_tokens(messages[-2])
+    assert text(messages[1]) == "the task"
+    assert "earlier messages of this session were removed" in text(messages[2])
+    assert len(messages) == 3 + 3
+    fill(context, 2, 2_000)
+    messages = context.compact()
+    # still a single note, counting every message dropped so far
+    notes = [m for m in messages if "were removed" in text(m)]
+    assert len(notes) == 1
+    assert len(context.steps) == 2
+    assert context.tokens_saved == sum(step.tokens_saved for step in context.steps)
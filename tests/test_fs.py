@@ -1,13 +1,21 @@
 import pytest
 import os
 
+from pathlib import Path
+
 from fs_explorer.fs import (
+    DEFAULT_PAGE_BYTES,
     describe_dir_content,
     read_file,
     grep_file_content,
+    search_files,
     glob_paths,
     parse_file,
+    document_outline,
 )
+from fs_explorer import fs
+from fs_explorer.caching import ParsedFileCache
+from fs_explorer.pages import join_pages
 
 
 def test_describe_dir_content() -> None:
@@ -25,6 +33,31 @@ def test_describe_dir_content() -> None:
     )
 
 
+def test_describe_dir_content_paged(tmp_path: Path) -> None:
+    (tmp_path / "sub").mkdir()
+    for i, ext in enumerate([".pdf", ".pdf", ".txt", ".md", ""]):
+        (tmp_path / f"file{i}{ext}").write_text("x" * (i + 1))
+    directory = str(tmp_path)
+    description = describe_dir_content(directory, limit=2)
+    assert description.startswith(
+        f"Content of {directory}\nFILES:\n- {directory}/file0.pdf\n- {directory}/file1.pdf\nThis folder does not have any sub-folders\n\n"
+    )
+    assert "[Showing entries 1-2 of 6, sorted by name." in description
+    assert (
+        "All entries: 1 folders, 2 .pdf files, 1 .txt files, 1 .md files, 1 (no extension) files."
+        in description
+    )
+    assert "call `describe` with offset=2" in description
+    description = describe_dir_content(directory, offset=5, limit=2)
+    assert (
+        f"No files in this page of the folder\nSUBFOLDERS:\n- {directory}/sub"
+        in description
+    )
+    assert "call `describe`" not in description
+    description = describe_dir_content(directory, limit=1, sort_by="size", details=True)
+    assert f"- {directory}/file4 (5 B, modified " in description
+
+
 def test_read_file() -> None:
     content = read_file("tests/testfiles/file1.txt")
     assert content.strip() == "this is a test"
@@ -32,15 +65,99 @@ def test_read_file() -> None:
     assert content.strip() == "No such file: tests/testfiles/file2.txt"
 
 
+def test_read_file_paged(tmp_path: Path) -> None:
+    file_path = str(tmp_path / "big.txt")
+    with open(file_path, "w") as f:
+        f.write("".join(f"line {i}\n" for i in range(10)))
+    content = read_file(file_path, limit=3)
+    assert content.startswith("line 0\nline 1\nline 2\n\n")
+    assert "call `read` with offset=3 and unit='line'" in content
+    content = read_file(file_path, offset=3, limit=3)
+    assert content.startswith("line 3\nline 4\nline 5\n\n")
+    assert "offset=6" in content
+    content = read_file(file_path, offset=8, limit=3)
+    assert content == "line 8\nline 9\n"
+    content = read_file(file_path, offset=12)
+    assert content == f"Offset 12 is beyond the end of {file_path}, which has 10 lines"
+    content = read_file(file_path, limit=2, tail=True)
+    assert content.startswith("line 8\nline 9\n\n")
+    assert "starting at byte 56" in content
+    content = read_file(file_path, offset=7, limit=7, unit="byte")
+    assert content.startswith("line 1\n\n")
+    assert "offset=14 and unit='byte'" in content
+    content = read_file(file_path, limit=7, unit="byte", tail=True)
+    assert content.startswith("line 9\n\n")
+
+
+def test_read_file_caps_long_lines(tmp_path: Path) -> None:
+    long_lines = tmp_path / "rows.csv"
+    long_lines.write_text("".join(str(i) * 30_000 + "\n" for i in range(5)))
+    content = read_file(str(long_lines))
+    # the first two lines fit in a 64 KiB page, the third does not
+    assert content.startswith("0" * 30_000 + "\n" + "1" * 30_000 + "\n\n")
+    assert "call `read` with offset=2 and unit='line'" in content
+    content = read_file(str(long_lines), tail=True)
+    assert len(content) < 70_000
+    assert "unit='byte'" in content
+    minified = tmp_path / "minified.json"
+    minified.write_text("x" * 200_000)
+    content = read_file(str(minified))
+    assert content.startswith("x" * DEFAULT_PAGE_BYTES + "\n\n")
+    assert f"offset={DEFAULT_PAGE_BYTES} and unit='byte'" in content
+
+
 def test_grep_file_content() -> None:
     result = grep_file_content("tests/testfiles/file2.md", r"(are|is) a test")
-    assert result == "MATCHES for (are|is) a test in tests/testfiles/file2.md:\n\n- is"
+    assert (
+        result
+        == "MATCHES for (are|is) a test in tests/testfiles/file2.md:\n\n1:# this is a test!"
+    )
     result = grep_file_content("tests/testfiles/last/lastfile.txt", r"test")
     assert result == "No matches found"
     result = grep_file_content("tests/testfiles/file2.txt", r"test")
     assert result == "No such file: tests/testfiles/file2.txt"
 
 
+def test_grep_file_content_caps_and_context(tmp_path: Path) -> None:
+    file_path = str(tmp_path / "log.txt")
+    with open(file_path, "w") as f:
+        f.write(
+            "".join(
+                f"{'ERROR' if i % 3 == 0 else 'INFO'} event {i}\n" for i in range(30)
+            )
+        )
+    result = grep_file_content(file_path, r"^ERROR", max_matches=2)
+    assert result.startswith(
+        f"MATCHES for ^ERROR in {file_path}:\n\n1:ERROR event 0\n4:ERROR event 3\n\n"
+    )
+    assert "Stopped after 2 matching lines" in result
+    result = grep_file_content(file_path, r"event (3|4|9)$", context_lines=1)
+    assert result == (
+        f"MATCHES for event (3|4|9)$ in {file_path}:\n\n"
+        "3-INFO event 2\n4:ERROR event 3\n5:INFO event 4\n6-INFO event 5\n--\n"
+        "9-INFO event 8\n10:ERROR event 9\n11-INFO event 10"
+    )
+    # no phantom empty line after the trailing newline
+    with open(file_path, "w") as f:
+        f.write("hello\nworld\n")
+    result = grep_file_content(file_path, "^")
+    assert result == f"MATCHES for ^ in {file_path}:\n\n1:hello\n2:world"
+    assert grep_file_content(file_path, "^$") == "No matches found"
+
+
+def test_search_files() -> None:
+    result = search_files("tests/testfiles", r"(are|is) a test")
+    assert result == (
+        "MATCHES for (are|is) a test in tests/testfiles:\n\n"
+        "== tests/testfiles/file1.txt ==\n1:this is a test\n\n"
+        "== tests/testfiles/file2.md ==\n1:# this is a test!"
+    )
+    result = search_files("tests/testfiles", r"test", file_pattern="last*")
+    assert result == "No matches found"
+    result = search_files("tests/testfile", r"test")
+    assert result == "No such directory: tests/testfile"
+
+
 def test_glob_paths() -> None:
     result = glob_paths("tests/testfiles", "file?.*")
     assert (
@@ -72,3 +189,33 @@ async def test_parse_file_without_api_key() -> None:
         content
         == "Not possible to parse data/testfile.txt because it has not been cached and the necessary credentials (`LLAMA_CLOUD_API_KEY`) are not set in the environment"
     )
+
+
+@pytest.mark.asyncio
+async def test_parse_file_pages(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    monkeypatch.setattr(fs, "CACHE", cache)
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF report")
+    pages = [f"# Chapter {i}\ntext of page {i}" for i in range(1, 13)]
+    cache.add_file(str(document), join_pages(pages))
+    content = await parse_file(str(document), pages="2-3")
+    assert content == (
+        "--- Page 2 of 12 ---\n# Chapter 2\ntext of page 2\n\n"
+        "--- Page 3 of 12 ---\n# Chapter 3\ntext of page 3"
+    )
+    content = await parse_file(str(document), pages="13")
+    assert content.startswith(f"Could not read {document}: page range '13'")
+    # too long to be read at once: the outline is returned instead
+    content = await parse_file(str(document))
+    assert content.startswith(f"{document}: 12 pages")
+    assert "  12: Chapter 12" in content
+    assert "call `parse_file` again with `pages`" in content
+    assert await document_outline(str(document)) == content[: content.index("\n\nThis")]
+    short = tmp_path / "short.pdf"
+    short.write_bytes(b"%PDF short")
+    cache.add_file(str(short), join_pages(["one", "two"]))
+    assert await parse_file(str(short)) == "one\n\ntwo"
+    cache.close()
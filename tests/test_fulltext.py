@@ -0,0 +1,63 @@
+from pathlib import Path
+from fs_explorer.caching import ParsedFileCache
+from fs_explorer.fulltext import FulltextIndex, query_plan, trigrams
+
+
+def test_trigrams() -> None:
+    assert trigrams("AbCd") == {"abc", "bcd"}
+    assert trigrams("ab") == set()
+
+
+def test_query_plan() -> None:
+    assert query_plan("hello") == [["hello"]]
+    assert query_plan(r"hello\s+world") == [["hello", "world"]]
+    assert query_plan("(foo|bar)baz") == [["foo", "baz"], ["bar", "baz"]]
+    assert query_plan(r"(hello)?world") == [["world"]]
+    assert query_plan(r"[a-z]+\d") is None
+    assert query_plan("ab|cde") is None
+
+
+def test_build_and_search(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    (root / "docs").mkdir(parents=True)
+    (root / "a.txt").write_text("the quick brown fox\njumps over\n")
+    (root / "docs" / "b.md").write_text("lazy dog\nquick thinking\n")
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    cache.add_file(str(root / "report.pdf"), "page one\nthe quick report\n")
+    index = FulltextIndex(path=tmp_path / "fulltext.sqlite", cache=cache)
+    report = index.build(str(root))
+    assert (report.indexed_files, report.indexed_parsed) == (2, 1)
+    results = list(index.search("quick"))
+    assert [(r.file_path, [m.line_number for m in r.matches]) for r in results] == [
+        (str(root / "a.txt"), [1]),
+        (str(root / "docs" / "b.md"), [2]),
+        (str((root / "report.pdf").resolve()) + " (parsed)", [2]),
+    ]
+    results = list(index.search("(fox|report)"))
+    assert len(results) == 2
+    assert list(index.search("missing")) == []
+    results = list(index.search("quick", max_matches=1))
+    assert len(results) == 1 and results[0].truncated
+
+    report = index.build(str(root))
+    assert (report.indexed_files, report.unchanged) == (0, 3)
+    (root / "a.txt").unlink()
+    report = index.build(str(root))
+    assert report.removed == 1
+    assert len(list(index.search("quick"))) == 2
+    cache.close()
+
+
+def test_index_keeps_line_endings(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    root.mkdir()
+    (root / "crlf.txt").write_bytes(b"foo\r\nbar\r\n")
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    index = FulltextIndex(path=tmp_path / "fulltext.sqlite", cache=cache)
+    index.build(str(root))
+    # the trigrams are those of the bytes grep scans, not of the translated text
+    results = list(index.search("foo\r\nbar"))
+    assert [(r.file_path, [m.line_number for m in r.matches]) for r in results] == [
+        (str(root / "crlf.txt"), [1])
+    ]
+    cache.close()
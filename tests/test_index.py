@@ -0,0 +1,76 @@
+import os
+import time
+
+from pathlib import Path
+from fs_explorer.index import MetadataIndex
+
+
+def make_tree(root: Path) -> None:
+    (root / "docs" / "nested").mkdir(parents=True)
+    (root / "a.txt").write_text("a")
+    (root / ".hidden.txt").write_text("hidden")
+    (root / "docs" / "b.pdf").write_text("bb")
+    (root / "docs" / "nested" / "c.pdf").write_text("ccc")
+
+
+def test_build_and_query(tmp_path: Path) -> None:
+    make_tree(tmp_path / "tree")
+    index = MetadataIndex(path=tmp_path / "index.sqlite")
+    root = str(tmp_path / "tree")
+    assert index.list_dir(root) is None
+    report = index.build(root)
+    assert report.scanned_directories == 3
+    assert report.updated_entries == 6
+    entries = index.list_dir(root)
+    assert entries is not None
+    assert sorted((e.name, e.is_dir) for e in entries) == [
+        (".hidden.txt", False),
+        ("a.txt", False),
+        ("docs", True),
+    ]
+    assert {e.name: e.size for e in entries if not e.is_dir} == {
+        ".hidden.txt": 6,
+        "a.txt": 1,
+    }
+    assert index.glob(root, "*.txt") == ["a.txt"]
+    assert index.glob(root, ".*") == [".hidden.txt"]
+    assert index.glob(root, "*/*.pdf") == [os.path.join("docs", "b.pdf")]
+    assert index.glob(os.path.join(root, "docs"), "nested/?.pdf") == [
+        os.path.join("nested", "c.pdf")
+    ]
+    assert index.glob(root, "../*") is None
+    assert index.list_dir(str(tmp_path)) is None
+
+
+def test_incremental_refresh(tmp_path: Path) -> None:
+    make_tree(tmp_path / "tree")
+    index = MetadataIndex(path=tmp_path / "index.sqlite")
+    root = str(tmp_path / "tree")
+    index.build(root)
+    report = index.refresh(root)
+    assert report.scanned_directories == 0
+    assert report.unchanged_directories == 3
+    time.sleep(0.01)
+    (tmp_path / "tree" / "docs" / "d.pdf").write_text("d")
+    (tmp_path / "tree" / "docs" / "nested" / "c.pdf").unlink()
+    (tmp_path / "tree" / "docs" / "nested").rmdir()
+    report = index.refresh(root)
+    assert report.scanned_directories == 1
+    assert report.removed_entries == 2
+    assert index.glob(root, "docs/*") == [
+        os.path.join("docs", "b.pdf"),
+        os.path.join("docs", "d.pdf"),
+    ]
+
+
+def test_staleness_policy(tmp_path: Path) -> None:
+    make_tree(tmp_path / "tree")
+    root = str(tmp_path / "tree")
+    MetadataIndex(path=tmp_path / "index.sqlite").build(root)
+    stale = MetadataIndex(path=tmp_path / "index.sqlite", max_age=-1)
+    assert stale.list_dir(root) is None
+    refreshing = MetadataIndex(
+        path=tmp_path / "index.sqlite", max_age=-1, staleness_policy="refresh"
+    )
+    (tmp_path / "tree" / "new.txt").write_text("new")
+    assert refreshing.glob(root, "*.txt") == ["a.txt", "new.txt"]
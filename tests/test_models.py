@@ -1,5 +1,6 @@
 from fs_explorer.models import (
     ToolCallAction,
+    ToolCallBatchAction,
     Action,
     ToolCallArg,
     GoDeeperAction,
@@ -39,3 +40,15 @@ def test_action_to_action_type() -> None:
     assert action.to_action_type() == "godeeper"
     action = Action(action=StopAction(final_result="hello"), reason="")
     assert action.to_action_type() == "stop"
+
+
+def test_tool_call_batch_action() -> None:
+    action = Action.model_validate_json(
+        '{"action": {"tool_calls": [{"tool_name": "read", "tool_input": [{"parameter_name": "file_path", "parameter_value": "a.txt"}]}, {"tool_name": "outline", "tool_input": [{"parameter_name": "file_path", "parameter_value": "b.pdf"}]}]}, "reason": "two candidates"}'
+    )
+    assert isinstance(action.action, ToolCallBatchAction)
+    assert action.to_action_type() == "toolcall"
+    assert [call.tool_name for call in action.tool_calls()] == ["read", "outline"]
+    assert action.tool_calls()[1].to_fn_args() == {"file_path": "b.pdf"}
+    stop = Action(action=StopAction(final_result="hello"), reason="")
+    assert stop.tool_calls() == []
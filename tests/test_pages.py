@@ -0,0 +1,49 @@
+import pytest
+
+from fs_explorer.pages import (
+    OutlineEntry,
+    format_outline,
+    join_pages,
+    outline,
+    parse_page_range,
+    split_pages,
+)
+
+
+def test_join_and_split_pages() -> None:
+    pages = ["first page", "second\fpage", ""]
+    assert split_pages(join_pages(pages)) == ["first page", "second\npage", ""]
+    assert split_pages("legacy entry without pages") == ["legacy entry without pages"]
+
+
+def test_parse_page_range() -> None:
+    assert parse_page_range("3", 10) == [3]
+    assert parse_page_range("3-5", 10) == [3, 4, 5]
+    assert parse_page_range("1, 4,10-", 12) == [1, 4, 10, 11, 12]
+    assert parse_page_range("-2,1", 10) == [1, 2]
+    for invalid in ("0", "11", "5-3", "a", ","):
+        with pytest.raises(ValueError):
+            parse_page_range(invalid, 10)
+
+
+def test_outline() -> None:
+    pages = [
+        "# Order\n\nsome text\n## Background\nmore text",
+        "\n  Case 1:21-cv-01009   Page 2 of 3\nbody",
+        "",
+    ]
+    assert outline(pages) == [
+        OutlineEntry(1, 1, "Order"),
+        OutlineEntry(1, 2, "Background"),
+        OutlineEntry(2, 0, "Case 1:21-cv-01009   Page 2 of 3"),
+    ]
+    assert format_outline("order.pdf", pages) == "\n".join(
+        [
+            "order.pdf: 3 pages",
+            "",
+            "Outline (page: heading):",
+            "  1: Order",
+            "  1:   Background",
+            "  2: Case 1:21-cv-01009   Page 2 of 3",
+        ]
+    )
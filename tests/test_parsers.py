@@ -0,0 +1,113 @@
+import zipfile
+import pytest
+
+from pathlib import Path
+
+from fs_explorer.parsers import (
+    LocalParser,
+    RoutingParser,
+    extract_pages,
+    is_low_quality,
+)
+from fs_explorer.pages import join_pages
+from fs_explorer.scheduler import ParseFailed
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+
+
+def write_zip(path: Path, members: dict[str, str]) -> str:
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return str(path)
+
+
+def make_docx(path: Path, *paragraphs: str) -> str:
+    body = "".join(f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>" for text in paragraphs)
+    return write_zip(
+        path,
+        {"word/document.xml": f"<w:document {W}><w:body>{body}</w:body></w:document>"},
+    )
+
+
+def test_extract_docx(tmp_path: Path) -> None:
+    document = make_docx(tmp_path / "memo.docx", "First paragraph", "Second one")
+    assert extract_pages(document) == ["First paragraph\nSecond one"]
+
+
+def test_extract_pptx(tmp_path: Path) -> None:
+    slides = {
+        f"ppt/slides/slide{i}.xml": f"<sld {A}><a:p><a:r><a:t>Slide {i}</a:t></a:r></a:p></sld>"
+        for i in (2, 10, 1)
+    }
+    document = write_zip(tmp_path / "deck.pptx", slides)
+    assert extract_pages(document) == ["Slide 1", "Slide 2", "Slide 10"]
+
+
+def test_extract_xlsx(tmp_path: Path) -> None:
+    document = write_zip(
+        tmp_path / "book.xlsx",
+        {
+            "xl/workbook.xml": f'<workbook {S}><sheets><sheet name="Totals"/></sheets></workbook>',
+            "xl/sharedStrings.xml": f"<sst {S}><si><t>name</t></si><si><t>amount</t></si></sst>",
+            "xl/worksheets/sheet1.xml": f'<worksheet {S}><sheetData><row><c t="s"><v>0</v></c><c t="s"><v>1</v></c></row><row><c t="inlineStr"><is><t>rent</t></is></c><c><v>1200</v></c></row></sheetData></worksheet>',
+        },
+    )
+    assert extract_pages(document) == ["# Totals\nname\tamount\nrent\t1200"]
+
+
+def test_is_low_quality() -> None:
+    assert is_low_quality(["", "  "], "doc.docx")
+    assert is_low_quality(["����"], "doc.docx")
+    assert not is_low_quality(["short but fine"], "doc.docx")
+    # a scanned PDF only has its running headers as text
+    assert is_low_quality(["Page 1 of 2", "Page 2 of 2"], "scan.pdf")
+    assert not is_low_quality(["word " * 50] * 2, "text.pdf")
+
+
+def test_extract_pdf() -> None:
+    # a scanned order: only the running headers have a text layer
+    order = extract_pages("data/dr_a_order.pdf")
+    assert len(order) == 5
+    assert order[0].startswith("Case 1:21-cv-01009-DNH-ML")
+    assert is_low_quality(order, "data/dr_a_order.pdf")
+    motion = extract_pages("data/dr_a_motion.pdf")
+    assert len(motion) == 28
+    assert not is_low_quality(motion, "data/dr_a_motion.pdf")
+
+
+class FakeRemote:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def parse(self, file_path: str) -> str:
+        self.calls.append(file_path)
+        return f"remote {Path(file_path).name}"
+
+
+@pytest.mark.asyncio
+async def test_routing_parser(tmp_path: Path) -> None:
+    remote = FakeRemote()
+    router = RoutingParser(LocalParser(), remote)
+    memo = make_docx(tmp_path / "memo.docx", "Parsed without leaving the machine")
+    assert await router.parse(memo) == "Parsed without leaving the machine"
+    empty = make_docx(tmp_path / "empty.docx")
+    assert await router.parse(empty) == "remote empty.docx"
+    (tmp_path / "legacy.doc").write_bytes(b"\xd0\xcf\x11\xe0")
+    assert await router.parse(str(tmp_path / "legacy.doc")) == "remote legacy.doc"
+    assert await router.parse("data/dr_a_motion.pdf") == join_pages(
+        extract_pages("data/dr_a_motion.pdf")
+    )
+    assert await router.parse("data/dr_a_order.pdf") == "remote dr_a_order.pdf"
+    assert remote.calls == [
+        empty,
+        str(tmp_path / "legacy.doc"),
+        "data/dr_a_order.pdf",
+    ]
+    offline = RoutingParser(LocalParser(), None)
+    with pytest.raises(ParseFailed):
+        await offline.parse(empty)
+    with pytest.raises(ParseFailed):
+        await offline.parse(str(tmp_path / "legacy.doc"))
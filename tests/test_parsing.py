@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+
+from pathlib import Path
+
+from fs_explorer.caching import ParsedFileCache
+from fs_explorer.parsing import ParsePool
+from fs_explorer.scheduler import ParseScheduler
+
+
+class FakeJobResult:
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.error = None
+        self.error_code = None
+        self.pages: list[str] = []
+
+    async def aget_text(self) -> str:
+        return self.text
+
+
+class SlowParser:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    async def aparse(self, file_path: str) -> FakeJobResult:
+        self.calls.append(file_path)
+        await asyncio.sleep(0.05)
+        return FakeJobResult(f"parsed {Path(file_path).name}")
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_single_flight(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("LLAMA_CLOUD_API_KEY", "test-key")
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF report")
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    parser = SlowParser()
+    keys: list[str] = []
+
+    def factory(api_key: str) -> SlowParser:
+        keys.append(api_key)
+        return parser
+
+    pool = ParsePool(client_factory=factory)  # type: ignore[arg-type]
+    results = await asyncio.gather(
+        *(pool.parse(str(document), cache=cache) for _ in range(5)),
+        pool.parse(str(tmp_path / "." / "report.pdf"), cache=cache),
+    )
+    assert results == ["parsed report.pdf"] * 6
+    assert parser.calls == [str(document.resolve())]
+    assert pool.in_flight() == 0
+    # written through to the cache: later calls do not reach the parser
+    assert cache.get_file(str(document)) == "parsed report.pdf"
+    assert await pool.parse(str(document), cache=cache) == "parsed report.pdf"
+    assert len(parser.calls) == 1
+    # the client is reused for the whole process
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF other")
+    await pool.parse(str(other), cache=cache)
+    assert len(keys) == 1
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_pool_cancelled_caller(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("LLAMA_CLOUD_API_KEY", "test-key")
+    document = tmp_path / "report.pdf"
+    document.write_bytes(b"%PDF report")
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    parser = SlowParser()
+    pool = ParsePool(client_factory=lambda _: parser)  # type: ignore[arg-type,return-value]
+    impatient = asyncio.ensure_future(pool.parse(str(document), cache=cache))
+    patient = asyncio.ensure_future(pool.parse(str(document), cache=cache))
+    await asyncio.sleep(0.01)
+    impatient.cancel()
+    assert await patient == "parsed report.pdf"
+    assert len(parser.calls) == 1
+    cache.close()
+
+
+def test_parse_pool_across_event_loops(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("LLAMA_CLOUD_API_KEY", "test-key")
+    cache = ParsedFileCache(directory=tmp_path / "cache")
+    pool = ParsePool(
+        scheduler_factory=lambda: ParseScheduler(
+            initial_concurrency=1, max_concurrency=1
+        ),
+        client_factory=lambda _: SlowParser(),  # type: ignore[arg-type,return-value]
+    )
+
+    async def parse_all(name: str) -> list[str]:
+        documents = [tmp_path / f"{name}{i}.pdf" for i in range(3)]
+        for document in documents:
+            document.write_bytes(f"%PDF {document.name}".encode())
+        # more jobs than the scheduler lets run: they wait on its condition
+        return await asyncio.gather(
+            *(pool.parse(str(document), cache=cache) for document in documents)
+        )
+
+    # e.g. `load-cache`, then the agent, in the same process
+    assert asyncio.run(parse_all("first"))[0] == "parsed first0.pdf"
+    assert asyncio.run(parse_all("second"))[0] == "parsed second0.pdf"
+    cache.close()
@@ -0,0 +1,49 @@
+import os
+import pytest
+
+from unittest.mock import patch
+from fs_explorer.agent import FsExplorerAgent
+from fs_explorer.results import ResultStore
+
+
+def test_result_store_inline_and_read() -> None:
+    store = ResultStore(inline_chars=100, preview_chars=40)
+    assert store.inline("read", "short") == "short"
+    assert len(store) == 0
+    text = "".join(f"line {i}\n" for i in range(100))
+    inlined = store.inline("read", text)
+    handle = inlined.split("`")[3]
+    assert handle.startswith("result-")
+    assert store.inline("read", text) == inlined
+    assert len(store) == 1
+    assert inlined.endswith(text[:40])
+    page = store.read(handle, offset=40)
+    assert page.startswith(text[40:140])
+    assert "offset=140" in page
+    assert store.read(handle, offset=len(text) - 5) == text[-5:]
+    assert "out of bounds" in store.read(handle, offset=len(text))
+    assert "No stored result" in store.read("result-0")
+
+
+def test_result_store_eviction() -> None:
+    store = ResultStore(inline_chars=10, max_chars=250)
+    handles = [store.put(letter * 100) for letter in "xyz"]
+    assert len(store) == 2
+    assert store.get(handles[0]) is None
+    assert store.get(handles[2]) == "z" * 100
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"GOOGLE_API_KEY": "test-api-key"})
+async def test_agent_stores_large_results(tmp_path) -> None:
+    large = tmp_path / "large.txt"
+    large.write_text("".join(f"row {i}\n" for i in range(20_000)))
+    agent = FsExplorerAgent()
+    await agent.call_tool("read", {"file_path": str(large), "limit": 10_000})
+    message = agent._chat_history[-1].parts[0].text  # type: ignore
+    assert len(message) < 3_000
+    handle = message.split("`")[3]
+    await agent.call_tool("read_result", {"handle": handle, "offset": 0, "limit": 20})
+    page = agent._chat_history[-1].parts[0].text  # type: ignore
+    assert page.startswith("Tool result for read_result:\n\nrow 0\nrow 1\n")
+    assert "call `read_result` with offset=20 to continue" in page
@@ -0,0 +1,120 @@
+import os
+import pytest
+
+from unittest.mock import patch
+from google.genai.types import Candidate, Content, GenerateContentResponse, Part
+from fs_explorer.agent import FsExplorerAgent
+from fs_explorer.models import (
+    Action,
+    AskHumanAction,
+    GoDeeperAction,
+    StopAction,
+    ToolCallAction,
+    ToolCallArg,
+)
+from fs_explorer.routing import ModelRouter
+
+
+def glob_action(confidence: float = 1.0) -> Action:
+    return Action(
+        action=ToolCallAction(
+            tool_name="glob",
+            tool_input=[
+                ToolCallArg(parameter_name="directory", parameter_value="."),
+                ToolCallArg(parameter_name="pattern", parameter_value="*.md"),
+            ],
+        ),
+        reason="",
+        confidence=confidence,
+    )
+
+
+def test_router_escalation() -> None:
+    router = ModelRouter(strong_model="strong", fast_model="fast", escalate_after=2)
+    assert router.tier() == "fast"
+    assert router.should_escalate(
+        "fast", Action(action=StopAction(final_result="x"), reason="")
+    )
+    assert router.should_escalate("fast", None)
+    assert not router.should_escalate("fast", glob_action())
+    assert not router.should_escalate("strong", None)
+    assert router.escalations == 2
+    # two uncertain steps in a row hand the next steps to the strong model
+    router.record("fast", 0.1, glob_action(confidence=0.2))
+    assert router.tier() == "fast"
+    router.record("fast", 0.1, Action(action=AskHumanAction(question="?"), reason=""))
+    assert router.tier() == "strong"
+    router.record("strong", 1.0, glob_action())
+    assert router.tier() == "fast"
+    # repeating the same tool call is not a confident step
+    router.record("fast", 0.1, glob_action())
+    assert router.tier() == "fast"
+    router.record("fast", 0.3, glob_action())
+    assert router.tier() == "strong"
+    metrics = router.metrics()
+    assert metrics["fast"].model == "fast"
+    assert metrics["fast"].calls == 4
+    assert metrics["fast"].average_latency == pytest.approx(0.15)
+    assert metrics["strong"].total_latency == pytest.approx(1.0)
+
+
+def test_router_single_policy() -> None:
+    router = ModelRouter(strong_model="strong", fast_model="fast", policy="single")
+    assert router.tier() == "strong"
+    assert ModelRouter(strong_model="same", fast_model="same").tier() == "strong"
+    with pytest.raises(ValueError):
+        ModelRouter(policy="random")  # type: ignore[arg-type]
+
+
+class ScriptedModels:
+    def __init__(self, actions: dict[str, Action]) -> None:
+        self.actions = actions
+        self.models: list[str] = []
+
+    async def generate_content(self, model: str, **kwargs) -> GenerateContentResponse:
+        self.models.append(model)
+        text = self.actions[model].model_dump_json()
+        return GenerateContentResponse(
+            candidates=[
+                Candidate(
+                    content=Content(role="model", parts=[Part.from_text(text=text)])
+                )
+            ]
+        )
+
+
+class ScriptedClient:
+    def __init__(self, models: ScriptedModels) -> None:
+        self.aio = self
+        self.models = models
+
+
+@pytest.mark.asyncio
+@patch.dict(os.environ, {"GOOGLE_API_KEY": "test-api-key"})
+async def test_agent_routes_steps() -> None:
+    router = ModelRouter(strong_model="strong", fast_model="fast")
+    agent = FsExplorerAgent(router=router)
+    models = ScriptedModels(
+        {
+            "fast": Action(action=GoDeeperAction(directory="src"), reason="navigating"),
+            "strong": Action(
+                action=StopAction(final_result="done"), reason="synthesis"
+            ),
+        }
+    )
+    agent._client = ScriptedClient(models)  # type: ignore
+    agent.configure_task("this is a task")
+    result = await agent.take_action()
+    assert result is not None and result[1] == "godeeper"
+    assert models.models == ["fast"]
+    # the final answer of the fast model is asked again to the strong one
+    models.actions["fast"] = Action(action=StopAction(final_result="meh"), reason="")
+    result = await agent.take_action()
+    assert result is not None
+    assert result[0].action == StopAction(final_result="done")
+    assert models.models == ["fast", "fast", "strong"]
+    # the discarded answer is not part of the history
+    assert len(agent._chat_history) == 4
+    metrics = agent.tier_metrics()
+    assert (metrics["fast"].calls, metrics["strong"].calls) == (2, 1)
+    assert router.escalations == 1
@@ -0,0 +1,143 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+
+from fs_explorer.scheduler import (
+    ParseFailed,
+    ParseScheduler,
+    TransientParseError,
+    is_transient,
+    result_text,
+)
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, status_code: int, retry_after: str | None = None) -> None:
+        super().__init__(f"HTTP {status_code}")
+        headers = {} if retry_after is None else {"retry-after": retry_after}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FakeParseServer:
+    """Answers 429 whenever more than `capacity` requests are in flight"""
+
+    def __init__(self, capacity: int, latency: float = 0.005) -> None:
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.rejected = 0
+
+    async def parse(self, file_path: str) -> str:
+        self.in_flight += 1
+        try:
+            self.peak = max(self.peak, self.in_flight)
+            await asyncio.sleep(self.latency)
+            if self.in_flight > self.capacity:
+                self.rejected += 1
+                raise FakeHTTPError(429)
+            return f"parsed {file_path}"
+        finally:
+            self.in_flight -= 1
+
+
+def test_is_transient() -> None:
+    assert is_transient(FakeHTTPError(429))
+    assert is_transient(FakeHTTPError(503))
+    assert is_transient(TransientParseError("busy"))
+    assert is_transient(asyncio.TimeoutError())
+    assert not is_transient(FakeHTTPError(400))
+    assert not is_transient(ValueError("unsupported file"))
+
+
+@pytest.mark.asyncio
+async def test_scheduler_backs_off_on_rate_limits() -> None:
+    server = FakeParseServer(capacity=3)
+    scheduler = ParseScheduler(initial_concurrency=12, base_delay=0.001)
+    results = await asyncio.gather(
+        *(scheduler.run(lambda i=i: server.parse(f"doc{i}")) for i in range(60))
+    )
+    assert results == [f"parsed doc{i}" for i in range(60)]
+    metrics = scheduler.metrics()
+    assert server.rejected > 0
+    assert metrics.throttled == server.rejected
+    assert metrics.retries == server.rejected
+    assert metrics.concurrency < 12
+    assert metrics.completed == 60
+    assert metrics.failed == 0
+    assert metrics.in_flight == 0 and metrics.queued == 0
+    assert metrics.throughput > 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_grows_concurrency() -> None:
+    server = FakeParseServer(capacity=100, latency=0.001)
+    scheduler = ParseScheduler(initial_concurrency=1, max_concurrency=4)
+    await asyncio.gather(
+        *(scheduler.run(lambda i=i: server.parse(f"doc{i}")) for i in range(40))
+    )
+    assert scheduler.concurrency == 4
+    assert server.peak <= 4
+
+
+@pytest.mark.asyncio
+async def test_scheduler_retry_policy() -> None:
+    calls = 0
+
+    async def rejected() -> str:
+        nonlocal calls
+        calls += 1
+        raise FakeHTTPError(503, retry_after="0")
+
+    scheduler = ParseScheduler(max_retries=2)
+    with pytest.raises(FakeHTTPError):
+        await scheduler.run(rejected)
+    assert calls == 3
+
+    calls = 0
+
+    async def unsupported() -> str:
+        nonlocal calls
+        calls += 1
+        raise FakeHTTPError(400)
+
+    with pytest.raises(FakeHTTPError):
+        await scheduler.run(unsupported)
+    assert calls == 1
+    assert scheduler.metrics().failed == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_releases_cancelled_jobs() -> None:
+    scheduler = ParseScheduler(initial_concurrency=1, max_concurrency=1)
+    for _ in range(3):
+        # what a tool timeout does to a parse in flight
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.run(lambda: asyncio.sleep(10)), 0.01)
+    assert scheduler.metrics().in_flight == 0
+    assert (
+        await asyncio.wait_for(scheduler.run(lambda: asyncio.sleep(0, "done")), 1)
+        == "done"
+    )
+
+
+@pytest.mark.asyncio
+async def test_result_text() -> None:
+    async def aget_text() -> str:
+        return "text"
+
+    ok = SimpleNamespace(error=None, error_code=None, pages=[], aget_text=aget_text)
+    assert await result_text(ok) == "text"  # type: ignore[arg-type]
+    paged = SimpleNamespace(
+        error=None,
+        error_code=None,
+        pages=[SimpleNamespace(text="one"), SimpleNamespace(text=None)],
+    )
+    assert await result_text(paged) == "one\f"  # type: ignore[arg-type]
+    throttled = SimpleNamespace(error="too many requests", error_code="429")
+    with pytest.raises(TransientParseError):
+        await result_text(throttled)  # type: ignore[arg-type]
+    broken = SimpleNamespace(error="unsupported file", error_code="UNSUPPORTED")
+    with pytest.raises(ParseFailed):
+        await result_text(broken)  # type: ignore[arg-type]
@@ -0,0 +1,76 @@
+import os
+
+from pathlib import Path
+from fs_explorer.search import (
+    MAX_LINE_BYTES,
+    PARALLEL_MIN_FILES,
+    search_tree,
+    compile_pattern,
+    format_matches,
+    grep_buffer,
+)
+
+
+def test_compile_pattern_is_cached() -> None:
+    assert compile_pattern(r"test\d+") is compile_pattern(r"test\d+")
+    assert compile_pattern(r"test\d+").pattern == rb"test\d+"
+
+
+def test_grep_buffer() -> None:
+    buffer = b"a test\nno match\ntest and test\n\nlast test"
+    result = grep_buffer(buffer, compile_pattern("test"))
+    assert not result.truncated
+    assert [(m.line_number, m.line) for m in result.matches] == [
+        (1, "a test"),
+        (3, "test and test"),
+        (5, "last test"),
+    ]
+    result = grep_buffer(buffer, compile_pattern("test"), max_matches=1)
+    assert result.truncated
+    assert len(result.matches) == 1
+    assert format_matches(result.matches) == "1:a test"
+
+
+def test_grep_buffer_long_lines() -> None:
+    buffer = b"x" * (MAX_LINE_BYTES * 3) + b"needle" + b"y" * (MAX_LINE_BYTES * 3)
+    result = grep_buffer(buffer, compile_pattern("needle"))
+    line = result.matches[0].line
+    assert "needle" in line
+    assert line.startswith("...") and line.endswith("...")
+    assert len(line) <= MAX_LINE_BYTES + 6
+
+
+def test_search_tree(tmp_path: Path) -> None:
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "build").mkdir()
+    (tmp_path / ".gitignore").write_text("build/\n*.log\n")
+    (tmp_path / "a.txt").write_text("needle one\nhay\n")
+    (tmp_path / "docs" / "b.md").write_text("hay\nneedle two\nneedle three\n")
+    (tmp_path / "docs" / "c.bin").write_bytes(b"needle\0binary")
+    (tmp_path / "node_modules" / "d.txt").write_text("needle")
+    (tmp_path / "build" / "e.txt").write_text("needle")
+    (tmp_path / "f.log").write_text("needle")
+    results = list(search_tree(str(tmp_path), "needle"))
+    assert [
+        (os.path.relpath(r.file_path, tmp_path), [m.line_number for m in r.matches])
+        for r in results
+    ] == [("a.txt", [1]), (os.path.join("docs", "b.md"), [2, 3])]
+    assert not results[-1].truncated
+    results = list(search_tree(str(tmp_path), "needle", max_matches=2))
+    assert sum(len(r.matches) for r in results) == 2
+    assert results[-1].truncated
+    results = list(search_tree(str(tmp_path), "needle", file_pattern="*.md"))
+    assert len(results) == 1
+
+
+def test_search_tree_parallel(tmp_path: Path) -> None:
+    for i in range(PARALLEL_MIN_FILES * 2):
+        (tmp_path / f"file{i:03d}.txt").write_text(f"line\nmatch {i}\n")
+    results = list(search_tree(str(tmp_path), r"match \d+"))
+    assert [r.matches[0].line for r in results] == [
+        f"match {i}" for i in range(PARALLEL_MIN_FILES * 2)
+    ]
+    results = list(search_tree(str(tmp_path), r"match \d+", max_matches=5))
+    assert len(results) == 5
+    assert results[-1].truncated
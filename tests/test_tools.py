@@ -0,0 +1,92 @@
+import time
+import asyncio
+import pytest
+
+from fs_explorer.agent import TOOLS
+from fs_explorer.tools import MAX_TOOL_TIMEOUT, TOOL_RUNNER, ToolRunner, ToolTimeout
+from fs_explorer.workflow import WORKFLOW_TIMEOUT, workflow
+
+
+def spin(seconds: float) -> str:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+    return f"spun for {seconds}s"
+
+
+async def nap(seconds: float) -> str:
+    await asyncio.sleep(seconds)
+    return f"slept for {seconds}s"
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_keeps_the_loop_free() -> None:
+    runner = ToolRunner(threads=2, isolated=frozenset())
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        assert await runner.run("read", spin, {"seconds": 0.3}) == "spun for 0.3s"
+    finally:
+        task.cancel()
+    assert ticks > 10
+    runner.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_timeouts() -> None:
+    runner = ToolRunner(
+        threads=1,
+        default_timeout=0.1,
+        timeouts={"parse_file": 1.0},
+        isolated=frozenset(),
+    )
+    with pytest.raises(ToolTimeout):
+        await runner.run("read", spin, {"seconds": 0.5})
+    # the only thread is still busy with the call above: this one never starts
+    with pytest.raises(ToolTimeout):
+        await runner.run("glob", spin, {"seconds": 0.0})
+    with pytest.raises(ToolTimeout):
+        await runner.run("outline", nap, {"seconds": 0.5})
+    assert await runner.run("parse_file", nap, {"seconds": 0.2}) == "slept for 0.2s"
+    runner.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_kills_isolated_tools() -> None:
+    runner = ToolRunner(default_timeout=10.0, isolated=frozenset({"grep"}))
+    # the first call also pays for starting the worker processes
+    assert await runner.run("grep", spin, {"seconds": 0.0}) == "spun for 0.0s"
+    runner.default_timeout = 0.2
+    start = time.perf_counter()
+    with pytest.raises(ToolTimeout):
+        await runner.run("grep", spin, {"seconds": 60})
+    assert time.perf_counter() - start < 5
+    runner.default_timeout = 10.0
+    assert await runner.run("grep", spin, {"seconds": 0.0}) == "spun for 0.0s"
+    runner.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_tool_runner_isolated_grep(tmp_path) -> None:
+    # the tool of the agent, which a spawned worker imports from `search` alone
+    file_path = tmp_path / "notes.txt"
+    file_path.write_text("alpha\nbeta\n")
+    runner = ToolRunner(default_timeout=10.0, isolated=frozenset({"grep"}))
+    runner.warm_up()
+    result = await runner.run(
+        "grep", TOOLS["grep"], {"file_path": str(file_path), "pattern": "beta"}
+    )
+    assert result == f"MATCHES for beta in {file_path}:\n\n2:beta"
+    runner.shutdown()
+
+
+def test_workflow_outlasts_tool_timeouts() -> None:
+    assert MAX_TOOL_TIMEOUT >= max(TOOL_RUNNER.timeouts.values())
+    assert workflow._timeout == WORKFLOW_TIMEOUT > MAX_TOOL_TIMEOUT
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import pytest
+
+from google.genai.types import HttpOptions
+from fs_explorer import workflow as workflow_module
+from fs_explorer.agent import AgentSessions, FsExplorerAgent, shared_client
+from fs_explorer.workflow import ExplorationEndEvent, FsExplorerWorkflow, InputEvent
+from .conftest import MockGenAIClient
+
+
+class SlowMockClient(MockGenAIClient):
+    @property
+    def aio(self):
+        return self
+
+    @property
+    def models(self):
+        return self
+
+    async def generate_content(self, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return await super().aio.models.generate_content(*args, **kwargs)
+
+
+def test_agents_share_clients() -> None:
+    assert shared_client("key") is shared_client("key")
+    assert shared_client("key") is not shared_client("other key")
+    first, second = FsExplorerAgent(api_key="key"), FsExplorerAgent(api_key="key")
+    assert first._client is second._client
+    assert first._chat_history is not second._chat_history
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sessions(monkeypatch: pytest.MonkeyPatch) -> None:
+    created: list[FsExplorerAgent] = []
+
+    def agent_factory() -> FsExplorerAgent:
+        agent = FsExplorerAgent(api_key="test-api-key")
+        agent._client = SlowMockClient(
+            "", http_options=HttpOptions(api_version="v1beta")
+        )  # type: ignore
+        created.append(agent)
+        return agent
+
+    sessions = AgentSessions(agent_factory)
+    monkeypatch.setattr(workflow_module, "SESSIONS", sessions)
+    workflow = FsExplorerWorkflow(timeout=30)
+    tasks = [f"task number {i}" for i in range(4)]
+    results = await asyncio.gather(
+        *(workflow.run(start_event=InputEvent(task=task)) for task in tasks)
+    )
+    assert all(isinstance(result, ExplorationEndEvent) for result in results)
+    assert [result.final_result for result in results] == ["this is a final result"] * 4
+    # one agent per run, each with only its own task in the history, all released
+    assert len(created) == 4
+    histories = sorted(
+        agent._chat_history[1].parts[0].text
+        for agent in created  # type: ignore
+    )
+    assert all(task in history for task, history in zip(tasks, histories))
+    assert all(len(agent._chat_history) == 3 for agent in created)
+    assert len(sessions) == 0
+
+    agent = sessions.get("given id")
+    await workflow.run(start_event=InputEvent(task="one more", session_id="given id"))
+    assert len(created) == 5 and created[-1] is agent
+    assert "one more" in agent._chat_history[1].parts[0].text  # type: ignore
+
+
+class FailingClient(SlowMockClient):
+    def __init__(self, delay: float = 0.0) -> None:
+        super().__init__("", http_options=HttpOptions(api_version="v1beta"))
+        self.delay = delay
+
+    async def generate_content(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        raise ConnectionError("network is down")
+
+
+@pytest.mark.asyncio
+async def test_failed_sessions_are_released(monkeypatch: pytest.MonkeyPatch) -> None:
+    def agent_factory(delay: float):
+        def factory() -> FsExplorerAgent:
+            agent = FsExplorerAgent(api_key="test-api-key")
+            agent._client = FailingClient(delay)  # type: ignore
+            return agent
+
+        return factory
+
+    sessions = AgentSessions(agent_factory(0.0))
+    monkeypatch.setattr(workflow_module, "SESSIONS", sessions)
+    with pytest.raises(Exception):
+        await FsExplorerWorkflow(timeout=30).run(start_event=InputEvent(task="task"))
+    assert len(sessions) == 0
+
+    # a run that times out while its agent is waiting for the model
+    sessions = AgentSessions(agent_factory(5.0))
+    monkeypatch.setattr(workflow_module, "SESSIONS", sessions)
+    with pytest.raises(Exception):
+        await FsExplorerWorkflow(timeout=0.2).run(start_event=InputEvent(task="task"))
+    await asyncio.sleep(0.1)
+    assert len(sessions) == 0
+
+
+def test_idle_sessions_are_dropped() -> None:
+    sessions = AgentSessions(lambda: FsExplorerAgent(api_key="key"), max_idle=0.05)
+    first = sessions.get("first")
+    assert sessions.get("first") is first
+    time.sleep(0.1)
+    sessions.get("second")
+    assert len(sessions) == 1
+    assert sessions.release("first") is None